@@ -111,28 +111,65 @@ function(add_hermes_grammar)
     # Add library
     add_library(${ARGS_TARGET} ${LOADER_IMPL_FILE})
 
-    # Custom command to generate the header
-    add_custom_command(
-        OUTPUT ${OUTPUTS}
-        WORKING_DIRECTORY ${HERMES_ROOT}
-        COMMENT "Generating parser for ${ARGS_TARGET}"
-        COMMAND
-            ${Python3_EXECUTABLE} -m hermes_gen
-                --name ${ARGS_TARGET}
-                --table ${GRAMMAR_FILE}
-                --loader ${LOADER_HEADER_FILE}
-                ${PYBIND_ARGS}
-                --impl ${LOADER_IMPL_FILE}
-                --automata "${DESC_FILE}"
-                ${GRAMMAR}
-        VERBATIM
-        DEPENDS ${GRAMMAR} ${PY_FILES} ${GRAMMAR_FILES}
+    set(HERMES_ARGS
+        --name ${ARGS_TARGET}
+        --table ${GRAMMAR_FILE}
+        --loader ${LOADER_HEADER_FILE}
+        ${PYBIND_ARGS}
+        --impl ${LOADER_IMPL_FILE}
+        # One argument, so it is not dropped when there is no desc file
+        --automata=${DESC_FILE}
+        --cache-dir ${CMAKE_BINARY_DIR}/hermes_cache
+        ${GRAMMAR}
     )
 
-    # Add target to generate parse table
-    add_custom_target(${ARGS_TARGET}_grammar
-        DEPENDS ${OUTPUTS} ${GRAMMAR} ${PY_FILES}
-    )
+    if(HERMES_BATCH)
+        # Every grammar is generated by one command, see _hermes_add_batch
+        set_source_files_properties(${OUTPUTS} PROPERTIES GENERATED TRUE)
+
+        # One manifest line per grammar, quoted like a shell command
+        set(ENTRY "")
+        foreach(ARG IN LISTS HERMES_ARGS)
+            string(APPEND ENTRY " \"${ARG}\"")
+        endforeach()
+        string(STRIP "${ENTRY}" ENTRY)
+
+        set_property(GLOBAL APPEND PROPERTY HERMES_BATCH_ENTRIES "${ENTRY}")
+        set_property(GLOBAL APPEND PROPERTY HERMES_BATCH_OUTPUTS ${OUTPUTS})
+        set_property(GLOBAL APPEND PROPERTY HERMES_BATCH_DEPENDS ${GRAMMAR} ${PY_FILES} ${GRAMMAR_FILES})
+
+        get_property(BATCH_DEFERRED GLOBAL PROPERTY HERMES_BATCH_DEFERRED)
+        if(NOT BATCH_DEFERRED)
+            # Add the command once every grammar of the project is known
+            set_property(GLOBAL PROPERTY HERMES_BATCH_DEFERRED TRUE)
+            cmake_language(DEFER DIRECTORY ${CMAKE_SOURCE_DIR} CALL _hermes_add_batch)
+        endif()
+
+        add_custom_target(${ARGS_TARGET}_grammar)
+        add_dependencies(${ARGS_TARGET}_grammar hermes_batch)
+    else()
+        if(NOT "${HERMES_SERVER}" STREQUAL "")
+            # The client falls back to generating itself if the server is not running
+            set(HERMES_COMMAND ${Python3_EXECUTABLE} -m hermes_gen.client ${HERMES_SERVER} --)
+        else()
+            set(HERMES_COMMAND ${Python3_EXECUTABLE} -m hermes_gen)
+        endif()
+
+        # Custom command to generate the header
+        add_custom_command(
+            OUTPUT ${OUTPUTS}
+            WORKING_DIRECTORY ${HERMES_ROOT}
+            COMMENT "Generating parser for ${ARGS_TARGET}"
+            COMMAND ${HERMES_COMMAND} ${HERMES_ARGS}
+            VERBATIM
+            DEPENDS ${GRAMMAR} ${PY_FILES} ${GRAMMAR_FILES}
+        )
+
+        # Add target to generate parse table
+        add_custom_target(${ARGS_TARGET}_grammar
+            DEPENDS ${OUTPUTS} ${GRAMMAR} ${PY_FILES}
+        )
+    endif()
 
 
     # Add dependency on parse_table
@@ -158,4 +195,38 @@ function(add_hermes_grammar)
         message("Added Hermes target ${ARGS_TARGET} for grammar ${ARGS_GRAMMAR} in ${CMAKE_CURRENT_SOURCE_DIR}")
     endif()
 
-endfunction()
\ No newline at end of file
+endfunction()
+
+# Generate every grammar added with HERMES_BATCH in one generator process,
+# called at the end of the top level CMakeLists
+function(_hermes_add_batch)
+    get_property(ENTRIES GLOBAL PROPERTY HERMES_BATCH_ENTRIES)
+    get_property(OUTPUTS GLOBAL PROPERTY HERMES_BATCH_OUTPUTS)
+    get_property(DEPENDS GLOBAL PROPERTY HERMES_BATCH_DEPENDS)
+    list(REMOVE_DUPLICATES DEPENDS)
+
+    if("${HERMES_BATCH_JOBS}" STREQUAL "")
+        cmake_host_system_information(RESULT HERMES_BATCH_JOBS QUERY NUMBER_OF_LOGICAL_CORES)
+    endif()
+
+    # Only touch the manifest when a grammar is added, removed, or changes its arguments
+    set(MANIFEST ${CMAKE_BINARY_DIR}/hermes_batch.txt)
+    string(JOIN "\n" CONTENT ${ENTRIES})
+    file(WRITE ${MANIFEST}.tmp "${CONTENT}\n")
+    configure_file(${MANIFEST}.tmp ${MANIFEST} COPYONLY)
+
+    # Unchanged outputs are not rewritten, so the stamp tells when the batch last ran
+    set(STAMP ${CMAKE_BINARY_DIR}/hermes_batch.stamp)
+    add_custom_command(
+        OUTPUT ${STAMP}
+        BYPRODUCTS ${OUTPUTS}
+        WORKING_DIRECTORY ${HERMES_ROOT}
+        COMMENT "Generating parsers for every Hermes grammar"
+        COMMAND ${Python3_EXECUTABLE} -m hermes_gen --batch ${MANIFEST} --jobs ${HERMES_BATCH_JOBS}
+        COMMAND ${CMAKE_COMMAND} -E touch ${STAMP}
+        VERBATIM
+        DEPENDS ${MANIFEST} ${DEPENDS}
+    )
+
+    add_custom_target(hermes_batch DEPENDS ${STAMP})
+endfunction()
@@ -1,5 +1,6 @@
 #pragma once
 
+#include <algorithm>
 #include <deque>
 #include <iostream>
 #include <memory>
@@ -43,6 +44,56 @@ typedef struct
     unsigned short state = 0;
 } ParseAction;
 
+// The reduction used when the look ahead of a state has no action
+typedef struct
+{
+    // The rule to reduce by, NO_RULE if there is no default reduction
+    unsigned short rule;
+    // True if the reduction is the only action of the state,
+    // so the look ahead does not have to be read
+    bool consistent;
+} DefaultReduction;
+
+constexpr unsigned short NO_RULE = 0xFFFF;
+
+// A state whose goto on a nonterminal is not the default goto
+typedef struct
+{
+    unsigned short state;
+    unsigned short next;
+} GotoEntry;
+
+// Parse table compressed with row displacement (comb vectors), the rows
+// of every state are overlapped in one vector, each starting at its own base
+typedef struct
+{
+    unsigned numRows;
+    // The number of symbols, not including the start symbol
+    unsigned numCols;
+    // Nonterminals come first in the symbol order
+    unsigned numNonterms;
+
+    // Terminals with the same action in every state share a column,
+    // terminalClasses[t] is the column of the terminal in column t
+    const unsigned short* terminalClasses;
+
+    // The default reduction of each state
+    const DefaultReduction* defaultReductions;
+
+    // The action of a state on the terminal class c is
+    // actions[actionBase[state] + c] if actionCheck[actionBase[state] + c] == c,
+    // otherwise it is the default reduction, or an error if there is none
+    const unsigned* actionBase;
+    const ParseAction* actions;
+    const unsigned short* actionCheck;
+
+    // The goto of nonterminal n is defaultGotos[n], unless the state is in
+    // gotos[gotoStart[n]] to gotos[gotoStart[n + 1]], which is sorted by state
+    const unsigned short* defaultGotos;
+    const unsigned* gotoStart;
+    const GotoEntry* gotos;
+} ParseTableDef;
+
 typedef unsigned HState;
 
 template<typename HermesReturn>
@@ -131,7 +182,7 @@ public:
     using StackItemPtr = std::shared_ptr<StackItem<HermesReturn>>;
     using ReductionFunc = HermesReturn (*)(std::vector<StackItemPtr>);
 
-    const ParseAction* parseTable;
+    const ParseTableDef* parseTable;
     const unsigned numCols;
     const unsigned numRows;
 
@@ -149,9 +200,7 @@ public:
     std::vector<Terminal> terminals;
 
     static std::shared_ptr<Grammar<HermesReturn>>
-    New(const ParseAction* parseTable,
-        unsigned numCols,
-        unsigned numRows,
+    New(const ParseTableDef* parseTable,
         const Reduction* reductions,
         const ReductionFunc* reductionFuncs,
         const std::string* symbolLookup,
@@ -161,8 +210,6 @@ public:
     {
         return std::make_shared<Grammar<HermesReturn>>(
             parseTable,
-            numCols,
-            numRows,
             reductions,
             reductionFuncs,
             symbolLookup,
@@ -173,9 +220,7 @@ public:
     }
 
     Grammar(
-        const ParseAction* parseTable,
-        unsigned numCols,
-        unsigned numRows,
+        const ParseTableDef* parseTable,
         const Reduction* reductions,
         const ReductionFunc* reductionFuncs,
         const std::string* symbolLookup,
@@ -184,8 +229,8 @@ public:
         size_t numSymbols
     )
         : parseTable(parseTable)
-        , numCols(numCols)
-        , numRows(numRows)
+        , numCols(parseTable->numCols)
+        , numRows(parseTable->numRows)
         , reductions(reductions)
         , reductionFuncs(reductionFuncs)
         , symbolLookup(symbolLookup)
@@ -209,22 +254,48 @@ public:
         // Init by pushing the starting state onto the stack
         stack.push_back(StackToken<HermesReturn>::New(0, ParseToken()));
 
-        ParseToken token = scanner->nextToken();
+        // The look ahead is only read when it is needed, consistent
+        // states reduce without it
+        ParseToken token;
+        bool haveToken = false;
         errored = false;
         bool errorRecovery = false;
         ParseToken errorToken;
 
         while(true)
         {
-            ParseAction nextAction =
-                getAction(stack.back()->state, token.symbol);
+            const DefaultReduction& defaultReduction =
+                parseTable->defaultReductions[stack.back()->state];
+
+            ParseAction nextAction;
+            if(defaultReduction.consistent)
+            {
+                nextAction = {R, defaultReduction.rule};
+            }
+            else
+            {
+                if(!haveToken)
+                {
+                    token = scanner->nextToken();
+                    haveToken = true;
+                }
+                nextAction = getAction(stack.back()->state, token.symbol);
+            }
 
 #ifdef HERMES_PARSE_DEBUG
-            std::cout << "State:" << stack.back()->state
-                      << " Token: " << lookupSymbol(token.symbol)
-                      << " Loc:" << token.loc.lineStart << ":"
-                      << token.loc.charStart << " Text: '" << token.text
-                      << "'\n\t↳ ";
+            std::cout << "State:" << stack.back()->state;
+            if(haveToken)
+            {
+                std::cout << " Token: " << lookupSymbol(token.symbol)
+                          << " Loc:" << token.loc.lineStart << ":"
+                          << token.loc.charStart << " Text: '" << token.text
+                          << "'";
+            }
+            else
+            {
+                std::cout << " Token not read";
+            }
+            std::cout << "\n\t↳ ";
 #endif
 
             switch(nextAction.action)
@@ -237,8 +308,8 @@ public:
 #ifdef HERMES_PARSE_DEBUG
                 std::cout << "Shift to state " << nextAction.state << "\n";
 #endif
-                // We only get the next token after a shift
-                token = scanner->nextToken();
+                // The next token is read when it is needed
+                haveToken = false;
 
                 break;
             }
@@ -281,8 +352,7 @@ public:
                     return hr;
                 }
 
-                ParseAction nextGoto =
-                    getAction(stack.back()->state, reduction.nonterm);
+                HState nextGoto = getGoto(stack.back()->state, reduction.nonterm);
 
                 Location nextLoc;
                 if(!items.empty())
@@ -298,7 +368,7 @@ public:
                 }
 
                 stack.push_back(StackNonTerm<HermesReturn>::New(
-                    nextGoto.state,
+                    nextGoto,
                     reduction.nonterm,
                     hr,
                     nextLoc
@@ -448,9 +518,47 @@ private:
         return reductions[rule];
     }
 
-    inline const ParseAction& getAction(unsigned state, unsigned symbol) const
+    inline ParseAction getAction(unsigned state, unsigned symbol) const
+    {
+        // Offset for the start symbol
+        unsigned col = symbol - 1;
+        if(col < parseTable->numNonterms)
+        {
+            return {G, static_cast<unsigned short>(getGoto(state, symbol))};
+        }
+
+        unsigned short terminalClass = parseTable->terminalClasses[col - parseTable->numNonterms];
+        unsigned idx = parseTable->actionBase[state] + terminalClass;
+        if(parseTable->actionCheck[idx] == terminalClass)
+        {
+            return parseTable->actions[idx];
+        }
+
+        unsigned short rule = parseTable->defaultReductions[state].rule;
+        if(rule != NO_RULE)
+        {
+            return {R, rule};
+        }
+        return {};
+    }
+
+    inline HState getGoto(unsigned state, unsigned nonterm) const
     {
-        return parseTable[(state * numCols) + (symbol - 1)];
+        // Offset for the start symbol
+        unsigned col = nonterm - 1;
+        const GotoEntry* begin = parseTable->gotos + parseTable->gotoStart[col];
+        const GotoEntry* end = parseTable->gotos + parseTable->gotoStart[col + 1];
+        const GotoEntry* entry = std::lower_bound(
+            begin,
+            end,
+            state,
+            [](const GotoEntry& x, unsigned state) { return x.state < state; }
+        );
+        if(entry != end && entry->state == state)
+        {
+            return entry->next;
+        }
+        return parseTable->defaultGotos[col];
     }
 };
 
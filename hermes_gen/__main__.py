@@ -1,19 +1,59 @@
-from argparse import ArgumentParser
+from typing import List, Optional, Tuple, TYPE_CHECKING
+from argparse import ArgumentParser, Namespace
 
+import contextlib
+import io
 import os
+import shlex
+import sys
+import time
 
-from hermes_gen.grammar import parse_grammar
-from hermes_gen.lalr1_automata import LALR1Automata, writeDescription
+from hermes_gen.grammar import Grammar, parse_grammar
+from hermes_gen.lalr1_automata import LALR1Automata, LAEngine, ALL_LA_ENGINES, writeDescription
+from hermes_gen.modes import Mode, ALL_MODES, buildAutomata
 from hermes_gen.parseTable import ParseTable
-from hermes_gen.counterexample.counterexampleGen import CounterExampleGen
 from hermes_gen.errors import HermesError
-from hermes_gen.writers import loader, table, pybind
+from hermes_gen.consts import TIME_LIMIT_SEC, CONFIG_LIMIT
 from hermes_gen import hermes_logs
 
+# Counterexamples, the cache, snapshots, and the writers are only imported when they are used,
+# so the generator starts quickly for cache hits and grammars without conflicts.
+# See tests/benchmarks/startup.py
+if TYPE_CHECKING:
+    from hermes_gen.cache import GenerationCache
 
-def main():
+
+def printModeStats(grammar: Grammar, engine: str):
+    """
+    Build the automata for every mode and print their sizes and build times
+    """
+    for mode in ALL_MODES:
+        startTime = time.perf_counter()
+        automata = buildAutomata(grammar, mode, engine)
+        buildTime = time.perf_counter() - startTime
+        parseTable = ParseTable(automata)
+        hermes_logs.info(
+            f'{mode:>5}: {len(automata.nodes):>6} states, {len(parseTable.conflicts):>4} conflicts, '
+            f'{buildTime * 1000:.1f} ms'
+        )
+
+
+def _generateSerial(automata: LALR1Automata, parseTable: ParseTable, colors: bool, timeLimit: float, configLimit: int):
+    """
+    Generate counterexamples in this process, with the same output as generateCounterExamples()
+    """
+    from hermes_gen.counterexample.counterexampleGen import CounterExampleGen
+
+    ceGen = CounterExampleGen(automata)
+    ceGen.timeLimit = timeLimit
+    ceGen.configLimit = configLimit
+    for conflict in parseTable.conflicts:
+        yield "", ceGen.generate_counterexample(conflict).prettyPrint(colors)
+
+
+def makeParser() -> ArgumentParser:
     parser = ArgumentParser()
-    parser.add_argument("grammar_file")
+    parser.add_argument("grammar_file", nargs="?", default="")
     parser.add_argument("-n", "--name", help="The grammar name", default="")
     parser.add_argument("-t", '--table', help="The table filename", default="")
     parser.add_argument(
@@ -27,12 +67,94 @@ def main():
     parser.add_argument("-p", "--pybind", help="The pybind loader filename", default="")
     parser.add_argument("-ps", "--python-stubs", help="The python stub filename", default="")
     parser.add_argument("--no-examples", help="Disable counterexample generation for conflicts", action="store_true")
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        help="The number of processes used to generate counterexamples, or grammars with --batch",
+        type=int,
+        default=1,
+    )
+    parser.add_argument(
+        "--example-time-limit",
+        help="Seconds to search for each counterexample before giving up",
+        type=float,
+        default=TIME_LIMIT_SEC,
+    )
+    parser.add_argument(
+        "--example-config-limit",
+        help="Search configurations to try for each counterexample before giving up, bounds memory use",
+        type=int,
+        default=CONFIG_LIMIT,
+    )
     parser.add_argument("-s", "--strict", help="Return an error if an unresolved conflict occurs", action="store_true")
     parser.add_argument("--hide-conflicts", help="Do not print out conflict warnings", action="store_true")
     parser.add_argument("--no-color", help="Disable terminal colors", action="store_true")
+    parser.add_argument(
+        "--lalr-engine",
+        help=f"The algorithm used to compute LALR(1) look aheads, defaults to {LAEngine.deremer_pennello}",
+        choices=ALL_LA_ENGINES
+    )
+    parser.add_argument(
+        "-m", "--mode", help=f"The type of automata to generate, defaults to {Mode.lalr}", choices=ALL_MODES
+    )
+    parser.add_argument(
+        "--mode-stats",
+        help="Print the number of states, conflicts, and build time for every mode",
+        action="store_true"
+    )
+    parser.add_argument(
+        "--cache-dir",
+        help="Reuse the outputs of a previous run if the grammar files and options have not changed",
+        default=""
+    )
+    parser.add_argument(
+        "--snapshot",
+        help="Write a snapshot of the grammar, automata, and parse table to the specified file",
+        default=""
+    )
+    parser.add_argument(
+        "--from-snapshot",
+        help="Read grammar_file as a snapshot written by --snapshot instead of building it",
+        action="store_true"
+    )
+    parser.add_argument(
+        "--incremental",
+        help="Reuse the unchanged states of the automata in the --snapshot file, if it exists, "
+        "instead of building every state",
+        action="store_true"
+    )
 
-    args = parser.parse_args()
+    parser.add_argument(
+        "--batch",
+        help="Generate every grammar listed in a manifest file, one per line, "
+        "each line holds the arguments for that grammar",
+        default=""
+    )
+    parser.add_argument(
+        "--serve",
+        help="Run a generator server on the specified socket, see hermes_gen.client",
+        default=""
+    )
+    return parser
+
+
+class BuildState:
+    """
+    What a long running generator keeps between runs of the same arguments, see server.py
+    """
+
+    def __init__(self) -> None:
+        # The automata of the last run, the next run reuses its unchanged nodes like --incremental
+        self.automata: Optional[LALR1Automata] = None
 
+
+def generate(args: Namespace, state: Optional[BuildState] = None) -> int:
+    """
+    Generate the outputs of a single grammar
+    :param args: The parsed command line arguments
+    :param state: Kept between runs of the same arguments, the automata built is stored in it
+    :return: The exit code
+    """
     grammar_file: str = args.grammar_file
     genExamples: bool = not args.no_examples
     strict: bool = args.strict
@@ -44,42 +166,158 @@ def main():
 
     if not os.path.exists(grammar_file):
         hermes_logs.err("Cannot open grammar file:", grammar_file)
-        exit(1)
+        return 1
 
-    try:
-        grammar = parse_grammar(grammar_file)
-    except HermesError as err:
-        hermes_logs.err("Cannot parse grammar:", str(err))
-        exit(1)
+    if args.incremental and len(args.snapshot) == 0:
+        hermes_logs.err("--incremental needs a --snapshot file to reuse the automata of")
+        return 1
 
-    try:
-        lalr = LALR1Automata(grammar)
-    except HermesError as err:
-        hermes_logs.err("Unable to compute LALR(1) Automata:", str(err))
-        exit(1)
+    if args.from_snapshot:
+        # The snapshot already holds the tables, nothing is rebuilt
+        for flag, value in [
+            ("--mode", args.mode),
+            ("--lalr-engine", args.lalr_engine),
+            ("--mode-stats", args.mode_stats),
+        ]:
+            if value:
+                hermes_logs.err(f"{flag} cannot be used with --from-snapshot")
+                return 1
 
-    if len(args.automata) > 0:
-        writeDescription(args.automata, lalr)
+    mode: str = args.mode if args.mode is not None else Mode.lalr
+    laEngine: str = args.lalr_engine if args.lalr_engine is not None else LAEngine.deremer_pennello
 
-    try:
-        parseTable = ParseTable(lalr)
-    except HermesError as err:
-        hermes_logs.err("Unable to generate parse table:", str(err))
-        exit(1)
+    # The filename of each requested output
+    outputs = {
+        kind: filename
+        for kind, filename in [
+            ("automata", args.automata),
+            ("table", args.table),
+            ("loader", args.loader),
+            ("impl", args.impl),
+            ("pybind", args.pybind),
+            ("python_stubs", args.python_stubs),
+        ] if len(filename) > 0
+    }
+
+    cache: Optional['GenerationCache'] = None
+    # Mode stats include timings, so always regenerate
+    # Snapshots are binary, so they are not cached
+    if len(args.cache_dir) > 0 and not args.mode_stats and len(args.snapshot) == 0:
+        options = {
+            "name": args.name,
+            "mode": mode,
+            "lalr_engine": laEngine,
+            "no_examples": str(args.no_examples),
+            "example_time_limit": str(args.example_time_limit),
+            "example_config_limit": str(args.example_config_limit),
+            "strict": str(args.strict),
+            "hide_conflicts": str(args.hide_conflicts),
+            "no_color": str(args.no_color),
+            "from_snapshot": str(args.from_snapshot),
+        }
+        from hermes_gen.cache import GenerationCache
+        cache = GenerationCache(args.cache_dir, grammar_file, options)
+        if cache.restore(outputs):
+            return 0
+        hermes_logs.startRecording()
+
+    if args.from_snapshot:
+        from hermes_gen.snapshot import Snapshot
+        try:
+            snapshot = Snapshot(grammar_file)
+            grammar = snapshot.grammar
+            automata = snapshot.automata
+            parseTable = snapshot.parseTable
+        except HermesError as err:
+            hermes_logs.err("Cannot load snapshot:", str(err))
+            return 1
+
+        if len(args.automata) > 0:
+            writeDescription(args.automata, automata)  # type: ignore
+    else:
+        try:
+            grammar = parse_grammar(grammar_file)
+        except HermesError as err:
+            hermes_logs.err("Cannot parse grammar:", str(err))
+            return 1
+
+        if args.mode_stats:
+            try:
+                printModeStats(grammar, laEngine)
+            except HermesError as err:
+                hermes_logs.err("Unable to compute automata:", str(err))
+                return 1
+
+        previous: Optional[LALR1Automata] = None
+        if state is not None and state.automata is not None:
+            previous = state.automata
+        elif args.incremental and os.path.exists(args.snapshot):
+            from hermes_gen.snapshot import Snapshot
+            try:
+                previous = Snapshot(args.snapshot).automata  # type: ignore
+            except HermesError as err:
+                hermes_logs.warn("Cannot load previous snapshot, building every state:", str(err))
+
+        try:
+            automata = buildAutomata(grammar, mode, laEngine, previous)
+        except HermesError as err:
+            hermes_logs.err(f"Unable to compute {mode} Automata:", str(err))
+            return 1
+
+        if state is not None:
+            state.automata = automata
+
+        if len(args.automata) > 0:
+            writeDescription(args.automata, automata)
+
+        try:
+            parseTable = ParseTable(automata)
+        except HermesError as err:
+            hermes_logs.err("Unable to generate parse table:", str(err))
+            return 1
+
+    if len(args.snapshot) > 0:
+        folder, _ = os.path.split(args.snapshot)
+        if len(folder) > 0:
+            os.makedirs(folder, exist_ok=True)
+        from hermes_gen.snapshot import writeSnapshot
+        writeSnapshot(args.snapshot, grammar, automata, parseTable)  # type: ignore
 
     if len(parseTable.conflicts) > 0:
         if not hideConflicts:
             if genExamples:
-                ceGen = CounterExampleGen(lalr)
-                for conflict in parseTable.conflicts:
-                    ce = ceGen.generate_counterexample(conflict)
-                    msg = ce.prettyPrint(colors)
-                    if strict:
-                        hermes_logs.err(f'Conflict detected in {conflict.node}')
-                    else:
-                        hermes_logs.warn(f'Conflict detected in {conflict.node}')
+                if args.jobs > 1 and len(parseTable.conflicts) > 1:
+                    from hermes_gen.counterexample.parallel import generateCounterExamples
+                    examples = generateCounterExamples(
+                        grammar,
+                        automata,  # type: ignore
+                        parseTable,
+                        colors,
+                        args.jobs,
+                        args.example_time_limit,
+                        args.example_config_limit,
+                    )
+                else:
+                    examples = _generateSerial(
+                        automata,  # type: ignore
+                        parseTable,
+                        colors,
+                        args.example_time_limit,
+                        args.example_config_limit,
+                    )
+
+                # zip() stops at the last conflict without resuming the generator, close it
+                # so the worker pool shuts down as soon as the last example is printed
+                with contextlib.closing(examples):
+                    for conflict, (printed, msg) in zip(parseTable.conflicts, examples):
+                        if len(printed) > 0:
+                            print(printed, end="")
+                        if strict:
+                            hermes_logs.err(f'Conflict detected in {conflict.node}')
+                        else:
+                            hermes_logs.warn(f'Conflict detected in {conflict.node}')
 
-                    hermes_logs.info(msg + "\n")
+                        hermes_logs.info(msg + "\n")
             else:
                 for conflict in parseTable.conflicts:
                     if strict:
@@ -89,7 +327,7 @@ def main():
 
         if strict:
             hermes_logs.err("Strict mode enabled and conflicts found, refusing to generate parser")
-            exit(2)
+            return 2
 
     tableFile: str = args.table
     loaderHeaderFile: str = args.loader
@@ -103,18 +341,135 @@ def main():
             folder, _ = os.path.split(file)
             os.makedirs(folder, exist_ok=True)
 
+    from hermes_gen.writers import loader, table, pybind
+
     if len(tableFile) > 0:
-        table.writeParseTable(tableFile, grammar, parseTable)
+        try:
+            table.writeParseTable(tableFile, grammar, parseTable)
+        except HermesError as err:
+            hermes_logs.err("Unable to write parse table:", str(err))
+            return 1
     if len(loaderImplFile) > 0 or len(loaderHeaderFile) > 0:
         if len(loaderHeaderFile) == 0 or len(loaderImplFile) == 0:
             hermes_logs.err("Please specify both -l and -i")
-            exit(1)
+            return 1
         loader.writeLoader(loaderHeaderFile, loaderImplFile, name, grammar)
     if len(pybindFile) > 0:
         pybind.writePybindModule(pybindFile, grammar, name)
     if len(pythonStubsfile) > 0:
         pybind.writePythonStubs(pythonStubsfile, grammar, name)
 
+    if cache is not None:
+        cache.store(outputs, hermes_logs.stopRecording())
+
+    return 0
+
+
+def readManifest(filename: str) -> List[List[str]]:
+    """
+    Read a batch manifest. Each line holds the command line arguments of one grammar,
+    quoted like a shell command. Blank lines and lines starting with # are skipped
+    :return: The arguments of each grammar
+    """
+    out: List[List[str]] = []
+    with open(filename, mode='r') as f:
+        for lineNum, line in enumerate(f, 1):
+            line = line.strip()
+            if len(line) == 0 or line.startswith("#"):
+                continue
+            try:
+                out.append(shlex.split(line))
+            except ValueError as err:
+                raise HermesError(f"{filename}:{lineNum} {err}")
+    return out
+
+
+def generateEntry(argv: List[str], state: Optional[BuildState] = None) -> Tuple[int, str, str]:
+    """
+    Generate one grammar of a batch, capturing its output
+    :param state: See generate()
+    :return: The exit code, and the stdout and stderr output.
+        Unexpected errors are an exit code of 1, with the traceback in stderr
+    """
+    stdout = io.StringIO()
+    stderr = io.StringIO()
+    with contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(stderr):
+        try:
+            args = makeParser().parse_args(argv)
+            if len(args.batch) > 0 or len(args.serve) > 0:
+                hermes_logs.err("--batch and --serve cannot be used for a single grammar")
+                code = 1
+            else:
+                code = generate(args, state)
+        except SystemExit as err:
+            # Invalid arguments
+            code = err.code if isinstance(err.code, int) else 1
+        except Exception:
+            # Keep going with the rest of a batch, or the next request to a server
+            import traceback
+            traceback.print_exc()
+            code = 1
+        finally:
+            # Early returns can leave the cache recording
+            hermes_logs.stopRecording()
+    return code, stdout.getvalue(), stderr.getvalue()
+
+
+def generateBatch(entries: List[List[str]], jobs: int) -> int:
+    """
+    Generate many grammars in one process, or a pool of worker processes
+    Output is printed in the same order as the entries
+    :param entries: The command line arguments of each grammar
+    :param jobs: The number of grammars to generate at once
+    :return: The largest exit code of any grammar
+    """
+    from concurrent.futures import ProcessPoolExecutor
+
+    if jobs > 1 and len(entries) > 1:
+        executor: Optional[ProcessPoolExecutor] = ProcessPoolExecutor(max_workers=min(jobs, len(entries)))
+        results = executor.map(generateEntry, entries)  # type: ignore
+    else:
+        executor = None
+        results = map(generateEntry, entries)
+
+    out = 0
+    try:
+        for code, stdout, stderr in results:
+            sys.stdout.write(stdout)
+            sys.stderr.write(stderr)
+            out = max(out, code)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    return out
+
+
+def main():
+    parser = makeParser()
+    args = parser.parse_args()
+
+    if len(args.serve) > 0:
+        from hermes_gen.server import GenerationServer
+        hermes_logs.enableColors(not args.no_color)
+        GenerationServer(args.serve).serve()
+        exit(0)
+
+    if len(args.batch) > 0:
+        if len(args.grammar_file) > 0:
+            parser.error("grammar_file cannot be used with --batch")
+        hermes_logs.enableColors(not args.no_color)
+        try:
+            entries = readManifest(args.batch)
+        except (OSError, HermesError) as err:
+            hermes_logs.err("Cannot read batch manifest:", str(err))
+            exit(1)
+        exit(generateBatch(entries, args.jobs))
+
+    if len(args.grammar_file) == 0:
+        parser.error("the following arguments are required: grammar_file")
+
+    exit(generate(args))
+
 
 if __name__ == '__main__':
     main()
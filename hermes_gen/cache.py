@@ -0,0 +1,136 @@
+from typing import Dict, List, Set
+import hashlib
+import json
+import os
+import re
+
+from hermes_gen.writers.utils import writeIfChanged
+from hermes_gen import hermes_logs
+
+# Bump if the format of the cache entries changes
+CACHE_FORMAT = 1
+
+_IMPORT_RE = re.compile(r'^[ \t]*%import[ \t]+(\S+)', re.MULTILINE)
+
+
+def generatorVersion() -> str:
+    """
+    Get a hash of the source of the generator, so any change to it invalidates the cache
+    """
+    h = hashlib.sha256()
+    root = os.path.dirname(__file__)
+    for folder, dirs, files in os.walk(root):
+        dirs.sort()
+        for filename in sorted(files):
+            if not filename.endswith(".py"):
+                continue
+            path = os.path.join(folder, filename)
+            h.update(os.path.relpath(path, root).encode())
+            with open(path, mode='rb') as f:
+                h.update(f.read())
+
+    return h.hexdigest()
+
+
+def grammarFiles(rootfile: str) -> List[str]:
+    """
+    Find the root grammar file and every file it imports.
+    This only looks for %import directives, so it may find more files than the
+    grammar actually uses, which only makes the cache more conservative
+    """
+    out: List[str] = []
+    seen: Set[str] = set()
+    queue = [rootfile]
+    while len(queue) > 0:
+        filename = queue.pop(0)
+        if filename in seen:
+            continue
+        seen.add(filename)
+        out.append(filename)
+
+        try:
+            with open(filename, mode='r') as f:
+                text = f.read()
+        except (OSError, UnicodeDecodeError):
+            continue
+
+        dirname = os.path.dirname(filename)
+        for m in _IMPORT_RE.finditer(text):
+            queue.append(os.path.join(dirname, m.group(1)))
+
+    return out
+
+
+class GenerationCache:
+    """
+    On disk cache of generated files, keyed by a hash of the grammar files,
+    the options that change the outputs, and the generator itself
+    """
+
+    def __init__(self, cacheDir: str, grammarFile: str, options: Dict[str, str]) -> None:
+        """
+        :param cacheDir: The folder to store entries in
+        :param grammarFile: The root grammar file
+        :param options: Every option that changes the generated files or messages
+        """
+        self.cacheDir = cacheDir
+
+        h = hashlib.sha256()
+        h.update(f'{CACHE_FORMAT}\n{generatorVersion()}\n'.encode())
+        for key in sorted(options):
+            h.update(f'{key}={options[key]}\n'.encode())
+
+        for filename in grammarFiles(grammarFile):
+            h.update(filename.encode() + b'\n')
+            try:
+                with open(filename, mode='rb') as f:
+                    h.update(hashlib.sha256(f.read()).hexdigest().encode())
+            except OSError:
+                h.update(b'missing')
+            h.update(b'\n')
+
+        self.key = h.hexdigest()
+        self.entryFile = os.path.join(cacheDir, f'{self.key}.json')
+
+    def restore(self, outputs: Dict[str, str]) -> bool:
+        """
+        Write the cached files, and replay the messages from generating them
+        :param outputs: The filename to write for each kind of output
+        :return: True if the entry exists and contains every requested output
+        """
+        try:
+            with open(self.entryFile, mode='r') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return False
+
+        files: Dict[str, str] = entry["files"]
+        if any(kind not in files for kind in outputs):
+            return False
+
+        for kind, filename in outputs.items():
+            folder = os.path.dirname(filename)
+            if len(folder) > 0:
+                os.makedirs(folder, exist_ok=True)
+            writeIfChanged(filename, files[kind])
+
+        hermes_logs.replay(entry["log"])
+        return True
+
+    def store(self, outputs: Dict[str, str], log: List[str]):
+        """
+        Add the generated files to the cache
+        :param outputs: The filename written for each kind of output
+        :param log: The messages printed while generating
+        """
+        files: Dict[str, str] = {}
+        for kind, filename in outputs.items():
+            with open(filename, mode='r') as f:
+                files[kind] = f.read()
+
+        os.makedirs(self.cacheDir, exist_ok=True)
+        # Write to a temp file first so a concurrent reader never sees a partial entry
+        tempFile = f'{self.entryFile}.{os.getpid()}.tmp'
+        with open(tempFile, mode='w') as f:
+            json.dump({"files": files, "log": log}, f)
+        os.replace(tempFile, self.entryFile)
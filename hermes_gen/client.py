@@ -0,0 +1,103 @@
+"""
+Send command line arguments to a running generator server, see server.py
+
+    python -m hermes_gen.client ADDRESS [generator arguments...]
+    python -m hermes_gen.client ADDRESS --stop-server
+
+Generates in this process instead if no server is listening on the address.
+Only imports the generator when it has to, so requests start quickly.
+
+The server writes a random key next to its address, readable only by the user
+that started it. Connections are authenticated with it, so other users cannot
+make the server write files.
+"""
+from typing import List, Tuple
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Client, Connection
+import json
+import os
+import sys
+import tempfile
+
+# Prefix of a named pipe address on Windows
+_PIPE_PREFIX = '\\\\.\\pipe\\'
+
+
+def keyFilename(address: str) -> str:
+    """
+    Get the file the server stores its authentication key in
+    :param address: The address the server is listening on
+    """
+    if address.startswith(_PIPE_PREFIX):
+        # Named pipes are not files, so there is nothing to put the key next to
+        return os.path.join(tempfile.gettempdir(), address[len(_PIPE_PREFIX):] + ".key")
+    return address + ".key"
+
+
+def _connect(address: str) -> Connection:
+    """
+    :raises OSError: If the server is not running
+    """
+    with open(keyFilename(address), mode='rb') as f:
+        authkey = f.read()
+    return Client(address, authkey=authkey)
+
+
+def request(address: str, argv: List[str], cwd: str) -> Tuple[int, str, str]:
+    """
+    Generate the arguments in the server
+    :param address: The address the server is listening on
+    :param argv: The command line arguments
+    :param cwd: The folder relative paths in the arguments are relative to
+    :return: The exit code, and the stdout and stderr output
+    :raises OSError: If the server is not running
+    :raises AuthenticationError: If the key file is from another server
+    """
+    with _connect(address) as conn:
+        conn.send_bytes(json.dumps({"argv": argv, "cwd": cwd}).encode())
+        response = json.loads(conn.recv_bytes())
+    return response["code"], response["stdout"], response["stderr"]
+
+
+def stopServer(address: str):
+    """
+    :raises OSError: If the server is not running
+    :raises AuthenticationError: If the key file is from another server
+    """
+    with _connect(address) as conn:
+        conn.send_bytes(json.dumps({"stop": True}).encode())
+        conn.recv_bytes()
+
+
+def main():
+    if len(sys.argv) < 2:
+        print("usage: python -m hermes_gen.client ADDRESS [generator arguments...]", file=sys.stderr)
+        exit(2)
+
+    address = sys.argv[1]
+    argv = sys.argv[2:]
+    if len(argv) > 0 and argv[0] == "--":
+        argv = argv[1:]
+
+    if argv == ["--stop-server"]:
+        try:
+            stopServer(address)
+        except (OSError, EOFError, AuthenticationError):
+            print(f"No server listening on {address}", file=sys.stderr)
+            exit(1)
+        exit(0)
+
+    try:
+        code, stdout, stderr = request(address, argv, os.getcwd())
+    except (OSError, EOFError, AuthenticationError):
+        # No server, generate here
+        from hermes_gen.__main__ import generateEntry
+        code, stdout, stderr = generateEntry(argv)
+
+    sys.stdout.write(stdout)
+    sys.stderr.write(stderr)
+    exit(code)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,170 @@
+"""
+Compress a parse table for the generated parser, see hermes_cpp/inc/hermes/internal/grammar.h
+
+Terminal actions use row displacement, or comb vectors, as described in
+'Storing a Sparse Table' [Tarjan, Yao] (1979). The rows of every state are
+overlapped in a single vector, each row starts at its own base, and a check
+vector tells which column each entry belongs to. The default reduction of
+each state replaces its errors, and is left out of the vector. Terminals with
+the same action in every state share a column, see ParseTable.computeTerminalClasses()
+
+Gotos are stored per nonterminal, as the most common target state, and a
+list of the states that go somewhere else.
+"""
+from typing import Dict, List, Tuple
+from collections import Counter
+
+from hermes_gen.errors import HermesError
+from hermes_gen.parseTable import ParseTable, ParseAction, Action, RowType
+
+# Check value of an unused entry, no column has this index
+NO_COLUMN = 0xFFFF
+# Default reduction of a state without one
+NO_RULE = 0xFFFF
+# States are stored as unsigned shorts by the runtime
+MAX_STATES = 0xFFFF
+
+
+class CompressedTable:
+
+    def __init__(self, table: ParseTable) -> None:
+        self.numRows = len(table.table)
+        # The start symbol does not have a column
+        self.numCols = len(table.symbolList) - 1
+        # Nonterminal columns come first
+        self.numNonterms = len(table.nonterminals)
+        self.numTerminals = self.numCols - self.numNonterms
+        # The column of each terminal in the vector, by terminal column minus the number of nonterminals
+        self.terminalClasses = list(table.terminalClasses)
+        self.numClasses = len(table.classColumns)
+
+        numRules = len(table.automata.grammar.rules)
+        if self.numRows > MAX_STATES or self.numTerminals >= NO_COLUMN or numRules >= NO_RULE:
+            raise HermesError(
+                f"Parse table is too large to compress: {self.numRows} states, "
+                f"{self.numTerminals} terminals, {numRules} rules"
+            )
+
+        # The rule of the default reduction of each state, NO_RULE if there is none,
+        # and whether it is the only action, see ParseTable.computeDefaultReductions()
+        self.defaultReductions = [NO_RULE if x < 0 else x for x in table.defaultReductions]
+        self.consistent = list(table.consistent)
+
+        # The action of a state on terminal class c is actions[actionBase[state] + c]
+        # if actionCheck[actionBase[state] + c] == c, otherwise it is the default reduction
+        self.actionBase: List[int] = []
+        self.actions: List[ParseAction] = []
+        self.actionCheck: List[int] = []
+        self._packActions(table)
+
+        # The goto of nonterminal n is defaultGotos[n], unless the state is
+        # in gotos[gotoStart[n]:gotoStart[n + 1]] as (state, target), sorted by state
+        self.defaultGotos: List[int] = []
+        self.gotoStart: List[int] = [0]
+        self.gotos: List[Tuple[int, int]] = []
+        self._packGotos(table)
+
+    @staticmethod
+    def _terminalEntries(row: RowType, classColumns: List[int], default: ParseAction) -> List[Tuple[int, ParseAction]]:
+        """
+        Get the actions of a row that are not the default action, by terminal class
+        """
+        entries = [(idx, row[col]) for idx, col in enumerate(classColumns)]
+        return [(idx, x) for idx, x in entries if x.action != Action.E and x != default]
+
+    def _packActions(self, table: ParseTable):
+        rows = [
+            self._terminalEntries(row, table.classColumns, table.getDefaultAction(idx))
+            for idx, row in enumerate(table.table)
+        ]
+        self.actionBase = [0] * len(rows)
+
+        # Identical rows share their entries
+        bases: Dict[Tuple[Tuple[int, str, int], ...], int] = {}
+        usedBases = set()
+        # Fit the densest rows first, they are the hardest to place
+        order = sorted(range(len(rows)), key=lambda x: (-len(rows[x]), x))
+
+        # Bit i is set if entry i is used
+        used = 0
+        for state in order:
+            entries = rows[state]
+            key = tuple((col, x.action, x.state) for col, x in entries)
+            try:
+                self.actionBase[state] = bases[key]
+                continue
+            except KeyError:
+                pass
+
+            # Rows with different entries need different bases, otherwise a column
+            # that is empty in one row would find the entry of the other
+            mask = 0
+            for col, _ in entries:
+                mask |= 1 << col
+            first = entries[0][0] if len(entries) > 0 else 0
+
+            # Every entry before the lowest free entry is used
+            lowestFree = (~used & (used + 1)).bit_length() - 1
+            base = max(lowestFree - first, 0)
+            while True:
+                # Skip to the next base where the first entry is free
+                free = ~used >> (base + first)
+                base += (free & -free).bit_length() - 1
+                if base not in usedBases and (used >> base) & mask == 0:
+                    break
+                base += 1
+
+            used |= mask << base
+            end = base + self.numClasses
+            if end > len(self.actionCheck):
+                self.actions.extend(ParseAction() for _ in range(end - len(self.actionCheck)))
+                self.actionCheck.extend([NO_COLUMN] * (end - len(self.actionCheck)))
+
+            for col, action in entries:
+                self.actions[base + col] = action
+                self.actionCheck[base + col] = col
+
+            usedBases.add(base)
+            bases[key] = base
+            self.actionBase[state] = base
+
+    def _packGotos(self, table: ParseTable):
+        for col in range(self.numNonterms):
+            targets = [(state, row[col].state) for state, row in enumerate(table.table) if row[col].action == Action.G]
+
+            counts = Counter(target for _, target in targets)
+            # Break ties by the lowest state, so the output does not depend on the order
+            default = min(counts, key=lambda x: (-counts[x], x)) if len(counts) > 0 else 0
+
+            self.defaultGotos.append(default)
+            self.gotos.extend((state, target) for state, target in targets if target != default)
+            self.gotoStart.append(len(self.gotos))
+
+    def getAction(self, state: int, col: int) -> ParseAction:
+        """
+        Look up an action the same way as the generated parser
+        :param state: The row of the table
+        :param col: The column of the table, see ParseTable.symbolColumns
+        """
+        if col < self.numNonterms:
+            for gotoState, target in self.gotos[self.gotoStart[col]:self.gotoStart[col + 1]]:
+                if gotoState == state:
+                    return ParseAction(Action.G, target)
+            return ParseAction(Action.G, self.defaultGotos[col])
+
+        terminalClass = self.terminalClasses[col - self.numNonterms]
+        idx = self.actionBase[state] + terminalClass
+        if self.actionCheck[idx] == terminalClass:
+            return self.actions[idx]
+        if self.defaultReductions[state] != NO_RULE:
+            return ParseAction(Action.R, self.defaultReductions[state])
+        return ParseAction()
+
+    def byteSize(self) -> int:
+        """
+        :return: The size of the table in the generated parser
+        """
+        # See DefaultReduction, ParseAction, and GotoEntry in grammar.h
+        return 2 * len(self.terminalClasses) + 4 * len(self.defaultReductions) + 4 * len(self.actionBase) + \
+            4 * len(self.actions) + 2 * len(self.actionCheck) + \
+            2 * len(self.defaultGotos) + 4 * len(self.gotoStart) + 4 * len(self.gotos)
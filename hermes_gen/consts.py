@@ -3,3 +3,9 @@ ERROR = "ERROR"
 END = "__EOF__"
 START = "__START__"
 ARG_VECTOR = "values"
+
+# Default limits of the counterexample search, see CounterExampleGen
+TIME_LIMIT_SEC = 5
+# Configurations to search for each counterexample before giving up,
+# bounds the memory used by the search
+CONFIG_LIMIT = 500000
@@ -1,28 +1,28 @@
-from collections import deque
-from typing import Deque, Set, Optional, List
+from typing import Reversible, Set, Optional, List
 import heapq
 
 from ..lalr1_automata import Node, AnnotRule
 from ..grammar import Symbol
 from ..errors import HermesError
-from .stateItem import StateItem, intersect, intersectSet
+from .stateItem import StateItem, intersectSet
 from .derivation import Derivation, DOT
+from .persistentDeque import PersistentDeque
 from . import costs
-from .utils import sliceDeque
 
 
-def countProductionSteps(items: Deque[StateItem], last: StateItem):
+def countProductionSteps(items: Reversible[StateItem], last: StateItem):
     count = 0
     lastState = last.node
+    # Nodes of an automata are all distinct, so compare by identity instead of by items
     for x in reversed(items):
-        if x.node == lastState:
+        if x.node is lastState:
             count += 1
         lastState = x.node
     return count
 
 
 def nullableClosure(
-    rule: AnnotRule, pos: int, siLast: StateItem, states: Deque[StateItem], derivs: Deque[Derivation]
+    rule: AnnotRule, pos: int, siLast: StateItem, states: List[StateItem], derivs: List[Derivation]
 ) -> None:
     for i in range(pos, len(rule)):
         symbol = rule[i]
@@ -31,17 +31,22 @@ def nullableClosure(
         if siLast.transItem is None:
             break
         siLast = siLast.transItem
-        derivs.append(Derivation(symbol, []))
+        derivs.append(Derivation.make(symbol, []))
         states.append(siLast)
 
 
 class Configuration:
+    """
+    A search state of the counterexample search.
+    The paths are persistent, so copying a configuration is O(1) and the
+    successors share everything they do not change.
+    """
 
     def __init__(self) -> None:
-        self.states1: Deque[StateItem] = deque()
-        self.states2: Deque[StateItem] = deque()
-        self.derivs1: Deque[Derivation] = deque()
-        self.derivs2: Deque[Derivation] = deque()
+        self.states1: PersistentDeque[StateItem] = PersistentDeque()
+        self.states2: PersistentDeque[StateItem] = PersistentDeque()
+        self.derivs1: PersistentDeque[Derivation] = PersistentDeque()
+        self.derivs2: PersistentDeque[Derivation] = PersistentDeque()
         self.complexity = 0
         # The number of production steps made since the reduce conflict item.
         #   If this is -1, the reduce conflict item has been completed.
@@ -53,10 +58,10 @@ class Configuration:
 
     def copy(self) -> 'Configuration':
         out = Configuration()
-        out.states1 = self.states1.copy()
-        out.states2 = self.states2.copy()
-        out.derivs1 = self.derivs1.copy()
-        out.derivs2 = self.derivs2.copy()
+        out.states1 = self.states1
+        out.states2 = self.states2
+        out.derivs1 = self.derivs1
+        out.derivs2 = self.derivs2
         out.complexity = self.complexity
         out.reduceDepth = self.reduceDepth
         out.shiftDepth = self.shiftDepth
@@ -78,12 +83,12 @@ class Configuration:
         if nextSym1 is None:
             si1lookahead = si1src.rule.lookAhead
         else:
-            si1lookahead = {nextSym1}
+            si1lookahead = nextSym1.bit
 
         if nextSym2 is None:
             si2lookahead = si2src.rule.lookAhead
         else:
-            si2lookahead = {nextSym2}
+            si2lookahead = nextSym2.bit
 
         prev1: Optional[Set[Optional[StateItem]]] = None
         prev2: Optional[Set[Optional[StateItem]]] = None
@@ -105,30 +110,32 @@ class Configuration:
 
                 if psi1 == si1src and psi2 == si2src:
                     continue
-                if psi1.node != psi2.node:
+                # Nodes of an automata are all distinct, so compare by identity instead of by items
+                if psi1.node is not psi2.node:
                     continue
                 copy = self.copy()
                 if psis1 is not None:
-                    copy.states1.appendleft(psis1)
+                    copy.states1 = copy.states1.appendleft(psis1)
                 if psis2 is not None:
-                    copy.states2.appendleft(psis2)
-                if psis1 is not None and psis1.rule.parseIndex + 1 == copy.states1[1].rule.parseIndex:
-                    if psis2 is not None and psis2.rule.parseIndex + 1 == copy.states2[1].rule.parseIndex:
+                    copy.states2 = copy.states2.appendleft(psis2)
+                # The sources are now the second item of each path
+                if psis1 is not None and psis1.rule.parseIndex + 1 == si1src.rule.parseIndex:
+                    if psis2 is not None and psis2.rule.parseIndex + 1 == si2src.rule.parseIndex:
                         # Both are reverse transitions; add appropriate
                         # derivation of the corresponding symbol used for
                         # the reverse transition.
-                        copy.derivs1.appendleft(Derivation(sym))
-                        copy.derivs2.appendleft(Derivation(sym))
+                        copy.derivs1 = copy.derivs1.appendleft(Derivation.make(sym))
+                        copy.derivs2 = copy.derivs2.appendleft(Derivation.make(sym))
                     else:
                         continue
-                elif psis2 is not None and psis2.rule.parseIndex + 1 == copy.states2[1].rule.parseIndex:
+                elif psis2 is not None and psis2.rule.parseIndex + 1 == si2src.rule.parseIndex:
                     continue
                 # At this point, either reverse transition is made on both paths,
                 # or reverse production is made on both paths.
                 # Now, compute the complexity of the new search state.
                 prependSize = (0 if psis1 is None else 1) + (0 if psis2 is None else 1)
-                productionSteps = 0 if psis1 is None else countProductionSteps(deque([psis1]), si1src)
-                productionSteps += 0 if psis2 is None else countProductionSteps(deque([psis2]), si2src)
+                productionSteps = 0 if psis1 is None else countProductionSteps([psis1], si1src)
+                productionSteps += 0 if psis2 is None else countProductionSteps([psis2], si2src)
                 copy.complexity += costs.UNSHIFT_COST * (prependSize - productionSteps)
                 copy.complexity += costs.PRODUCTION_COST * productionSteps
                 if not guided1 or not guided2:
@@ -146,24 +153,22 @@ class Configuration:
             raise HermesError("Configuration.reduce1() Cannot reduce item without dot at end")
         out: List[Configuration] = []
 
-        symbolSet = {nextSym} if nextSym is not None else item.lookAhead
+        symbolSet = nextSym.bit if nextSym is not None else item.lookAhead
 
-        if not intersectSet(item.lookAhead, symbolSet):
+        if not intersectSet(states[-1].graph.symbols, item.lookAhead, symbolSet):
             return out
 
         lhs = item.rule.nonterm
         ruleLen = len(item)
-        dSize = len(derivs)
 
-        deriv = Derivation(lhs, list(sliceDeque(self.derivs1, dSize - ruleLen, dSize)))
+        children = derivs.lastItems(ruleLen)
         if self.reduceDepth == 0:
             # We are reducing the reduce conflict item.
             # Add a dot for visual inspection of the resulting counterexample.
-            if deriv.deriv is not None:
-                deriv.deriv.append(DOT)
+            children.append(DOT)
+        deriv = Derivation.make(lhs, children)
 
-        derivs = sliceDeque(derivs, 0, dSize - ruleLen)
-        derivs.append(deriv)
+        derivs = derivs.dropLast(ruleLen).append(deriv)
         if sSize == ruleLen + 1:
             # The head StateItem is a production item, so we need to prepend
             # with possible source StateItems.
@@ -171,12 +176,11 @@ class Configuration:
             for psis in prev:
                 copy = self.copy()
                 copy.derivs1 = derivs
-                copy.states1 = sliceDeque(self.states1, 0, sSize - ruleLen - 1)
-                copy.states1.extendleft(reversed(psis))
+                copy.states1 = PersistentDeque(psis)
                 dst = copy.states1[-1].transItem
                 if dst is None:
                     raise RuntimeError("Configuration.reduce1() Transition item not setup")
-                copy.states1.append(dst)
+                copy.states1 = copy.states1.append(dst)
 
                 pSteps = countProductionSteps(copy.states1, states[0])
                 copy.complexity += costs.UNSHIFT_COST * (len(copy.states1) - pSteps)
@@ -187,12 +191,12 @@ class Configuration:
         else:
             copy = self.copy()
             copy.derivs1 = derivs
-            copy.states1 = sliceDeque(self.states1, 0, sSize - ruleLen - 1)
+            copy.states1 = self.states1.dropLast(ruleLen + 1)
             # copy.states1.append(StateItem.FWD_TRANS[copy.states1[-1]][lhs])
             dst = copy.states1[-1].transItem
             if dst is None:
                 raise RuntimeError("Configuration.reduce1() Transition item not setup")
-            copy.states1.append(dst)
+            copy.states1 = copy.states1.append(dst)
             copy.complexity += costs.REDUCE_COST
             if copy.reduceDepth == 0:
                 copy.reduceDepth -= 1
@@ -202,16 +206,14 @@ class Configuration:
         finalizedResult = []
         for ss in out:
             nextS = ss.states1[-1]
-            derivs1 = deque()
-            states1 = deque()
+            derivs1: List[Derivation] = []
+            states1: List[StateItem] = []
             nullableClosure(nextS.rule, nextS.rule.parseIndex, nextS, states1, derivs1)
             finalizedResult.append(ss)
             for i in range(1, len(derivs1)):
-                subderivs1 = sliceDeque(derivs1, 0, i)
-                substates1 = sliceDeque(states1, 0, i)
                 copy = ss.copy()
-                copy.derivs1.extend(subderivs1)
-                copy.states1.extend(substates1)
+                copy.derivs1 = copy.derivs1.extend(derivs1[:i])
+                copy.states1 = copy.states1.extend(states1[:i])
                 finalizedResult.append(copy)
 
         return finalizedResult
@@ -224,22 +226,20 @@ class Configuration:
         if not item.indexAtEnd():
             raise HermesError("Configuration.reduce2() Cannot reduce item without dot at end")
         out: List[Configuration] = []
-        symbolSet = item.lookAhead if nextSym is None else {nextSym}
-        if len(symbolSet & item.lookAhead) == 0:
+        symbolSet = item.lookAhead if nextSym is None else nextSym.bit
+        if symbolSet & item.lookAhead == 0:
             return out
         lhs = item.rule.nonterm
         ruleLen = len(item)
-        dSize = len(derivs)
-        deriv = Derivation(item.rule.nonterm, list(sliceDeque(derivs, dSize - ruleLen, dSize)))
+        children = derivs.lastItems(ruleLen)
         if self.shiftDepth == 0:
             # We are reducing the shift conflict item (for shift/reduce conflict),
             # or the other reduce conflict item (for reduce/reduce conflict).
             # Add a dot for visual inspection of the resulting counterexample.
-            if deriv.deriv is not None:
-                deriv.deriv.append(DOT)
+            children.append(DOT)
+        deriv = Derivation.make(item.rule.nonterm, children)
 
-        derivs = sliceDeque(derivs, 0, dSize - ruleLen)
-        derivs.append(deriv)
+        derivs = derivs.dropLast(ruleLen).append(deriv)
         if sSize == ruleLen + 1:
             # The head StateItem is a production item, so we need to prepend
             # with possible source StateItems.
@@ -247,12 +247,11 @@ class Configuration:
             for psis in prev:
                 copy = self.copy()
                 copy.derivs2 = derivs
-                copy.states2 = sliceDeque(states, 0, sSize - ruleLen - 1)
-                copy.states2.extendleft(reversed(psis))
+                copy.states2 = PersistentDeque(psis)
                 dst = copy.states2[-1].transItem
                 if dst is None:
                     raise RuntimeError("Configuration.reduce2() Transition item not setup")
-                copy.states2.append(dst)
+                copy.states2 = copy.states2.append(dst)
 
                 pSteps = countProductionSteps(copy.states2, states[0])
                 copy.complexity += costs.SHIFT_COST * (len(copy.states2) - pSteps)
@@ -263,11 +262,11 @@ class Configuration:
         else:
             copy = self.copy()
             copy.derivs2 = derivs
-            copy.states2 = sliceDeque(states, 0, sSize - ruleLen - 1)
+            copy.states2 = states.dropLast(ruleLen + 1)
             dst = copy.states2[-1].transItem
             if dst is None:
                 raise RuntimeError("Configuration.reduce2() Transition item not setup")
-            copy.states2.append(dst)
+            copy.states2 = copy.states2.append(dst)
             copy.complexity += costs.REDUCE_COST
             if copy.shiftDepth >= 0:
                 copy.shiftDepth -= 1
@@ -276,16 +275,14 @@ class Configuration:
         finalizedResult = []
         for ss in out:
             nextS = ss.states2[-1]
-            derivs2: Deque[Derivation] = deque()
-            states2: Deque[StateItem] = deque()
+            derivs2: List[Derivation] = []
+            states2: List[StateItem] = []
             nullableClosure(nextS.rule, nextS.rule.parseIndex, nextS, states2, derivs2)
             finalizedResult.append(ss)
             for i in range(1, len(derivs2)):
-                subderivs2 = sliceDeque(derivs2, 0, i)
-                substates2 = sliceDeque(states2, 0, i)
                 copy = ss.copy()
-                copy.derivs2.extend(subderivs2)
-                copy.states2.extend(substates2)
+                copy.derivs2 = copy.derivs2.extend(derivs2[:i])
+                copy.states2 = copy.states2.extend(states2[:i])
                 finalizedResult.append(copy)
 
         return finalizedResult
@@ -296,7 +293,7 @@ class Configuration:
         return self.states1 == value.states1 and self.states2 == value.states2
 
     def __hash__(self) -> int:
-        return hash((tuple(self.states1), tuple(self.states2)))
+        return hash((self.states1, self.states2))
 
 
 class ComplexityConfiguration:
@@ -4,3 +4,6 @@ SHIFT_COST = 1
 UNSHIFT_COST = 1
 DUPLICATE_PRODUCTION_COST = 0
 EXTENDED_COST = 10000
+
+# The least complexity any step that advances or reduces an item can add
+MIN_STEP_COST = min(REDUCE_COST, SHIFT_COST, UNSHIFT_COST, PRODUCTION_COST)
@@ -1,32 +1,41 @@
-from collections import deque, defaultdict
+from collections import deque
 from typing import Deque, List, Dict, Set, Tuple, Optional
 import time
 
+from .. import hermes_logs
 from ..grammar import Grammar, Symbol
 from ..lalr1_automata import LALR1Automata, Node, AnnotRule
 from ..errors import HermesError
+from ..consts import TIME_LIMIT_SEC, CONFIG_LIMIT
 
-from .stateItem import StateItem, productionAllowed
+from .stateItem import StateItem, StateItemGraph, productionAllowed
 from .configurations import Configuration, ComplexityQueue, ComplexityConfiguration, nullableClosure
 from .counterexample import CounterExample
 from .conflict import Conflict
 from .derivation import Derivation, DOT
-from .utils import sliceDeque
+from .persistentDeque import PersistentDeque
 from . import costs
 
 ASSURANCE_LIMIT_SEC = 2
-TIME_LIMIT_SEC = 5
 
 
 class CounterExampleGen:
 
     def __init__(self, automata: LALR1Automata) -> None:
         self.automata = automata
-        StateItem.initLookups(automata)
+        self.stateItems = StateItemGraph(automata)
 
         self.timeLimitEnforced = True
+        # Seconds to search for each counterexample before giving up
+        self.timeLimit: float = TIME_LIMIT_SEC
+        # Configurations to search for each counterexample before giving up, None for no limit
+        self.configLimit: Optional[int] = CONFIG_LIMIT
 
         self._conflictSymbol: Symbol = None  # type: ignore
+        # The StateItems each conflict item can be reached from
+        self._eligibleCache: Dict[StateItem, Set[StateItem]] = {}
+        # The number of steps each StateItem needs to reach the end of its rule
+        self._stepsToEndCache: Dict[StateItem, int] = {}
 
     def generate_counterexample(self, conflict: Conflict) -> CounterExample:
         """
@@ -57,38 +66,52 @@ class CounterExampleGen:
         # Actually compute counterexample
         startTime = time.perf_counter()
 
-        # priority queue of search states
+        # priority queue of search states, ordered by their complexity plus an
+        # estimate of the complexity still needed to reach a unifying counterexample (A*)
         pq = ComplexityQueue()
         complexityMap: Dict[int, ComplexityConfiguration] = {}
-        visited: Dict[Tuple[StateItem, ...], Set[Tuple[StateItem, ...]]] = defaultdict(set)
+        numConfigs = 0
+        # The paths of every configuration that has been expanded,
+        # the paths hash in O(1) so this never walks them
+        visited: Set[Tuple[PersistentDeque[StateItem], PersistentDeque[StateItem]]] = set()
 
         def addSearchState(cfg: Configuration):
-            visited1 = visited[tuple(cfg.states1)]
-            if tuple(cfg.states2) in visited1:
+            nonlocal numConfigs
+            if (cfg.states1, cfg.states2) in visited:
                 return
+            numConfigs += 1
+            priority = cfg.complexity + self._remainingComplexity(cfg)
             try:
-                cconfig = complexityMap[cfg.complexity]
+                cconfig = complexityMap[priority]
             except KeyError:
-                cconfig = ComplexityConfiguration(cfg.complexity)
-                complexityMap[cfg.complexity] = cconfig
+                cconfig = ComplexityConfiguration(priority)
+                complexityMap[priority] = cconfig
                 pq.push(cconfig)
             cconfig.add(cfg)
 
         def addVisited(cfg: Configuration):
-            visited1 = visited[tuple(cfg.states1)]
-            visited1.add(tuple(cfg.states2))
+            visited.add((cfg.states1, cfg.states2))
+
+        def partialExample() -> CounterExample:
+            # Out of time or memory, use the best nonunifying example found so far
+            if stage3Result is not None:
+                return self._completeDivergingExamples(conflict, stage3Result, timeout=True)
+            else:
+                return self._exampleFromShortestPath(conflict, shortestConflictPath, True)
 
         initial = Configuration()
-        stateItem1 = StateItem.getStateItem(conflict.node, item1)
-        stateItem2 = StateItem.getStateItem(conflict.node, item2)
-        initial.states1.append(stateItem1)
-        initial.states2.append(stateItem2)
+        stateItem1 = self.stateItems.getStateItem(conflict.node, item1)
+        stateItem2 = self.stateItems.getStateItem(conflict.node, item2)
+        initial.states1 = initial.states1.append(stateItem1)
+        initial.states2 = initial.states2.append(stateItem2)
 
         addSearchState(initial)
         stage3Result: Optional[Configuration] = None
         assurancePrinted = False
         while len(pq) > 0:
             css = pq.pop()
+            # Successors with the same priority go in a new entry, since this one is being iterated
+            complexityMap.pop(css.complexity)
             for cfg in css.configs:
                 si1src = cfg.states1[0]
                 si2src = cfg.states2[0]
@@ -120,14 +143,18 @@ class CounterExampleGen:
                     if not assurancePrinted and dur > ASSURANCE_LIMIT_SEC:
                         print("Looking for conflict counterexamples...")
                         assurancePrinted = True
-                    if dur > TIME_LIMIT_SEC:
+                    if dur > self.timeLimit:
                         print("Time limit exceeded")
-                        if stage3Result is not None:
-                            return self._completeDivergingExamples(conflict, stage3Result, timeout=True)
-                        else:
-                            return self._exampleFromShortestPath(conflict, shortestConflictPath, True)
+                        return partialExample()
                 # end if timelimit
 
+                if self.configLimit is not None and numConfigs > self.configLimit:
+                    hermes_logs.warn(
+                        f"Search limit exceeded for the conflict in {conflict.node} on {conflict.symbol},",
+                        "using a nonunifying counterexample"
+                    )
+                    return partialExample()
+
                 # Compute the successor configurations.
                 si1 = cfg.states1[-1]
                 si2 = cfg.states2[-1]
@@ -154,32 +181,25 @@ class CounterExampleGen:
                         si1last = si1.transItem
                         si2last = si2.transItem
 
-                        states1: Deque[StateItem] = deque()
-                        states1.append(si1last)
-                        derivs1: Deque[Derivation] = deque()
-                        derivs1.append(Derivation(si1sym))
+                        states1: List[StateItem] = [si1last]
+                        derivs1: List[Derivation] = [Derivation.make(si1sym)]
 
                         nullableClosure(si1.rule, si1.rule.parseIndex + 1, si1last, states1, derivs1)
 
-                        states2: Deque[StateItem] = deque()
-                        states2.append(si2last)
-                        derivs2: Deque[Derivation] = deque()
-                        derivs2.append(Derivation(si2sym))
+                        states2: List[StateItem] = [si2last]
+                        derivs2: List[Derivation] = [Derivation.make(si2sym)]
 
                         nullableClosure(si2.rule, si2.rule.parseIndex + 1, si2last, states2, derivs2)
 
                         for i in range(1, len(derivs1) + 1):
-                            subderivs1 = sliceDeque(derivs1, 0, i)
-                            substates1 = sliceDeque(states1, 0, i)
+                            nextDerivs1 = cfg.derivs1.extend(derivs1[:i])
+                            nextStates1 = cfg.states1.extend(states1[:i])
                             for j in range(1, len(derivs2) + 1):
-                                subderivs2 = sliceDeque(derivs2, 0, j)
-                                substates2 = sliceDeque(states2, 0, j)
-
                                 copy = cfg.copy()
-                                copy.derivs1.extend(subderivs1)
-                                copy.states1.extend(substates1)
-                                copy.derivs2.extend(subderivs2)
-                                copy.states2.extend(substates2)
+                                copy.derivs1 = nextDerivs1
+                                copy.states1 = nextStates1
+                                copy.derivs2 = cfg.derivs2.extend(derivs2[:j])
+                                copy.states2 = cfg.states2.extend(states2[:j])
                                 copy.complexity += 2 * costs.SHIFT_COST
                                 addSearchState(copy)
                         # end for subderiv
@@ -196,22 +216,17 @@ class CounterExampleGen:
                             )
                             if not applicable or not productionAllowed(si1, item):
                                 continue
-                            derivs: Deque[Derivation] = deque()
-                            states: Deque[StateItem] = deque()
-                            states.append(item)
+                            derivs: List[Derivation] = []
+                            states: List[StateItem] = [item]
                             nullableClosure(item.rule, 0, item, states, derivs)
                             for i in range(len(derivs) + 1):
-                                subderivs = sliceDeque(derivs, 0, i)
-                                substates = sliceDeque(states, 0, i + 1)
                                 copy = cfg.copy()
                                 if side == 1:
-                                    d = copy.derivs1
-                                    s = copy.states1
+                                    copy.derivs1 = copy.derivs1.extend(derivs[:i])
+                                    copy.states1 = s = copy.states1.extend(states[:i + 1])
                                 else:
-                                    d = copy.derivs2
-                                    s = copy.states2
-                                d.extend(subderivs)
-                                s.extend(substates)
+                                    copy.derivs2 = copy.derivs2.extend(derivs[:i])
+                                    copy.states2 = s = copy.states2.extend(states[:i + 1])
 
                                 if item in s:
                                     copy.complexity += costs.DUPLICATE_PRODUCTION_COST
@@ -268,13 +283,45 @@ class CounterExampleGen:
                             addSearchState(prepended)
                 # end reduce
             # end for search state
-            complexityMap.pop(css.complexity)
         # end while queue not empty
 
         # No unifying counterexamples.  Construct a counterexample from the
         # shortest lookahead-sensitive path.
         return self._exampleFromShortestPath(conflict, shortestConflictPath, False)
 
+    def _remainingComplexity(self, cfg: Configuration) -> int:
+        """
+        Lower bound of the complexity needed to complete both conflict items, which
+        every unifying counterexample has to do. Never overestimates, so the search
+        still finds the least complex counterexample first.
+        """
+        steps = 0
+        if cfg.reduceDepth >= 0:
+            # The reduce conflict item has not been reduced yet
+            steps += 1
+        if cfg.shiftDepth >= 0:
+            # The innermost item has to reach its end, then it and every
+            # production taken since the conflict item have to be reduced
+            steps += self._stepsToEnd(cfg.states2[-1]) + cfg.shiftDepth + 1
+        return steps * costs.MIN_STEP_COST
+
+    def _stepsToEnd(self, si: StateItem) -> int:
+        """
+        The number of symbols after the dot that cannot be skipped for free by nullableClosure()
+        """
+        try:
+            return self._stepsToEndCache[si]
+        except KeyError:
+            pass
+
+        out = 0
+        for i in range(si.rule.parseIndex, len(si.rule)):
+            symbol = si.rule[i]
+            if symbol.isTerminal or not symbol.nullable:
+                out += 1
+        self._stepsToEndCache[si] = out
+        return out
+
     def _exampleFromShortestPath(
         self, c: Conflict, shortestConflictPath1: Deque[StateItem], timeout: bool
     ) -> CounterExample:
@@ -285,7 +332,7 @@ class CounterExampleGen:
             deriv1 = self._completeDivergingExample(shortestConflictPath1, deque())
             deriv2 = self._completeDivergingExample(shortestConflictPath2, deque())
             return CounterExample(c, deriv1, deriv2, False, timeout=timeout)
-        si = StateItem.getStateItem(c.node, c.rule2)
+        si = self.stateItems.getStateItem(c.node, c.rule2)
         out: Deque[StateItem] = deque()
         out.append(si)
 
@@ -306,7 +353,7 @@ class CounterExampleGen:
                     prevrefsi = next(itr, None)
                     if prevrefsi is not None:
                         prevPos = prevrefsi.rule.parseIndex
-            if si == refsi or si.rule == StateItem.AUTOMATA.start.rules[0]:
+            if si == refsi or si.rule == self.automata.start.rules[0]:
                 # reached the common item, prepend to the beginning
                 refsis.pop()
                 # reversed since this will reverse the list
@@ -332,7 +379,7 @@ class CounterExampleGen:
                 while len(queue) > 0:
                     sis = queue.popleft()
                     sisrc = sis[0]
-                    if sisrc.rule == StateItem.AUTOMATA.start.rules[0]:
+                    if sisrc.rule == self.automata.start.rules[0]:
                         sis.pop()
                         out.extendleft(reversed(sis))
                         si = sisrc
@@ -504,81 +551,75 @@ class CounterExampleGen:
         tgtRule: AnnotRule,
         optimized: bool = True,
     ) -> Deque[StateItem]:
+        """
+        Breadth first search for the shortest lookahead sensitive path from the start item
+        to the target item, where the conflict symbol is a possible lookahead.
+        Search states are (StateItem, lookahead) pairs, and each stores only a pointer
+        to the state it was reached from, the path is rebuilt once the target is found.
+        """
 
         # we enforce that there is only one production for the start symbol, so we only need
         # to add this one state
-        source = StateItem.getStateItem(self.automata.start, self.automata.start.rules[0])
-        target = StateItem.getStateItem(tgtNode, tgtRule)
-
-        class StateItemWithLookahead:
-
-            def __init__(self, si: StateItem, la: Set[Symbol]) -> None:
-                self.si = si
-                self.la = la
-
-            def hash(self) -> int:
-                return hash(self.si) * 31 + hash(tuple(self.la))
+        source = self.stateItems.getStateItem(self.automata.start, self.automata.start.rules[0])
+        target = self.stateItems.getStateItem(tgtNode, tgtRule)
 
         eligible = self._eligibleStateItemsToConflict(target) if optimized else None
 
-        queue: Deque[Deque[StateItemWithLookahead]] = deque()
-        queue.append(deque([StateItemWithLookahead(source, source.rule.lookAhead)]))
-
-        visited: Set[int] = set()
+        SearchState = Tuple[StateItem, int]
+        start: SearchState = (source, source.rule.lookAhead)
+        # The state each state was first reached from
+        parents: Dict[SearchState, Optional[SearchState]] = {start: None}
+        queue: Deque[SearchState] = deque([start])
 
         # breadth-first search
         while len(queue) > 0:
-            path = queue.popleft()
-            last = path[-1]
-            #print(last.node, last.rule)
-            h = last.hash()
-            if h in visited:
-                continue
-            visited.add(h)
-            if target == last.si and self._conflictSymbol in last.la:
-                # done
-                return deque([x.si for x in path])
+            cur = queue.popleft()
+            si, la = cur
+            if si is target and self._conflictSymbol.bit & la:
+                # done, follow the parents back to the start
+                path: Deque[StateItem] = deque()
+                state: Optional[SearchState] = cur
+                while state is not None:
+                    path.appendleft(state[0])
+                    state = parents[state]
+                return path
             # transitions
-            nextSI = last.si.transItem
+            nextSI = si.transItem
             if nextSI is not None:
                 if eligible is None or nextSI in eligible:
-                    nextPath = path.copy()
-                    nextPath.append(StateItemWithLookahead(nextSI, last.la))
-                    queue.append(nextPath)
+                    new = (nextSI, la)
+                    if new not in parents:
+                        parents[new] = cur
+                        queue.append(new)
             # productions
-            if len(last.si.fwdProd) > 0:
-                ruleLen = len(last.si.rule)
-                pos = last.si.rule.parseIndex + 1
+            if len(si.fwdProd) > 0:
+                rule = si.rule.rule
+                pos = si.rule.parseIndex + 1
                 # Compute possible terminals that can follow this production.
-                lookahead: Set[Symbol] = set()
-                while True:
-                    if pos == ruleLen:
-                        lookahead.update(last.la)
-                        break
-                    else:
-                        sym = last.si.rule[pos]
-                        if sym.isTerminal:
-                            lookahead.add(sym)
-                            break
-                        else:
-                            lookahead.update(sym.first)
-                            if not sym.nullable:
-                                break
-                    pos += 1
-                    if pos > ruleLen:
-                        break
+                lookahead = rule.suffixFirst[pos]
+                if rule.suffixNullable[pos]:
+                    lookahead |= la
                 # Try all possible production steps within this parser state.
-                for nextSI in last.si.fwdProd:
+                for nextSI in si.fwdProd:
                     if eligible is not None and nextSI not in eligible:
                         continue
-                    new = StateItemWithLookahead(nextSI, lookahead)
-                    newPath = path.copy()
-                    newPath.append(new)
-                    queue.append(newPath)
+                    new = (nextSI, lookahead)
+                    if new not in parents:
+                        parents[new] = cur
+                        queue.append(new)
 
         raise RuntimeError("Failed to find shortest path")
 
     def _eligibleStateItemsToConflict(self, target: StateItem) -> Set[StateItem]:
+        """
+        Get every StateItem the target can be reached from.
+        Cached, since every conflict in a node on the same item has the same target.
+        """
+        try:
+            return self._eligibleCache[target]
+        except KeyError:
+            pass
+
         out = set()
 
         queue: Deque[StateItem] = deque()
@@ -590,11 +631,8 @@ class CounterExampleGen:
                 continue
             out.add(state)
             # consider reverse transitions and reverse productions
-            try:
-                for prevSet in state.revTrans.values():
-                    queue.extend(prevSet)
-            except KeyError:
-                pass
+            for prevSet in state.revTrans.values():
+                queue.extend(prevSet)
             if state.rule.parseIndex == 0:
                 symbol = state.rule.rule.nonterm
                 try:
@@ -604,6 +642,7 @@ class CounterExampleGen:
                 except KeyError:
                     pass
 
+        self._eligibleCache[target] = out
         return out
 
     def _hasCommonPrefix(self, rule1: AnnotRule, rule2: AnnotRule) -> bool:
@@ -1,5 +1,6 @@
-from typing import Optional, List
+from typing import Optional, List, Tuple
 from io import StringIO
+import weakref
 
 from ..grammar import Symbol
 
@@ -16,10 +17,28 @@ COLORS = [
 
 class Derivation:
 
+    # Every derivation created by make(), keyed by the identity of the symbol and children.
+    # Entries are removed once nothing else refers to the derivation.
+    _INTERNED: 'weakref.WeakValueDictionary[Tuple[int, Optional[Tuple[int, ...]]], Derivation]' = weakref.WeakValueDictionary()
+
     def __init__(self, symbol: Symbol, deriv: Optional[List['Derivation']] = None) -> None:
         self.symbol = symbol
         self.deriv = deriv
 
+    @classmethod
+    def make(cls, symbol: Symbol, deriv: Optional[List['Derivation']] = None) -> 'Derivation':
+        """
+        Get a shared derivation, so identical subtrees are only stored once.
+        The result must not be modified.
+        """
+        key = (id(symbol), None if deriv is None else tuple(id(x) for x in deriv))
+        try:
+            return cls._INTERNED[key]
+        except KeyError:
+            out = Derivation(symbol, deriv)
+            cls._INTERNED[key] = out
+            return out
+
     def __eq__(self, other) -> bool:
         if not isinstance(other, Derivation):
             raise NotImplementedError()
@@ -120,7 +139,7 @@ class Derivation:
         return str(self)
 
 
-_DOT = Symbol("•", "", False)
-del Symbol._SYMBOL_MAP['•']
+# Not part of any grammar, the negative ID never matches a grammar symbol
+_DOT = Symbol(-1, "•", "", False)
 
 DOT = Derivation(_DOT)
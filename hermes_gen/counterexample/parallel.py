@@ -0,0 +1,77 @@
+"""
+Generate the counterexamples for many conflicts in a pool of worker processes
+
+Each worker loads the grammar from a snapshot, so nothing but conflict
+indices and printed messages cross process boundaries
+"""
+from typing import Generator, List, Optional, Tuple
+from concurrent.futures import ProcessPoolExecutor
+import contextlib
+import io
+import os
+import tempfile
+
+from ..grammar import Grammar
+from ..lalr1_automata import LALR1Automata
+from ..parseTable import ParseTable
+from ..snapshot import Snapshot, writeSnapshot
+from .counterexampleGen import CounterExampleGen
+from .conflict import Conflict
+
+# The generator of the current worker process, set by _initWorker()
+_WORKER_GEN: Optional[CounterExampleGen] = None
+_WORKER_CONFLICTS: List[Conflict] = []
+
+
+def _initWorker(snapshotFile: str, timeLimit: float, configLimit: int):
+    global _WORKER_GEN, _WORKER_CONFLICTS
+    snapshot = Snapshot(snapshotFile)
+    _WORKER_CONFLICTS = snapshot.parseTable.conflicts
+    _WORKER_GEN = CounterExampleGen(snapshot.automata)  # type: ignore
+    _WORKER_GEN.timeLimit = timeLimit
+    _WORKER_GEN.configLimit = configLimit
+
+
+def _generate(args: Tuple[int, bool]) -> Tuple[str, str]:
+    """
+    :return: The output printed while searching, and the formatted counterexample
+    """
+    idx, colors = args
+    assert _WORKER_GEN is not None
+    printed = io.StringIO()
+    with contextlib.redirect_stdout(printed):
+        ce = _WORKER_GEN.generate_counterexample(_WORKER_CONFLICTS[idx])
+    return printed.getvalue(), ce.prettyPrint(colors)
+
+
+def generateCounterExamples(
+    grammar: Grammar,
+    automata: LALR1Automata,
+    parseTable: ParseTable,
+    colors: bool,
+    jobs: int,
+    timeLimit: float,
+    configLimit: int,
+) -> Generator[Tuple[str, str], None, None]:
+    """
+    Generate the counterexample for every conflict in the parse table
+    :param jobs: The number of worker processes
+    :param timeLimit: Seconds each conflict may search for, starting when a worker picks it up
+    :param configLimit: Search configurations each conflict may try
+    :return: The output printed while searching, and the formatted counterexample,
+        in the same order as parseTable.conflicts. Each is yielded as soon as it
+        and every conflict before it are done. Close the generator if it is not
+        read to the end, so the pool shuts down and the snapshot is removed
+    """
+    fd, snapshotFile = tempfile.mkstemp(suffix=".snap")
+    os.close(fd)
+    try:
+        writeSnapshot(snapshotFile, grammar, automata, parseTable)
+        with ProcessPoolExecutor(
+            max_workers=jobs,
+            initializer=_initWorker,
+            initargs=(snapshotFile, timeLimit, configLimit),
+        ) as executor:
+            yield from executor.map(_generate, [(idx, colors) for idx in range(len(parseTable.conflicts))])
+    finally:
+        os.remove(snapshotFile)
@@ -0,0 +1,201 @@
+from typing import TypeVar, Generic, Iterable, Iterator, List, Optional
+
+T = TypeVar("T")
+
+# Sequences are hashed as sum(hash(x[i]) * _BASE ** i) mod _MOD
+_MOD = (1 << 61) - 1
+_BASE = 1_000_003
+
+
+class _Cell(Generic[T]):
+    """
+    Immutable cons cell, shared between every deque built from it.
+    Each cell caches the size and hash of the list it starts, so
+    they never have to be recomputed.
+    """
+    __slots__ = ('value', 'next', 'size', 'hash', 'power', 'end')
+
+    def __init__(self, value: T, next: Optional['_Cell[T]'], hash: int, end: T) -> None:
+        self.value = value
+        self.next = next
+        self.size: int = 1 if next is None else next.size + 1
+        self.hash = hash
+        # _BASE ** size
+        self.power: int = _BASE if next is None else (next.power * _BASE) % _MOD
+        # The value at the other end of the list
+        self.end = end
+
+
+def _consFront(value: T, next: Optional[_Cell[T]]) -> _Cell[T]:
+    """
+    Cell of the front list, values are in order
+    """
+    h = hash(value) % _MOD
+    if next is None:
+        return _Cell(value, None, h, value)
+    return _Cell(value, next, (h + next.hash * _BASE) % _MOD, next.end)
+
+
+def _consBack(value: T, next: Optional[_Cell[T]]) -> _Cell[T]:
+    """
+    Cell of the back list, values are in reverse order
+    """
+    h = hash(value) % _MOD
+    if next is None:
+        return _Cell(value, None, h, value)
+    return _Cell(value, next, (next.hash + h * next.power) % _MOD, next.end)
+
+
+def _cells(cell: Optional[_Cell[T]]) -> Iterator[T]:
+    while cell is not None:
+        yield cell.value
+        cell = cell.next
+
+
+class PersistentDeque(Generic[T]):
+    """
+    Immutable deque. Every modification returns a new deque that shares
+    its cells with the original, so copies are free.
+
+    Stored as a front list and a reversed back list. Adding to either end,
+    len(), hash(), and the first and last items are O(1).
+    Removing from the back is O(n) only when it reaches into the front list.
+    """
+    __slots__ = ('_front', '_back', '_hash')
+
+    def __init__(self, items: Iterable[T] = ()) -> None:
+        self._front: Optional[_Cell[T]] = None
+        self._back: Optional[_Cell[T]] = None
+        for x in items:
+            self._back = _consBack(x, self._back)
+        self._hash = self._computeHash()
+
+    @classmethod
+    def _make(cls, front: Optional[_Cell[T]], back: Optional[_Cell[T]]) -> 'PersistentDeque[T]':
+        out = cls.__new__(cls)
+        out._front = front
+        out._back = back
+        out._hash = out._computeHash()
+        return out
+
+    def _computeHash(self) -> int:
+        if self._front is None:
+            return 0 if self._back is None else self._back.hash
+        if self._back is None:
+            return self._front.hash
+        return (self._front.hash + self._back.hash * self._front.power) % _MOD
+
+    def __len__(self) -> int:
+        return (0 if self._front is None else self._front.size) + (0 if self._back is None else self._back.size)
+
+    def __hash__(self) -> int:
+        return self._hash
+
+    def __eq__(self, other: object) -> bool:
+        if self is other:
+            return True
+        if not isinstance(other, PersistentDeque):
+            return False
+        if self._hash != other._hash or len(self) != len(other):
+            return False
+        return all(x == y for x, y in zip(self, other))
+
+    def __iter__(self) -> Iterator[T]:
+        yield from _cells(self._front)
+        if self._back is not None:
+            yield from reversed(list(_cells(self._back)))
+
+    def __reversed__(self) -> Iterator[T]:
+        yield from _cells(self._back)
+        if self._front is not None:
+            yield from reversed(list(_cells(self._front)))
+
+    def __contains__(self, item: object) -> bool:
+        # Searches are usually for recently appended items
+        for x in reversed(self):
+            if x == item:
+                return True
+        return False
+
+    def __getitem__(self, idx: int) -> T:
+        if idx == 0:
+            return self.first
+        if idx == -1:
+            return self.last
+        return list(self)[idx]
+
+    def __repr__(self) -> str:
+        return f'PersistentDeque({list(self)})'
+
+    @property
+    def first(self) -> T:
+        if self._front is not None:
+            return self._front.value
+        if self._back is not None:
+            return self._back.end
+        raise IndexError("PersistentDeque is empty")
+
+    @property
+    def last(self) -> T:
+        if self._back is not None:
+            return self._back.value
+        if self._front is not None:
+            return self._front.end
+        raise IndexError("PersistentDeque is empty")
+
+    def append(self, item: T) -> 'PersistentDeque[T]':
+        return self._make(self._front, _consBack(item, self._back))
+
+    def appendleft(self, item: T) -> 'PersistentDeque[T]':
+        return self._make(_consFront(item, self._front), self._back)
+
+    def extend(self, items: Iterable[T]) -> 'PersistentDeque[T]':
+        back = self._back
+        for x in items:
+            back = _consBack(x, back)
+        return self._make(self._front, back)
+
+    def extendleft(self, items: Iterable[T]) -> 'PersistentDeque[T]':
+        """
+        Like deque.extendleft(), the items end up in reverse order
+        """
+        front = self._front
+        for x in items:
+            front = _consFront(x, front)
+        return self._make(front, self._back)
+
+    def dropLast(self, count: int) -> 'PersistentDeque[T]':
+        """
+        Remove the last count items
+        """
+        back = self._back
+        while count > 0 and back is not None:
+            back = back.next
+            count -= 1
+        if count == 0:
+            return self._make(self._front, back)
+
+        # Reached into the front list, rebuild it as a back list so
+        # further removals are cheap
+        items = list(_cells(self._front))
+        if count > len(items):
+            raise IndexError("PersistentDeque.dropLast() count larger than deque")
+        return PersistentDeque(items[:len(items) - count])
+
+    def lastItems(self, count: int) -> List[T]:
+        """
+        Get the last count items, in order
+        """
+        out: List[T] = []
+        back = self._back
+        while len(out) < count and back is not None:
+            out.append(back.value)
+            back = back.next
+        if len(out) < count:
+            front = list(_cells(self._front))
+            missing = count - len(out)
+            if missing > len(front):
+                raise IndexError("PersistentDeque.lastItems() count larger than deque")
+            out.extend(reversed(front[len(front) - missing:]))
+        out.reverse()
+        return out
@@ -2,46 +2,42 @@ from typing import List, Optional, Set, Dict, Tuple
 from collections import defaultdict
 
 from hermes_gen.lalr1_automata import Node, AnnotRule, LALR1Automata
-from hermes_gen.grammar import Symbol
+from hermes_gen.grammar import Symbol, SymbolTable
 from hermes_gen.counterexample.orderedSet import OrderedSet
 
 
-def intersect(terminal: Symbol, syms: Optional[Set[Symbol]]) -> bool:
-    if syms is None:
-        return True
-    for sym in syms:
-        if sym == terminal:
-            return True
-        elif not sym.isTerminal and terminal in sym.first:
-            return True
+def intersect(symbols: SymbolTable, terminal: Symbol, syms: Optional[int]) -> bool:
+    return intersectSet(symbols, terminal.bit, syms)
 
-    return False
 
-
-def intersectSet(terminals: Set[Symbol], syms: Optional[Set[Symbol]]) -> bool:
+def intersectSet(symbols: SymbolTable, terminals: int, syms: Optional[int]) -> bool:
+    """
+    Check if a set of symbols can start with one of the terminals
+    :param symbols: The symbols of the grammar, used to decode the bitmasks
+    :param terminals: bitmask of terminals
+    :param syms: bitmask of symbols, may contain nonterminals, None matches everything
+    """
     if syms is None:
         return True
-    for sym in syms:
-        if sym in terminals:
-            return True
-        elif not sym.isTerminal and len(sym.first & terminals) > 0:
+    if terminals & syms:
+        return True
+    for sym in symbols.fromMask(syms):
+        if not sym.isTerminal and sym.firstMask & terminals:
             return True
     return False
 
 
-class StateItem:
+class StateItemGraph:
+    """
+    The StateItems of an automata, with the transitions and productions between them
+    """
 
-    # lookup map for a specific state item with the given state and rule
-    STATE_ITEM_LOOKUP: Dict[Tuple[Node, AnnotRule], 'StateItem'] = {}
+    def __init__(self, automata: LALR1Automata) -> None:
+        self.automata = automata
+        self.symbols = automata.grammar.symbols
 
-    # Reference to automata
-    AUTOMATA: LALR1Automata = None  # type: ignore
-
-    @classmethod
-    def initLookups(cls, automata: LALR1Automata) -> None:
-        cls.AUTOMATA = automata
-
-        cls.STATE_ITEM_LOOKUP.clear()
+        # lookup map for a specific state item with the given state and rule
+        self._stateItems: Dict[Tuple[Node, AnnotRule], StateItem] = {}
 
         # Compute transition maps
 
@@ -51,22 +47,20 @@ class StateItem:
                     # ignore reduction rules
                     continue
                 nextSymbol = rule.nextSymbol()
-                expParseIndex = rule.parseIndex + 1
                 dst = src.trans[nextSymbol]
-                for dstRule in dst.rules:
-                    # find the matching rule with the expected dot
-                    if dstRule.rule != rule.rule or dstRule.parseIndex != expParseIndex:
-                        continue
-
-                    srcSI = cls.getStateItem(src, rule)
-                    dstSI = cls.getStateItem(dst, dstRule)
+                # find the matching rule with the expected dot.
+                # Match by ID, different rules can have the same symbols
+                dstRule = dst.ruleIndex.get((rule.rule.id, rule.parseIndex + 1))
+                if dstRule is None:
+                    continue
 
-                    srcSI.transSymbol = nextSymbol
-                    srcSI.transItem = dstSI
+                srcSI = self.getStateItem(src, rule)
+                dstSI = self.getStateItem(dst, dstRule)
 
-                    dstSI.revTrans[nextSymbol].add(srcSI)
+                srcSI.transSymbol = nextSymbol
+                srcSI.transItem = dstSI
 
-                    break
+                dstSI.revTrans[nextSymbol].add(srcSI)
 
         # Compute production maps
         for src in automata.nodes:
@@ -77,14 +71,14 @@ class StateItem:
             for rule in src.rules:
                 if rule.parseIndex == 0:
                     lhs = rule.rule.nonterm
-                    closureMap[lhs].add(cls.getStateItem(src, rule))
+                    closureMap[lhs].add(self.getStateItem(src, rule))
 
             # rev prods for this node
             revProd: Dict[Symbol, OrderedSet['StateItem']] = {}
 
             for rule in src.rules:
                 # always set the revProd map
-                state = cls.getStateItem(src, rule)
+                state = self.getStateItem(src, rule)
                 state.revProd = revProd
                 # Avoid reduce items, which cannot make a production step.
                 if rule.indexAtEnd():
@@ -109,16 +103,19 @@ class StateItem:
 
                 revItems.add(state)
 
-    @classmethod
-    def getStateItem(cls, node: Node, rule: AnnotRule) -> 'StateItem':
+    def getStateItem(self, node: Node, rule: AnnotRule) -> 'StateItem':
         try:
-            return cls.STATE_ITEM_LOOKUP[(node, rule)]
+            return self._stateItems[(node, rule)]
         except KeyError:
-            out = StateItem(node, rule)
-            cls.STATE_ITEM_LOOKUP[(node, rule)] = out
+            out = StateItem(self, node, rule)
+            self._stateItems[(node, rule)] = out
             return out
 
-    def __init__(self, node: Node, rule: AnnotRule) -> None:
+
+class StateItem:
+
+    def __init__(self, graph: StateItemGraph, node: Node, rule: AnnotRule) -> None:
+        self.graph = graph
         self.node = node
         self.rule = rule
         self.transSymbol: Optional[Symbol] = None if rule.indexAtEnd() else rule.nextSymbol()
@@ -135,7 +132,7 @@ class StateItem:
     def __repr__(self) -> str:
         return self._name
 
-    def reverseTransition(self, symbol: Symbol, lookahead: Set[Symbol],
+    def reverseTransition(self, symbol: Symbol, lookahead: Optional[int],
                           guide: Optional[Set[Node]]) -> List[Optional['StateItem']]:
         """
         Compute a set of StateItems that can make a transition on the given
@@ -155,7 +152,7 @@ class StateItem:
                 if guide is not None and prev.node not in guide:
                     continue
                 # check if the lookaheads don't intersect
-                if not intersectSet(prev.rule.lookAhead, ss.lookahead):
+                if not intersectSet(self.graph.symbols, prev.rule.lookAhead, ss.lookahead):
                     continue
 
                 out.append(prev)
@@ -166,7 +163,7 @@ class StateItem:
             out.append(x.items[0])
         return out
 
-    def reverseProduction(self, lookahead: Set[Symbol]) -> List[List['StateItem']]:
+    def reverseProduction(self, lookahead: Optional[int]) -> List[List['StateItem']]:
         out = []
 
         for ss in _SearchState([self], lookahead).reverseProduction():
@@ -177,7 +174,7 @@ class StateItem:
 
 class _SearchState:
 
-    def __init__(self, stateItems: List[StateItem], lookahead: Optional[Set[Symbol]]) -> None:
+    def __init__(self, stateItems: List[StateItem], lookahead: Optional[int]) -> None:
         self.items = stateItems
         self.lookahead = lookahead
 
@@ -185,6 +182,7 @@ class _SearchState:
         out: List[_SearchState] = []
 
         si = self.items[0]
+        symbols = si.graph.symbols
         revProd = si.revProd
         if len(revProd) == 0:
             return out
@@ -201,11 +199,11 @@ class _SearchState:
             prevLen = len(prev.rule)
             prevPos = prev.rule.parseIndex + 1
             prevLookahead = prev.rule.lookAhead
-            nextLookahead: Set[Symbol] = set()
+            nextLookahead = 0
             # reduce item
             if (prevPos == prevLen):
                 # check for LA intersection
-                if not intersectSet(prevLookahead, self.lookahead):
+                if not intersectSet(symbols, prevLookahead, self.lookahead):
                     continue
                 if self.lookahead is not None:
                     nextLookahead = prevLookahead & self.lookahead
@@ -223,10 +221,10 @@ class _SearchState:
                     while not applicable and nullable and i < prevLen:
                         nextSym = prev.rule[i]
                         if nextSym.isTerminal:
-                            applicable = intersect(nextSym, self.lookahead)
+                            applicable = intersect(symbols, nextSym, self.lookahead)
                             nullable = False
                         else:
-                            applicable = intersectSet(nextSym.first, self.lookahead)
+                            applicable = intersectSet(symbols, nextSym.firstMask, self.lookahead)
                             if not applicable:
                                 nullable = nextSym.nullable
                         i += 1
@@ -0,0 +1,57 @@
+from typing import List, Tuple
+
+
+def digraph(relation: List[List[int]], initial: List[int]) -> List[int]:
+    """
+    Compute F(x) = F'(x) ∪ {F(y) | x R y} for every x, as described by DeRemer and Pennello.
+    Strongly connected components of the relation are found with an iterative
+    Tarjan traversal, every member of a component gets the same set.
+    :param relation: The successors of each element
+    :param initial: The initial set F'(x) of each element as a bitmask
+    :return: The final set of each element as a bitmask
+    """
+    INFINITY = len(relation) + 1
+    out = initial.copy()
+    depths = [0] * len(relation)
+    stack: List[int] = []
+
+    for root in range(len(relation)):
+        if depths[root] != 0:
+            continue
+
+        stack.append(root)
+        depths[root] = len(stack)
+        # Explicit call stack of (element, depth of the element, index of the next successor)
+        calls: List[Tuple[int, int, int]] = [(root, depths[root], 0)]
+        while len(calls) > 0:
+            x, d, i = calls[-1]
+            successors = relation[x]
+            if i < len(successors):
+                calls[-1] = (x, d, i + 1)
+                y = successors[i]
+                if depths[y] == 0:
+                    stack.append(y)
+                    depths[y] = len(stack)
+                    calls.append((y, depths[y], 0))
+                    continue
+                depths[x] = min(depths[x], depths[y])
+                out[x] |= out[y]
+                continue
+
+            # Done with all the successors of x
+            calls.pop()
+            if depths[x] == d:
+                # x is the root of a component, pop it off the stack
+                while True:
+                    top = stack.pop()
+                    depths[top] = INFINITY
+                    out[top] = out[x]
+                    if top == x:
+                        break
+
+            if len(calls) > 0:
+                parent = calls[-1][0]
+                depths[parent] = min(depths[parent], depths[x])
+                out[parent] |= out[x]
+
+    return out
@@ -1,6 +1,3 @@
-import inspect
-
-
 class Directive:
     header = "header"
     return_ = "return"
@@ -10,5 +7,4 @@ class Directive:
     default = "default"
 
 
-ALL_DIRECTIVES = {x[1]
-                  for x in inspect.getmembers(Directive) if isinstance(x[1], str) and not x[0].startswith('_')}
+ALL_DIRECTIVES = {value for key, value in vars(Directive).items() if isinstance(value, str) and not key.startswith('_')}
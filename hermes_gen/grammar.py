@@ -1,10 +1,11 @@
-from typing import List, Dict, Set, Tuple, Iterable, Optional, Deque
+from typing import List, Dict, Set, Tuple, Iterable, Iterator, Optional, Deque
 from collections import deque, defaultdict
 import re
 import os
 
 from hermes_gen.errors import HermesError
 from hermes_gen.consts import ARG_VECTOR, EMPTY, END, START, ERROR
+from hermes_gen.digraph import digraph
 from hermes_gen.directives import Directive, ALL_DIRECTIVES
 from hermes_gen import hermes_logs
 
@@ -12,45 +13,33 @@ DEFAULT_CODE = "return $0;"
 
 
 class Symbol:
-    _ID_GEN = 0
-    _SYMBOL_MAP: Dict[str, 'Symbol'] = {}
-
-    EMPTY: 'Symbol' = None  # type: ignore
-    END: 'Symbol' = None  # type: ignore
-    ERROR: 'Symbol' = None  # type: ignore
-
-    @classmethod
-    def reset(cls):
-        cls._ID_GEN = 0
-        cls._SYMBOL_MAP = {}
-        cls.EMPTY = Symbol(EMPTY, "", False)
-        cls.END = Symbol(END, "", False)
-        cls.ERROR = Symbol(ERROR, "", False)
-        cls.ERROR.isTerminal = True
-        cls.END.isTerminal = True
-
-    @classmethod
-    def get(cls, name: str) -> 'Symbol':
-        return cls._SYMBOL_MAP[name]
-
-    @classmethod
-    def exists(cls, name: str) -> bool:
-        return name in cls._SYMBOL_MAP
-
-    @classmethod
-    def all(cls) -> Iterable['Symbol']:
-        return cls._SYMBOL_MAP.values()
-
-    def __init__(self, name: str, regex: str, nullable: bool) -> None:
-        self.id = Symbol._ID_GEN
+
+    @staticmethod
+    def mask(symbols: Iterable['Symbol']) -> int:
+        """
+        Condense a collection of symbols into a bitmask, one bit per symbol ID
+        """
+        out = 0
+        for symbol in symbols:
+            out |= symbol.bit
+        return out
+
+    def __init__(self, id: int, name: str, regex: str, nullable: bool) -> None:
+        """
+        Symbols of a grammar are created by its SymbolTable, see SymbolTable.add()
+        :param id: The ID of the symbol, unique within its SymbolTable.
+            Negative IDs are for markers that are never part of a bitmask
+        """
+        self.id = id
         self.name = name
         self.regex = regex
         self.isTerminal = len(regex) > 0
         self.nullable = nullable
         self.first: Set['Symbol'] = set()
         self.follow: Set['Symbol'] = set()
-        Symbol._ID_GEN += 1
-        Symbol._SYMBOL_MAP[self.name] = self
+        # Bitmask versions of the above
+        self.bit = 1 << id if id >= 0 else 0
+        self.firstMask = 0
 
     def __str__(self) -> str:
         return self.name
@@ -59,12 +48,12 @@ class Symbol:
         return str(self)
 
     def __eq__(self, value: object) -> bool:
+        if isinstance(value, Symbol):
+            return self.id == value.id
         if isinstance(value, str):
             return self.name == value
-        if not isinstance(value, Symbol):
-            return False
 
-        return self.id == value.id
+        return False
 
     def __lt__(self, other: object) -> bool:
         if not isinstance(other, Symbol):
@@ -76,6 +65,63 @@ class Symbol:
         return self.id
 
 
+# EMPTY is the first symbol of every SymbolTable,
+# so it has the same bit in every grammar
+EMPTY_BIT = 1 << 0
+
+
+class SymbolTable:
+    """
+    Every symbol of a grammar, indexed by name and by ID.
+    Symbol IDs are only unique within a table, so any number of
+    grammars can be built in the same process
+    """
+
+    def __init__(self) -> None:
+        self._symbolMap: Dict[str, Symbol] = {}
+        # Symbols indexed by ID, used to decode bitmasks
+        self._symbolList: List[Symbol] = []
+
+        self.EMPTY = self.add(EMPTY, "", False)
+        self.END = self.add(END, "", False)
+        self.ERROR = self.add(ERROR, "", False)
+        self.ERROR.isTerminal = True
+        self.END.isTerminal = True
+
+    def add(self, name: str, regex: str, nullable: bool) -> Symbol:
+        """
+        Create a new symbol with the next ID
+        """
+        out = Symbol(len(self._symbolList), name, regex, nullable)
+        self._symbolMap[name] = out
+        self._symbolList.append(out)
+        return out
+
+    def get(self, name: str) -> Symbol:
+        return self._symbolMap[name]
+
+    def exists(self, name: str) -> bool:
+        return name in self._symbolMap
+
+    def all(self) -> Iterable[Symbol]:
+        return self._symbolMap.values()
+
+    def count(self) -> int:
+        return len(self._symbolList)
+
+    def fromID(self, id: int) -> Symbol:
+        return self._symbolList[id]
+
+    def fromMask(self, mask: int) -> Iterator[Symbol]:
+        """
+        Iterate the symbols in a bitmask, in ID order
+        """
+        while mask:
+            low = mask & -mask
+            yield self._symbolList[low.bit_length() - 1]
+            mask ^= low
+
+
 class Rule:
 
     def __init__(
@@ -91,6 +137,10 @@ class Rule:
         self.lineNum = lineNum
         # line number of the code block in the grammar file
         self.codeLine = codeLine
+        # FIRST bitmask and nullability of the symbols from each index to the end
+        # See Grammar._gen_suffix_first()
+        self.suffixFirst: List[int] = []
+        self.suffixNullable: List[bool] = []
 
     def __eq__(self, other: object) -> bool:
         if not isinstance(other, Rule):
@@ -161,12 +211,20 @@ class _RuleDef:
 
 
 NAME_CHARS = set('abcdefghijklmnopqrstuvwxyz_ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789')
+NAME_RE = re.compile(r'[a-zA-Z_0-9]*')
+WHITESPACE_RE = re.compile(r'[ \t\n]*')
+CODE_RE = re.compile(r'[^{}]*')
 H_ARG_RE = re.compile(r'(?P<cmd>\$|@)((?P<idx>\d+)|(?P<name>\w+))')
 
 
 class Grammar:
 
-    def __init__(self, terminals: List[Symbol], rules: List[Rule], directives: Dict[str, List[str]]) -> None:
+    def __init__(
+        self, symbols: SymbolTable, terminals: List[Symbol], rules: List[Rule], directives: Dict[str, List[str]]
+    ) -> None:
+        # Every symbol used by this grammar
+        self.symbols = symbols
+
         # List of terminals, in order as defined
         self._terminals = terminals
         self._terminalNames: Set[str] = {x.name
@@ -183,99 +241,121 @@ class Grammar:
         self._gen_first_and_follow()
 
     def _gen_first_and_follow(self):
-        for symbol in Symbol.all():
+        """
+        Compute the FIRST and FOLLOW sets of every symbol.
+        Both are of the form F(x) = F'(x) ∪ {F(y) | x R y} over a relation between symbols,
+        and are solved in one pass over the strongly connected components of the relation,
+        see digraph()
+        """
+        symbols = self.symbols
+        numSymbols = symbols.count()
+        emptyBit = symbols.EMPTY.bit
+
+        # A includes FIRST(X) for A = α X β if every symbol in α is nullable
+        firstRelation: List[List[int]] = [[] for _ in range(numSymbols)]
+        firstInitial = [0] * numSymbols
+        for symbol in symbols.all():
+            firstInitial[symbol.id] = Symbol.mask(symbol.first)
             # Initialize the first set to contain nulls
             if symbol.nullable:
-                symbol.first.add(Symbol.EMPTY)
+                firstInitial[symbol.id] |= emptyBit
             # Initialize the first set to contain the terminals
             if symbol.isTerminal:
-                symbol.first.add(symbol)
-
-        changed = True
-        while changed:
-            changed = False
-            for rule in self.rules:
-                curSet = rule.nonterm.first.copy()
-
-                nullable = True
-                for symbol in rule.symbols:
-                    curSet.update(symbol.first)
-                    if not symbol.nullable:
-                        nullable = False
-                        break
-
-                if nullable:
-                    curSet.add(Symbol.EMPTY)
-
-                if curSet > rule.nonterm.first:
-                    rule.nonterm.first = curSet
-                    changed = True
-            # End for rule
-        # End while changed
-
-        self.startSymbol.follow.add(Symbol.END)
-
-        changed = True
-        while changed:
-            changed = False
-            for rule in self.rules:
-                left = rule.nonterm.follow
-                # True if the previous symbol had EMPTY in their first set
-                lastEmpty = True
-                # Iterate backwards to keep track of when the next symbol can be empty
-                for i in reversed(range(len(rule.symbols))):
-                    curSymbol = rule.symbols[i]
-                    if curSymbol == Symbol.EMPTY:
-                        break
-
-                    if lastEmpty:
-                        right = curSymbol.follow
-                        new = left.union(right)
-                        if new > right:
-                            curSymbol.follow = new
-                            changed = True
-                        lastEmpty = Symbol.EMPTY in curSymbol.first
-                    if i > 0:
-                        prior = rule.symbols[i - 1]
-                        curFirst = curSymbol.first.difference({Symbol.EMPTY})
-                        priorFollow = prior.follow
-                        new = priorFollow.union(curFirst)
-                        if new > priorFollow:
-                            prior.follow = new
-                            changed = True
-                # End for symbols
-            # End for rules
-        # End while changed
+                firstInitial[symbol.id] |= symbol.bit
+
+        for rule in self.rules:
+            nonterm = rule.nonterm.id
+            nullable = True
+            for symbol in rule.symbols:
+                firstRelation[nonterm].append(symbol.id)
+                if not symbol.nullable:
+                    nullable = False
+                    break
+
+            if nullable:
+                firstInitial[nonterm] |= emptyBit
+
+        firstMasks = digraph(firstRelation, firstInitial)
+        for symbol in symbols.all():
+            symbol.firstMask = firstMasks[symbol.id]
+            symbol.first = set(symbols.fromMask(symbol.firstMask))
+
+        # X includes FOLLOW(A) for A = α X β if every symbol in β can be EMPTY
+        followRelation: List[List[int]] = [[] for _ in range(numSymbols)]
+        followInitial = [0] * numSymbols
+        for symbol in symbols.all():
+            followInitial[symbol.id] = Symbol.mask(symbol.follow)
+
+        followInitial[self.startSymbol.id] |= symbols.END.bit
+
+        for rule in self.rules:
+            # True if the previous symbol had EMPTY in their first set
+            lastEmpty = True
+            # Iterate backwards to keep track of when the next symbol can be empty
+            for i in reversed(range(len(rule.symbols))):
+                curSymbol = rule.symbols[i]
+                if lastEmpty:
+                    followRelation[curSymbol.id].append(rule.nonterm.id)
+                    lastEmpty = (curSymbol.firstMask & emptyBit) != 0
+                if i > 0:
+                    prior = rule.symbols[i - 1]
+                    followInitial[prior.id] |= curSymbol.firstMask & ~emptyBit
+
+        followMasks = digraph(followRelation, followInitial)
+        for symbol in symbols.all():
+            symbol.follow = set(symbols.fromMask(followMasks[symbol.id]))
+
+        self._gen_suffix_first()
+
+    def _gen_suffix_first(self):
+        """
+        For every rule and index, compute the FIRST bitmask of the symbols from
+        that index up to and including the first symbol that is not nullable,
+        and whether every symbol from that index on is nullable.
+        The FIRST bitmask may contain EMPTY if one of the symbols can be EMPTY.
+        Index len(rule.symbols) is the empty suffix.
+        """
+        for rule in self.rules:
+            numSymbols = len(rule.symbols)
+            rule.suffixFirst = [0] * (numSymbols + 1)
+            rule.suffixNullable = [True] * (numSymbols + 1)
+            for i in reversed(range(numSymbols)):
+                symbol = rule.symbols[i]
+                if symbol.nullable:
+                    rule.suffixFirst[i] = symbol.firstMask | rule.suffixFirst[i + 1]
+                    rule.suffixNullable[i] = rule.suffixNullable[i + 1]
+                else:
+                    rule.suffixFirst[i] = symbol.firstMask
+                    rule.suffixNullable[i] = False
 
 
 class _Reader:
     """
-    Lets us pass these numbers by reference
+    Reads a grammar file one character at a time, keeping track of the location.
+    The whole file is read into memory up front, and whole runs of characters
+    can be consumed at once with getMatch()
     """
 
     def __init__(self, filename: str, rootdir: Optional[str]) -> None:
         self.filename = filename
         self.printFilename = filename if rootdir is None else os.path.relpath(filename, rootdir)
-        self.io = open(filename, mode='r')
+        # python text IO automatically converts CRLF/LR to a single char
+        with open(filename, mode='r') as f:
+            self.text = f.read()
+        self.pos = 0
         self.lineNum = 1
         self.charNum = 0
         self._lastLineLen = 0
         self._lastChar = ''
 
-    def __del__(self):
-        try:
-            self.io.close()
-        except AttributeError:
-            pass
-
     def __str__(self) -> str:
         return f'{self.printFilename}:{self.lineNum}:{self.charNum}'
 
     def get(self) -> str:
-        out = self.io.read(1)
+        out = self.text[self.pos:self.pos + 1]
+        self.pos += len(out)
         self.charNum += 1
 
-        # python text IO automatically converts CRLF/LR to a single char
         if out == '\n':
             self.lineNum += 1
             self._lastLineLen = self.charNum
@@ -285,31 +365,62 @@ class _Reader:
         return out
 
     def unget(self):
-        # Seek to 1 char before the current position
+        # Move back 1 char
         # We *should* only ever unget 1 char
-        self.io.seek(self.io.tell() - 1, 0)
+        self.pos -= 1
         if self._lastChar == '\n':
             self.lineNum -= 1
             self.charNum = self._lastLineLen
         else:
             self.charNum -= 1
 
+    def getMatch(self, pattern: re.Pattern) -> str:
+        """
+        Consume the match of a pattern at the current position
+        :param pattern: The compiled pattern
+        :return: The matched text, empty if there is no match
+        """
+        m = pattern.match(self.text, self.pos)
+        if m is None:
+            return ''
+        self._advance(m.end())
+        return m.group()
+
+    def _advance(self, end: int):
+        """
+        Consume every char up to end, updating the location the same as calling get()
+        """
+        start = self.pos
+        if end <= start:
+            return
+
+        numLines = self.text.count('\n', start, end)
+        if numLines == 0:
+            self.charNum += end - start
+        else:
+            self.lineNum += numLines
+            lastNewline = self.text.rfind('\n', start, end)
+            if lastNewline == end - 1:
+                prevNewline = self.text.rfind('\n', start, lastNewline)
+                if prevNewline < 0:
+                    self._lastLineLen = self.charNum + lastNewline - start + 1
+                else:
+                    self._lastLineLen = lastNewline - prevNewline
+            self.charNum = end - lastNewline - 1
+
+        self.pos = end
+        self._lastChar = self.text[end - 1]
+
     def skipComment(self):
         nextChar = self.get()
         if nextChar == '#':
-            while True:
-                nextChar = self.get()
-                if nextChar == '#':
-                    nextChar = self.get()
-                    if nextChar == '#':
-                        break
-        else:
-            while True:
-                if len(nextChar) == 0:
-                    break
-                if nextChar == '\n':
-                    break
-                nextChar = self.get()
+            # Block comment, ends with ##
+            end = self.text.find('##', self.pos)
+            self._advance(len(self.text) if end < 0 else end + 2)
+        elif nextChar != '\n':
+            # Line comment, ends at the newline or EOF
+            end = self.text.find('\n', self.pos)
+            self._advance(len(self.text) if end < 0 else end + 1)
 
 
 class _TerminalDef:
@@ -363,7 +474,7 @@ class _GrammarFileParser:
         hermes_logs.warn(fullMsg)
 
     def parse(self) -> Grammar:
-        Symbol.reset()
+        symbols = SymbolTable()
 
         while len(self.fileQueue) > 0:
             filename = self.fileQueue.popleft()
@@ -397,7 +508,7 @@ class _GrammarFileParser:
         outRules: List[Rule] = []
 
         # define every terminal symbol
-        outTerminals: List[Symbol] = [Symbol(x.name, x.regex, False) for x in self.terminalDefs]
+        outTerminals: List[Symbol] = [symbols.add(x.name, x.regex, False) for x in self.terminalDefs]
 
         startSymbol = self.ruleDefs[0].nonterm
         needsNewStart = False
@@ -427,9 +538,9 @@ class _GrammarFileParser:
         for ruleDef in self.ruleDefs:
             # define/get the nonterm symbol
             try:
-                lhs = Symbol.get(ruleDef.nonterm)
+                lhs = symbols.get(ruleDef.nonterm)
             except KeyError:
-                lhs = Symbol(ruleDef.nonterm, "", ruleDef.nonterm in self.nulls)
+                lhs = symbols.add(ruleDef.nonterm, "", ruleDef.nonterm in self.nulls)
 
             loc = f'{ruleDef.file}:{ruleDef.lineNum}'
 
@@ -445,9 +556,9 @@ class _GrammarFileParser:
                     # At this point, every terminal has been defined, assume any
                     # new symbols are nonterminals
                     try:
-                        s = Symbol.get(symbol)
+                        s = symbols.get(symbol)
                     except KeyError:
-                        s = Symbol(symbol, "", symbol in self.nulls)
+                        s = symbols.add(symbol, "", symbol in self.nulls)
 
                     rhs.append(s)
                     if s.isTerminal:
@@ -528,7 +639,7 @@ class _GrammarFileParser:
             if d not in ALL_DIRECTIVES:
                 self.warn(f"Unused directive %{d}")
 
-        return Grammar(outTerminals, outRules, outDirectives)
+        return Grammar(symbols, outTerminals, outRules, outDirectives)
 
     def _preprocessRule(self, rule: _RuleDef, m: re.Match) -> str:
         """
@@ -583,6 +694,7 @@ class _GrammarFileParser:
                 break
 
             if nextChar in ' \t\n':
+                self.f.getMatch(WHITESPACE_RE)
                 continue
 
             if nextChar == '%':
@@ -608,7 +720,7 @@ class _GrammarFileParser:
             lhsStartloc = str(self.f)
 
             # Parse LHS of rule
-            lhs = nextChar
+            lhs = nextChar + self.f.getMatch(NAME_RE)
             while True:
                 nextChar = self.f.get()
                 if len(nextChar) == 0:
@@ -777,6 +889,9 @@ class _GrammarFileParser:
             nextChar = self.f.get()
             if nextChar == ';':
                 break
+            if len(nextChar) == 0:
+                self.err(f"Unexpected EOF, expected ';'")
+                raise HermesError("Unexpected EOF")
             if nextChar not in ' \t\n':
                 self.err(f"Invalid character '{nextChar}', expected ';'")
                 self.f.unget()
@@ -811,13 +926,14 @@ class _GrammarFileParser:
                     break
 
                 if nextChar in NAME_CHARS:
-                    curSymbol += nextChar
+                    curSymbol += nextChar + self.f.getMatch(NAME_RE)
                     continue
 
                 if nextChar in ' \t\n':
                     if len(curSymbol) > 0:
                         curStrSymbolList.append(curSymbol)
                         curSymbol = ''
+                    self.f.getMatch(WHITESPACE_RE)
                     continue
 
                 if nextChar == '#':
@@ -854,23 +970,17 @@ class _GrammarFileParser:
             if curCodeStart >= 0:
                 # save the leading indentation before the first bit of code
                 # so we can remove it from every line
-                indentStr = ""
-                while True:
-                    nextChar = self.f.get()
-                    # reset if newline
-                    if nextChar == "\n":
-                        indentStr = ""
-                    elif nextChar in " \t":
-                        indentStr += nextChar
-                    else:
-                        self.f.unget()
-                        break
+                whitespace = self.f.getMatch(WHITESPACE_RE)
+                # only keep what is after the last newline
+                indentStr = whitespace[whitespace.rfind("\n") + 1:]
 
                 curCodeStart = self.f.lineNum
 
                 numOpenBrackets = 1
+                codeParts: List[str] = []
 
                 while True:
+                    codeParts.append(self.f.getMatch(CODE_RE))
                     nextChar = self.f.get()
                     if nextChar == '{':
                         numOpenBrackets += 1
@@ -878,7 +988,12 @@ class _GrammarFileParser:
                         numOpenBrackets -= 1
                         if numOpenBrackets == 0:
                             break
-                    curCode += nextChar
+                    else:
+                        self.err("Unexpected EOF, expected '}'")
+                        raise HermesError("Unexpected EOF")
+                    codeParts.append(nextChar)
+
+                curCode = "".join(codeParts)
                 # strip leading indentation
                 codeLines = curCode.strip().splitlines()
                 for i in range(1, len(codeLines)):
@@ -906,7 +1021,11 @@ class _GrammarFileParser:
             hitSemi = False
             while True:
                 nextChar = self.f.get()
+                if len(nextChar) == 0:
+                    self.err("Unexpected EOF, expected ';' or '|'")
+                    raise HermesError("Unexpected EOF")
                 if nextChar in ' \t\n':
+                    self.f.getMatch(WHITESPACE_RE)
                     continue
                 if nextChar == '|':
                     break
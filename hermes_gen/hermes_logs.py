@@ -1,25 +1,70 @@
+from typing import List, Optional
 import sys
 
-_Y = "\033[1;33m"
-_R = "\033[1;31m"
-_OFF = "\033[0m"
+_YELLOW = "\033[1;33m"
+_RED = "\033[1;31m"
+_RESET = "\033[0m"
+
+_Y = _YELLOW
+_R = _RED
+_OFF = _RESET
+
+# Every message printed while recording, see startRecording()
+_RECORD: Optional[List[str]] = None
 
 
 def enableColors(enable: bool):
     global _Y, _R, _OFF
-    if not enable:
+    if enable:
+        _Y = _YELLOW
+        _R = _RED
+        _OFF = _RESET
+    else:
         _Y = ""
         _R = ""
         _OFF = ""
 
 
+def startRecording():
+    """
+    Keep a copy of every message printed from now on
+    """
+    global _RECORD
+    _RECORD = []
+
+
+def stopRecording() -> List[str]:
+    """
+    Stop recording messages
+    :return: Every message printed since startRecording()
+    """
+    global _RECORD
+    out = _RECORD if _RECORD is not None else []
+    _RECORD = None
+    return out
+
+
+def replay(messages: List[str]):
+    """
+    Print previously recorded messages
+    """
+    for msg in messages:
+        _print(msg)
+
+
+def _print(msg: str):
+    print(msg, file=sys.stderr)
+    if _RECORD is not None:
+        _RECORD.append(msg)
+
+
 def info(*msg: str):
-    print(f" ".join(msg), file=sys.stderr)
+    _print(f" ".join(msg))
 
 
 def warn(*msg: str):
-    print(f'{_Y}Warn: {" ".join(msg)}{_OFF}', file=sys.stderr)
+    _print(f'{_Y}Warn: {" ".join(msg)}{_OFF}')
 
 
 def err(*msg: str):
-    print(f'{_R}Error: {" ".join(msg)}{_OFF}', file=sys.stderr)
+    _print(f'{_R}Error: {" ".join(msg)}{_OFF}')
@@ -1,48 +1,290 @@
-from typing import List
+from typing import Dict, List, Set, Tuple, FrozenSet
+from collections import deque
 
+from hermes_gen.grammar import Symbol
 from hermes_gen.lalr1_automata import LALR1Automata, Node
 
+# (rule ID, parse index) of an item in a node
+ItemKey = Tuple[int, int]
+# (conflicted LALR node ID, terminal ID, reduced rule ID)
+Contribution = Tuple[int, int, int]
+
 
 class IELRAutomata:
+    """
+    IELR(1) automata, as described in
+    'The IELR(1) algorithm for generating minimal LR(1) parser tables...' [Denny, Malloy] (2010)
+
+    Starts from the LALR(1) automata and splits only the nodes whose merged look aheads cause
+    mysterious conflicts, i.e. conflicts that would not exist in a canonical LR(1) automata.
+    Each LALR node is the core of one or more isocores, nodes with the same LR(0) items
+    but different look aheads.
+    """
 
     def __init__(self, lalr: LALR1Automata) -> None:
         self.lalr = lalr
+        self.grammar = lalr.grammar
 
+        # The LALR node each isocore was split from, indexed by isocore ID
         self.lalr1_isocores: List[Node] = []
+        # The next isocore with the same core, forms a ring per core
         self.isocores_nexts: List[Node] = []
+        # True once an isocore's look aheads have been computed by this algorithm
         self.lookaheads_recomputed: List[bool] = []
 
+        # Every isocore, indexed by ID
+        self._isocores: List[Node] = []
+        # The kernel items of each LALR node
+        self._kernels: List[List[ItemKey]] = []
+        # Which reductions in conflicted nodes can be reached from each kernel item
+        # of each LALR node, and for which terminal
+        self._annotations: List[List[Tuple[ItemKey, Contribution]]] = []
+        # The terminals shifted by each conflicted LALR node, as a mask
+        self._shifts: Dict[int, int] = {}
+
+        self._todo: deque[Node] = deque()
+        self._inTodo: Set[int] = set()
+
+        self.start: Node = None  # type: ignore
+        self.nodes: List[Node] = []
+
+        self.split_states()
+
     def split_states(self):
+        startCore = self.lalr.start
+
         for node in self.lalr.nodes:
-            self.lalr1_isocores.append(node)
-            self.isocores_nexts.append(node)
-            self.lookaheads_recomputed.append(False)
+            if node is startCore:
+                kernel = [(x.rule.id, x.parseIndex) for x in node.rules if x.rule.nonterm == self.grammar.startSymbol]
+            else:
+                kernel = [(x.rule.id, x.parseIndex) for x in node.rules if x.parseIndex > 0]
+            self._kernels.append(kernel)
 
+        if not self._annotate():
+            # Without conflicts there is nothing to split
+            self.start = startCore
+            self.nodes = self.lalr.nodes
+            return
+
+        # The first isocore of every core has the same ID as the core
         for node in self.lalr.nodes:
-            for symbol, nextNode in node.trans.items():
-                self.compute_state(node, nextNode)
+            self._newIsocore(node)
+
+        self.start = self._isocores[startCore.id]
+        K = {x: self.grammar.symbols.END.bit for x in self._kernels[startCore.id]}
+        self._mergeLookAheads(self.start, K)
+        self.lookaheads_recomputed[self.start.id] = True
+        self._enqueue(self.start)
 
-    def propagate_lookaheads(self, s: Node, SPrime: Node):
-        pass  # TODO
+        while len(self._todo) > 0:
+            s = self._todo.popleft()
+            self._inTodo.discard(s.id)
+            for symbol in self.lalr1_isocores[s.id].trans:
+                self.compute_state(s, symbol)
 
-    def is_compatible(self, i: Node, K) -> bool:
-        return False  # TODO
+        # Only keep the reachable isocores, in ID order
+        reachable: Set[int] = {self.start.id}
+        queue = deque([self.start])
+        while len(queue) > 0:
+            cur = queue.popleft()
+            for nextNode in cur.trans.values():
+                if nextNode.id not in reachable:
+                    reachable.add(nextNode.id)
+                    queue.append(nextNode)
+
+        self.nodes = [x for x in self._isocores if x.id in reachable]
+        for idx, node in enumerate(self.nodes):
+            node.id = idx
+
+    def propagate_lookaheads(self, s: Node, symbol: Symbol) -> Dict[ItemKey, int]:
+        """
+        Compute the kernel look aheads of the node reached from s on symbol
+        """
+        K: Dict[ItemKey, int] = {}
+        for annotRule in s.rules:
+            if not annotRule.indexAtEnd() and annotRule.nextSymbol().id == symbol.id:
+                key = (annotRule.rule.id, annotRule.parseIndex + 1)
+                K[key] = K.get(key, 0) | annotRule.lookAhead
+        return K
+
+    def is_compatible(self, i: Node, K: Dict[ItemKey, int]) -> bool:
+        """
+        Check if the kernel look aheads K can be merged into isocore i without
+        causing a mysterious conflict, a conflict that neither has alone.
+        Conflicts that both have, or that only one has, are inherent to the grammar,
+        splitting the isocore would not remove them.
+        """
+        if not self.lookaheads_recomputed[i.id]:
+            # Nothing has been merged into this isocore yet
+            return True
+
+        core = self.lalr1_isocores[i.id]
+        existing = self._contributions(core, {key: i.ruleIndex[key].lookAhead for key in self._kernels[core.id]})
+        new = self._contributions(core, K)
+        return self._conflicts(existing | new) <= self._conflicts(existing) | self._conflicts(new)
+
+    def compute_state(self, s: Node, symbol: Symbol):
+        K = self.propagate_lookaheads(s, symbol)
+        sPrime = self._isocores[self.lalr1_isocores[s.id].trans[symbol].id]
 
-    def compute_state(self, s: Node, sPrime: Node):
-        K = self.propagate_lookaheads(s, sPrime)
         found = False
-        i = s
+        i = sPrime
         while True:
             if self.is_compatible(i, K):
                 found = True
                 break
-            nextIso = self.isocores_nexts[i.id]
-            if nextIso == sPrime:
+            i = self.isocores_nexts[i.id]
+            if i is sPrime:
                 break
-            i = nextIso
+
         if not found:
-            pass  # TODO
+            # Split off a new isocore
+            i = self._newIsocore(self.lalr1_isocores[sPrime.id])
+            self._mergeLookAheads(i, K)
+            self.lookaheads_recomputed[i.id] = True
+            self._enqueue(i)
         elif not self.lookaheads_recomputed[i.id]:
-            pass  # TODO
+            self._mergeLookAheads(i, K)
+            self.lookaheads_recomputed[i.id] = True
+            self._enqueue(i)
+        elif self._mergeLookAheads(i, K):
+            # The successors have to be recomputed with the new look aheads
+            self._enqueue(i)
+
+        s.trans[symbol] = i
+
+    def _newIsocore(self, core: Node) -> Node:
+        out = Node(len(self._isocores))
+        # Copy the items so the order matches the core, look aheads start empty
+        for annotRule in core.rules:
+            out.addRule(annotRule.rule, annotRule.parseIndex, 0)
+
+        self._isocores.append(out)
+        self.lalr1_isocores.append(core)
+        self.lookaheads_recomputed.append(False)
+
+        # Link into the ring of isocores for this core
+        first = self._isocores[core.id]
+        if first is out:
+            self.isocores_nexts.append(out)
         else:
-            pass  # TODO
+            self.isocores_nexts.append(self.isocores_nexts[first.id])
+            self.isocores_nexts[first.id] = out
+
+        return out
+
+    def _enqueue(self, node: Node):
+        if node.id not in self._inTodo:
+            self._todo.append(node)
+            self._inTodo.add(node.id)
+
+    def _mergeLookAheads(self, node: Node, K: Dict[ItemKey, int]) -> bool:
+        """
+        Merge kernel look aheads into a node and recompute the closure look aheads
+        :return: True if any kernel look ahead changed
+        """
+        changed = False
+        for key, la in K.items():
+            annotRule = node.ruleIndex[key]
+            new = annotRule.lookAhead | la
+            if new != annotRule.lookAhead:
+                annotRule.lookAhead = new
+                changed = True
+
+        if not changed:
+            return False
+
+        self.lalr.closeLookAheads(node)
+        return True
+
+    def _contributions(self, core: Node, K: Dict[ItemKey, int]) -> FrozenSet[Contribution]:
+        return frozenset(contrib for key, contrib in self._annotations[core.id] if K.get(key, 0) & (1 << contrib[1]))
+
+    def _conflicts(self, contributions: FrozenSet[Contribution]) -> Set[Tuple[int, int]]:
+        """
+        :return: The (conflicted LALR node ID, terminal ID) that have more than one action
+            with these reductions, counting the shift of the terminal
+        """
+        actions: Dict[Tuple[int, int], int] = {}
+        for nodeID, terminal, _ in contributions:
+            key = (nodeID, terminal)
+            if key not in actions:
+                actions[key] = 1 if self._shifts[nodeID] & (1 << terminal) else 0
+            actions[key] += 1
+        return {key for key, count in actions.items() if count > 1}
+
+    def _annotate(self) -> bool:
+        """
+        Find the conflicts in the LALR automata, and trace every reduction involved
+        in a conflict back to the kernel items whose look aheads flow into it.
+        :return: True if the LALR automata has any conflicts
+        """
+        nodes = self.lalr.nodes
+        self._annotations = [[] for _ in nodes]
+
+        # (node ID, rule ID) -> terminal IDs the reduction conflicts on
+        conflicted: Dict[Tuple[int, int], List[int]] = {}
+        for node in nodes:
+            shifts = 0
+            for symbol in node.trans:
+                if symbol.isTerminal:
+                    shifts |= symbol.bit
+
+            seen = 0
+            multiple = 0
+            for annotRule in node.rules:
+                if annotRule.indexAtEnd():
+                    multiple |= seen & annotRule.lookAhead
+                    seen |= annotRule.lookAhead
+            conflictMask = (seen & shifts) | multiple
+            if conflictMask == 0:
+                continue
+            self._shifts[node.id] = shifts
+
+            for annotRule in node.rules:
+                if annotRule.indexAtEnd() and annotRule.lookAhead & conflictMask:
+                    terminals = [x.id for x in self.grammar.symbols.fromMask(annotRule.lookAhead & conflictMask)]
+                    conflicted[(node.id, annotRule.rule.id)] = terminals
+
+        if len(conflicted) == 0:
+            return False
+
+        # Reverse edges of the item graph that look aheads flow along
+        # (node ID, rule ID, parse index) -> predecessor items
+        reverse: Dict[Tuple[int, int, int], List[Tuple[int, int, int]]] = {}
+        for node in nodes:
+            for annotRule in node.rules:
+                if annotRule.indexAtEnd():
+                    continue
+                src = (node.id, annotRule.rule.id, annotRule.parseIndex)
+                nextSym = annotRule.nextSymbol()
+                dst = node.trans[nextSym]
+                reverse.setdefault((dst.id, annotRule.rule.id, annotRule.parseIndex + 1), []).append(src)
+
+                # Look aheads only propagate into the closure if the rest of the rule is nullable
+                if nextSym.isTerminal:
+                    continue
+                if annotRule.rule.suffixNullable[annotRule.parseIndex + 1]:
+                    for rule in self.lalr.ruleLookup[nextSym]:
+                        reverse.setdefault((node.id, rule.id, 0), []).append(src)
+
+        kernelSets = [set(x) for x in self._kernels]
+        # Rule IDs are not always the index in the rule list
+        ruleLengths = {x.id: len(x.symbols) for x in self.grammar.rules}
+
+        for (nodeID, ruleID), terminals in conflicted.items():
+            end = (nodeID, ruleID, ruleLengths[ruleID])
+            visited = {end}
+            queue = deque([end])
+            while len(queue) > 0:
+                cur = queue.popleft()
+                key = (cur[1], cur[2])
+                if key in kernelSets[cur[0]]:
+                    for t in terminals:
+                        self._annotations[cur[0]].append((key, (nodeID, t, ruleID)))
+                for prev in reverse.get(cur, []):
+                    if prev not in visited:
+                        visited.add(prev)
+                        queue.append(prev)
+
+        return True
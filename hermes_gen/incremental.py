@@ -0,0 +1,114 @@
+"""
+Reuse the nodes of a previously built automata after the grammar changed, see LALR1Automata
+
+The previous automata usually comes from a snapshot, so its grammar has its
+own SymbolTable. Symbols and rules are matched between the grammars by name.
+"""
+from typing import Dict, FrozenSet, List, Set, Tuple, TYPE_CHECKING
+from collections import Counter
+
+from hermes_gen.grammar import Grammar, Rule
+
+if TYPE_CHECKING:
+    from hermes_gen.lalr1_automata import LALR1Automata
+
+# The kernel of a node, as (rule ID, parse index) pairs, see Node.kernelSignature()
+Kernel = FrozenSet[Tuple[int, int]]
+
+
+def _ruleKeys(g: Grammar) -> Dict[Tuple[str, Tuple[Tuple[str, bool], ...], int], Rule]:
+    """
+    Key every rule by its nonterminal and symbols, which are the same in every grammar.
+    Duplicate rules are told apart by the number of copies before them
+    """
+    out: Dict[Tuple[str, Tuple[Tuple[str, bool], ...], int], Rule] = {}
+    seen: Counter = Counter()
+    for rule in g.rules:
+        symbols = tuple((x.name, x.isTerminal) for x in rule.symbols)
+        seen[(rule.nonterm.name, symbols)] += 1
+        out[(rule.nonterm.name, symbols, seen[(rule.nonterm.name, symbols)])] = rule
+    return out
+
+
+def mapRules(old: Grammar, new: Grammar) -> Dict[int, Rule]:
+    """
+    :return: The rule of the new grammar matching each rule ID of the old grammar, if any
+    """
+    newKeys = _ruleKeys(new)
+    return {rule.id: newKeys[key] for key, rule in _ruleKeys(old).items() if key in newKeys}
+
+
+def changedNonterminals(old: Grammar, new: Grammar) -> Set[str]:
+    """
+    :return: The name of every nonterminal whose rules are not the same in both grammars
+    """
+    rules: List[Dict[str, Counter]] = []
+    for g in [old, new]:
+        byNonterm: Dict[str, Counter] = {}
+        for key in _ruleKeys(g):
+            byNonterm.setdefault(key[0], Counter())[key[1]] += 1
+        rules.append(byNonterm)
+
+    oldRules, newRules = rules
+    return {x for x in oldRules.keys() | newRules.keys() if oldRules.get(x) != newRules.get(x)}
+
+
+class ReusableNode:
+    """
+    A node of the previous automata whose closure is the same in the new grammar
+    """
+
+    def __init__(self, oldID: int, items: List[Tuple[Rule, int]]) -> None:
+        """
+        :param oldID: The ID of the node in the previous automata
+        :param items: Every item of the node, as new rules and parse indices, in the previous order
+        """
+        self.oldID = oldID
+        self.items = items
+
+
+def reusableNodes(previous: 'LALR1Automata', new: Grammar) -> Tuple[Dict[Kernel, ReusableNode], Dict[Kernel, int]]:
+    """
+    Find the nodes of the previous automata that can be copied into the automata of the new grammar.
+    The closure of a node only depends on its kernel, and the rules of the nonterminals it expands.
+    So a node can be reused if every one of its rules is still in the grammar, and none of the
+    nonterminals it expands changed.
+    :return: The reusable nodes, and the previous ID of every node whose kernel is still valid,
+        both keyed by kernel in the new grammar
+    """
+    ruleMap = mapRules(previous.grammar, new)
+    changed = changedNonterminals(previous.grammar, new)
+    if previous.grammar.startSymbol.name != new.startSymbol.name:
+        # The start node expands the start symbol
+        changed |= {previous.grammar.startSymbol.name, new.startSymbol.name}
+
+    def translate(items) -> Tuple[List[Tuple[Rule, int]], bool]:
+        out: List[Tuple[Rule, int]] = []
+        for item in items:
+            rule = ruleMap.get(item.rule.id)
+            if rule is None:
+                return out, False
+            out.append((rule, item.parseIndex))
+        return out, True
+
+    kernels: Dict[int, Kernel] = {}
+    oldIDs: Dict[Kernel, int] = {}
+    for node in previous.nodes:
+        kernel, valid = translate(x for x in node.rules if x.parseIndex > 0)
+        if valid:
+            signature = frozenset((rule.id, idx) for rule, idx in kernel)
+            kernels[node.id] = signature
+            # Split nodes share a kernel, the first keeps the ID
+            oldIDs.setdefault(signature, node.id)
+
+    out: Dict[Kernel, ReusableNode] = {}
+    for node in previous.nodes:
+        if node.id not in kernels or kernels[node.id] in out:
+            continue
+        if any(x.parseIndex == 0 and x.rule.nonterm.name in changed for x in node.rules):
+            continue
+        items, valid = translate(node.rules)
+        if valid:
+            out[kernels[node.id]] = ReusableNode(node.id, items)
+
+    return out, oldIDs
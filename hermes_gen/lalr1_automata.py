@@ -1,21 +1,25 @@
-from typing import Dict, List, Tuple
+from typing import Dict, List, Tuple, FrozenSet, Set, Optional
 from collections import deque
+import io
 
-from hermes_gen.grammar import Grammar, Rule, Symbol
+from hermes_gen.grammar import Grammar, Rule, Symbol, SymbolTable, EMPTY_BIT
 from hermes_gen.errors import HermesError
-# TODO condense symbol strings to int IDs
+from hermes_gen.digraph import digraph
+from hermes_gen.incremental import reusableNodes
+from hermes_gen.writers.utils import writeIfChanged
 
 
 class AnnotRule:
     """
     A rule combined with a parse index and a look ahead
+    The look ahead is stored as a bitmask of symbol IDs, see Symbol.mask()
     """
 
-    def __init__(self, rule: Rule, parseIndex: int, lookAhead: set[Symbol]) -> None:
+    def __init__(self, rule: Rule, parseIndex: int, lookAhead: int) -> None:
         """
         :param rule: The Rule
         :param parseIndex: The index of the symbol AFTER the dot, i.e. the symbol we are looking for
-        :param lookAhead: The look ahead set for the rule
+        :param lookAhead: The look ahead bitmask for the rule
         """
         self.rule = rule
         self.parseIndex = parseIndex
@@ -45,15 +49,15 @@ class AnnotRule:
         if not isinstance(other, AnnotRule):
             return False
 
-        return self.canCombine(other) and self.lookAhead == other.lookAhead
+        return self.rule == other.rule and self.parseIndex == other.parseIndex and self.lookAhead == other.lookAhead
 
     def canCombine(self, other: 'AnnotRule'):
         """
         Checks if the rule can be combined with another
-        Chcks equality of the underlying rule and the parse index
+        Chcks equality of the underlying rule ID and the parse index
         """
 
-        return self.rule == other.rule and self.parseIndex == other.parseIndex
+        return self.rule.id == other.rule.id and self.parseIndex == other.parseIndex
 
     def combine(self, other: 'AnnotRule') -> bool:
         """
@@ -61,8 +65,8 @@ class AnnotRule:
         :param other: The rule to combine
         :return: True if look ahead was changed
         """
-        new = self.lookAhead.union(other.lookAhead)
-        if new > self.lookAhead:
+        new = self.lookAhead | other.lookAhead
+        if new != self.lookAhead:
             self.lookAhead = new
             return True
         return False
@@ -79,27 +83,28 @@ class AnnotRule:
         """
         return self.rule.symbols[self.parseIndex]
 
-    def getNewLA(self) -> set[Symbol]:
+    def getNewLA(self) -> int:
         """
         Returns the lookahead for closure rules generated from this rule
         Uses set of symbols that can be collapsed after the next symbol to be
         consumed (i.e. every symbol from idx + 1 up to and including
-        the first that can't be null)
-        :return: The lookahead
+        the first that can't be null), see Rule.suffixFirst
+        :return: The lookahead bitmask
         """
 
-        out = set()
-        for i in range(self.parseIndex + 1, len(self.rule.symbols)):
-            symbol = self.rule.symbols[i]
-            out.update(symbol.first - {Symbol.EMPTY})
-            if not symbol.nullable:
-                return out
-
-        # If we got here, every symbol after the next can be nulled
-        # Add our own look ahead
-        out.update(self.lookAhead)
+        idx = self.parseIndex + 1
+        out = self.rule.suffixFirst[idx] & ~EMPTY_BIT
+        if self.rule.suffixNullable[idx]:
+            # Every symbol after the next can be nulled, add our own look ahead
+            out |= self.lookAhead
         return out
 
+    def strLookAhead(self, symbols: SymbolTable) -> str:
+        """
+        :param symbols: The symbols of the grammar the look ahead belongs to
+        """
+        return "{" + ", ".join(x.name for x in symbols.fromMask(self.lookAhead)) + "}"
+
     def __hash__(self) -> int:
         return hash(self.rule.id) + hash(self.parseIndex)
 
@@ -114,7 +119,10 @@ class Node:
 
     def __init__(self, id: int) -> None:
         self.id = id
+        # Rules in the order they were added, this defines the output order
         self.rules: List[AnnotRule] = []
+        # Lookup of rules by (rule ID, parse index)
+        self.ruleIndex: Dict[Tuple[int, int], AnnotRule] = {}
         # Map of transitions
         self.trans: Dict[Symbol, Node] = {}
 
@@ -124,22 +132,29 @@ class Node:
     def __repr__(self) -> str:
         return self.__str__()
 
-    def addRule(self, rule: Rule, parseIndex: int, lookAhead: set[Symbol]) -> bool:
+    def addRule(self, rule: Rule, parseIndex: int, lookAhead: int) -> bool:
         """
         Attempts to add a rule to the node. If a duplicate is found,
         the new LA is merged into the existing rule.
         :param rule: The rule to add
         :param parseIndex: The idx of the next symbol
-        :param lookAhead: The new LA
+        :param lookAhead: The new LA bitmask
         :return: True if a change occurs
         """
-        newRule = AnnotRule(rule, parseIndex, lookAhead)
-        for annotRule in self.rules:
-            if annotRule.canCombine(newRule):
-                return annotRule.combine(newRule)
+        key = (rule.id, parseIndex)
+        try:
+            annotRule = self.ruleIndex[key]
+        except KeyError:
+            newRule = AnnotRule(rule, parseIndex, lookAhead)
+            self.rules.append(newRule)
+            self.ruleIndex[key] = newRule
+            return True
 
-        self.rules.append(newRule)
-        return True
+        new = annotRule.lookAhead | lookAhead
+        if new != annotRule.lookAhead:
+            annotRule.lookAhead = new
+            return True
+        return False
 
     def __eq__(self, other: object) -> bool:
         if not isinstance(other, Node):
@@ -154,20 +169,42 @@ class Node:
 
         return True
 
+    def kernelSignature(self) -> FrozenSet[Tuple[int, int]]:
+        """
+        Get the LR(0) kernel of the node as a set of (rule ID, parse index) pairs.
+        Every item with the dot past the start of the rule is a kernel item, closure
+        items all have a parse index of 0. Two nodes with the same signature have
+        the same LR(0) core.
+        """
+        return frozenset(x for x in self.ruleIndex if x[1] > 0)
+
     def canCombine(self, other: 'Node') -> bool:
-        if len(self.rules) != len(other.rules):
-            return False
+        return self.kernelSignature() == other.kernelSignature()
 
-        for r1, r2 in zip(self.rules, other.rules):
-            if not r1.canCombine(r2):
-                return False
+    def weaklyCompatible(self, other: 'Node') -> bool:
+        """
+        Check if two nodes with the same core are weakly compatible, as described in
+        'A Practical General Method for Constructing LR(k) Parsers' [Pager] (1977)
+        Merging weakly compatible nodes cannot cause conflicts that would not also
+        occur in the canonical LR(1) automata.
+        For every pair of kernel items i, j with look aheads Li, Lj and Mi, Mj:
+        (Li & Mj) | (Lj & Mi) must be empty, unless Li & Lj or Mi & Mj is not empty
+        """
+        keys = [x for x in self.ruleIndex if x[1] > 0]
+        L = [self.ruleIndex[x].lookAhead for x in keys]
+        M = [other.ruleIndex[x].lookAhead for x in keys]
+
+        for i in range(len(keys)):
+            for j in range(i + 1, len(keys)):
+                if (L[i] & M[j]) | (L[j] & M[i]) and not (L[i] & L[j]) and not (M[i] & M[j]):
+                    return False
 
         return True
 
     def combine(self, other: 'Node') -> bool:
         out = False
-        for ar1, ar2 in zip(self.rules, other.rules):
-            if ar1.combine(ar2):
+        for key, ar2 in other.ruleIndex.items():
+            if self.ruleIndex[key].combine(ar2):
                 out = True
 
         return out
@@ -187,9 +224,42 @@ class Node:
         return hash(self.id)
 
 
+class LAEngine:
+    """
+    Strategies for computing the look aheads of the automata
+    """
+    # Build the LR(0) automata, then compute the look aheads
+    # with the DeRemer-Pennello relations
+    deremer_pennello = "deremer-pennello"
+    # Build LR(1) nodes and merge them, propagating look aheads until nothing changes
+    propagate = "propagate"
+
+
+ALL_LA_ENGINES = [LAEngine.deremer_pennello, LAEngine.propagate]
+
+
 class LALR1Automata:
 
-    def __init__(self, g: Grammar) -> None:
+    def __init__(
+        self,
+        g: Grammar,
+        engine: str = LAEngine.deremer_pennello,
+        previous: Optional['LALR1Automata'] = None,
+    ) -> None:
+        """
+        :param g: The grammar
+        :param engine: The look ahead engine, see LAEngine
+        :param previous: The automata of an earlier version of the grammar, usually from a snapshot.
+            Its nodes that are unaffected by the changes are reused, and keep their IDs where possible.
+            Only used by the deremer-pennello engine
+        """
+        if engine not in ALL_LA_ENGINES:
+            raise HermesError(f"Invalid look ahead engine: {engine}")
+
+        self.engine = engine
+        # Only track look aheads while building if we are propagating them
+        self._trackLA = engine == LAEngine.propagate
+
         # Start node is ID 0
         self.start = Node(0)
         # start IDs at 1
@@ -205,20 +275,32 @@ class LALR1Automata:
             except KeyError:
                 self.ruleLookup[rule.nonterm] = [rule]
 
+        # Closure template of each nonterminal, see closureTemplate()
+        self.closureTemplates: Dict[Symbol, List[Tuple[Tuple[int, int], int, bool]]] = {}
+
         # Add all the rules for the start symbol to the start node
         for rule in self.ruleLookup[g.startSymbol]:
-            self.start.addRule(rule, 0, {Symbol.END})
+            self.start.addRule(rule, 0, g.symbols.END.bit if self._trackLA else 0)
 
         # Make the closure for the start node
         self.makeClosure(self.start)
 
         self.nodes: List[Node] = [self.start]
+        # Lookup nodes by their kernel signature to find duplicates
+        self.kernelIndex: Dict[FrozenSet[Tuple[int, int]], Node] = {self.start.kernelSignature(): self.start}
+
+        if previous is not None and engine == LAEngine.deremer_pennello:
+            self._buildIncremental(previous)
+            self._computeLookAheads()
+            return
 
-        # Make the todo queue
+        # Make the todo queue, with a set of node IDs for quick membership checks
         todo = deque([self.start])
+        inTodo: Set[int] = {self.start.id}
 
         while len(todo) > 0:
             cur = todo.popleft()
+            inTodo.discard(cur.id)
             used = set()
             for rule in cur.rules:
                 if not rule.indexAtEnd():
@@ -226,80 +308,335 @@ class LALR1Automata:
                     if symbol not in used:
                         used.add(symbol)
                         newNode = self.makeNewNode(cur, symbol)
-                        new, changed = self.resolveDupes(newNode)
-                        if symbol not in cur.trans:
-                            cur.addTrans(symbol, new)
-                        if changed and new not in todo:
+                        new, changed = self.resolveDupes(newNode, cur.trans.get(symbol))
+                        self.setTransition(cur, symbol, new)
+                        if changed and new.id not in inTodo:
                             todo.append(new)
+                            inTodo.add(new.id)
 
         # normalize the node ID's
         for idx, n in enumerate(self.nodes):
             n.id = idx
 
+        if engine == LAEngine.deremer_pennello:
+            self._computeLookAheads()
+
+    def _buildIncremental(self, previous: 'LALR1Automata') -> None:
+        """
+        Build the LR(0) automata, copying the closure of every node of the previous
+        automata that is unaffected by the changes to the grammar, see reusableNodes().
+        Nodes with the same kernel as a previous node keep its ID if it is in range,
+        new nodes fill the IDs that are left.
+        """
+        reusable, oldIDs = reusableNodes(previous, self.grammar)
+
+        todo = deque([self.start])
+        while len(todo) > 0:
+            cur = todo.popleft()
+            # Same as makeNewNode(), grouped by symbol in order of first use
+            kernels: Dict[Symbol, List[Tuple[Rule, int]]] = {}
+            for annotRule in cur.rules:
+                if not annotRule.indexAtEnd():
+                    kernels.setdefault(annotRule.nextSymbol(), []).append((annotRule.rule, annotRule.parseIndex + 1))
+
+            for symbol, items in kernels.items():
+                signature = frozenset((rule.id, idx) for rule, idx in items)
+                try:
+                    node = self.kernelIndex[signature]
+                except KeyError:
+                    node = Node(len(self.nodes))
+                    reused = reusable.get(signature)
+                    if reused is not None:
+                        # The kernel is followed by the same closure as before
+                        for rule, idx in reused.items:
+                            node.addRule(rule, idx, 0)
+                    else:
+                        for rule, idx in items:
+                            node.addRule(rule, idx, 0)
+                        self.makeClosure(node)
+                    self.nodes.append(node)
+                    self.kernelIndex[signature] = node
+                    todo.append(node)
+                cur.addTrans(symbol, node)
+
+        # Keep the previous IDs that are still in range, and fill the gaps with the rest
+        slots: List[Optional[Node]] = [None] * len(self.nodes)
+        rest: List[Node] = []
+        for node in self.nodes:
+            oldID = oldIDs.get(node.kernelSignature(), -1)
+            if node is self.start:
+                # The start node is always first
+                oldID = 0
+            if 0 <= oldID < len(slots) and slots[oldID] is None:
+                slots[oldID] = node
+            else:
+                rest.append(node)
+
+        restIter = iter(rest)
+        for idx in range(len(slots)):
+            if slots[idx] is None:
+                slots[idx] = next(restIter)
+
+        self.nodes = slots  # type: ignore
+        for idx, node in enumerate(self.nodes):
+            node.id = idx
+        self.nodeIDs = len(self.nodes)
+
     def makeClosure(self, node: Node) -> None:
         """
         Compute the LR(1) Closure of a node
+        The LR(0) items are added with a single pass over the node, processing
+        the items in the order they are added. The look aheads are then merged
+        in from the closure template of each kernel item, see closeLookAheads()
         :param node: The node to compute
         :return: None
         """
-        changed = True
-        while changed:
-            changed = False
-            for annotRule in node.rules:
-                if annotRule.indexAtEnd():
-                    # The index is at the end, skip
-                    continue
+        # Nonterminals whose rules have already been added
+        expanded: Set[Symbol] = set()
+
+        # node.rules grows as we go, so this visits every added item once
+        idx = 0
+        while idx < len(node.rules):
+            annotRule = node.rules[idx]
+            idx += 1
+
+            if annotRule.indexAtEnd():
+                # The index is at the end, skip
+                continue
+
+            nextSym = annotRule.nextSymbol()
+            if nextSym.isTerminal or nextSym in expanded:
+                # the next symbol is a terminal, or was already expanded, skip
+                continue
+
+            expanded.add(nextSym)
+            for rule in self.ruleLookup[nextSym]:
+                node.addRule(rule, 0, 0)
 
-                nextSym = annotRule.nextSymbol()
-                if nextSym.isTerminal:
-                    # the next symbol is a terminal, skip
+        if self._trackLA:
+            self.closeLookAheads(node)
+
+    def closeLookAheads(self, node: Node) -> None:
+        """
+        Compute the look aheads of the closure items of a node from its kernel items.
+        Every closure item gets the spontaneous look ahead of the closure template
+        of the kernel item's next symbol, plus the look ahead passed down by the
+        kernel item if the template propagates it to that item.
+        Look aheads are only ever added, so this can be rerun after the kernel changes.
+        :param node: The node, which must already contain every closure item
+        """
+        startSymbol = self.grammar.startSymbol
+        kernel = [x for x in node.rules if x.parseIndex > 0 or x.rule.nonterm == startSymbol]
+
+        for annotRule in kernel:
+            if annotRule.indexAtEnd():
+                continue
+
+            nextSym = annotRule.nextSymbol()
+            if nextSym.isTerminal:
+                continue
+
+            newLA = annotRule.getNewLA()
+            for key, spontaneous, propagates in self.closureTemplate(nextSym):
+                closureRule = node.ruleIndex[key]
+                closureRule.lookAhead |= spontaneous | newLA if propagates else spontaneous
+
+    def closureTemplate(self, symbol: Symbol) -> List[Tuple[Tuple[int, int], int, bool]]:
+        """
+        Get the closure template of a nonterminal, computed once per nonterminal.
+        This is the LR(0) closure of the rules of the nonterminal, where each item has
+        the look ahead it always gets (spontaneous), and whether it also gets the look
+        ahead of the item that requested the nonterminal (propagated)
+        :return: A list of (rule ID, parse index), spontaneous look ahead bitmask, propagates
+        """
+        try:
+            return self.closureTemplates[symbol]
+        except KeyError:
+            pass
+
+        spontaneous: Dict[int, int] = {}
+        propagates: Dict[int, bool] = {}
+        order: List[Rule] = []
+
+        queue: deque[Rule] = deque()
+        for rule in self.ruleLookup[symbol]:
+            spontaneous[rule.id] = 0
+            propagates[rule.id] = True
+            order.append(rule)
+            queue.append(rule)
+
+        while len(queue) > 0:
+            rule = queue.popleft()
+            if len(rule.symbols) == 0 or rule.symbols[0].isTerminal:
+                continue
+
+            # Same as AnnotRule.getNewLA(), without the look ahead of the rule itself
+            first = rule.suffixFirst[1] & ~EMPTY_BIT
+            nullable = rule.suffixNullable[1]
+
+            newSpontaneous = first | spontaneous[rule.id] if nullable else first
+            newPropagates = nullable and propagates[rule.id]
+
+            for child in self.ruleLookup[rule.symbols[0]]:
+                if child.id not in spontaneous:
+                    # New rules are always processed, their children are part of the closure
+                    order.append(child)
+                    spontaneous[child.id] = newSpontaneous
+                    propagates[child.id] = newPropagates
+                    queue.append(child)
                     continue
 
-                newLookAhead = annotRule.getNewLA()
+                oldSpontaneous = spontaneous[child.id]
+                oldPropagates = propagates[child.id]
+                spontaneous[child.id] = oldSpontaneous | newSpontaneous
+                propagates[child.id] = oldPropagates or newPropagates
+                if spontaneous[child.id] != oldSpontaneous or propagates[child.id] != oldPropagates:
+                    queue.append(child)
 
-                for rule in self.ruleLookup[nextSym]:
-                    if node.addRule(rule, 0, newLookAhead.copy()):
-                        changed = True
-                # End for rule
-            # End for annotRule
-        # End while changed
+        out = [((x.id, 0), spontaneous[x.id], propagates[x.id]) for x in order]
+        self.closureTemplates[symbol] = out
+        return out
 
     def makeNewNode(self, curNode: Node, symbol: Symbol) -> Node:
+        """
+        Make the kernel of the node reached from curNode on symbol.
+        The closure is computed by resolveDupes()
+        """
         newNode = Node(self.nodeIDs)
         self.nodeIDs += 1
 
         for annotR in curNode.rules:
-            if not annotR.indexAtEnd() and annotR.nextSymbol() == symbol:
-                newNode.addRule(annotR.rule, annotR.parseIndex + 1, annotR.lookAhead.copy())
+            if not annotR.indexAtEnd() and annotR.nextSymbol().id == symbol.id:
+                newNode.addRule(annotR.rule, annotR.parseIndex + 1, annotR.lookAhead)
 
-        self.makeClosure(newNode)
         return newNode
 
-    def resolveDupes(self, newNode: Node) -> Tuple[Node, bool]:
+    def setTransition(self, node: Node, symbol: Symbol, nextNode: Node):
+        """
+        Add the transition of a node to the node returned by resolveDupes().
+        A node that is visited again already has it, a kernel signature always leads to the same node
+        """
+        if symbol not in node.trans:
+            node.addTrans(symbol, nextNode)
+
+    def resolveDupes(self, newNode: Node, prev: Optional[Node] = None) -> Tuple[Node, bool]:
+        """
+        Merge a new node into an existing node with the same core, or add it to the automata
+        :param newNode: The new node, only containing the kernel
+        :param prev: The node previously reached by the same transition, if any
+        :return: The node to transition to, and True if it was added or changed
+        """
+        signature = newNode.kernelSignature()
+        try:
+            node = self.kernelIndex[signature]
+        except KeyError:
+            # If we got here it is a new node
+            self.makeClosure(newNode)
+            self.nodes.append(newNode)
+            self.kernelIndex[signature] = newNode
+            return newNode, True
+
+        # Decrement the ID
+        self.nodeIDs -= 1
+        # The closure only depends on the kernel, so merge the kernel
+        # look aheads and recompute the closure if anything changed
+        changed = node.combine(newNode)
+        if changed:
+            self.makeClosure(node)
+        return node, changed
+
+    def _computeLookAheads(self) -> None:
+        """
+        Compute the LALR(1) look aheads of every item in the LR(0) automata.
+        As described in 'Efficient Computation of LALR(1) Look-Ahead Sets' [DeRemer, Pennello] (1982)
+
+        Every nonterminal transition (p, A) gets a Follow set of the terminals that can follow
+        A after taking that transition. The look ahead of an item [B = α • β] in node q is then
+        the union of Follow(p, B) for every transition (p, B) where p reaches q on α.
+        """
+        g = self.grammar
+
+        # Index every nonterminal transition (p, A)
+        transIDs: Dict[Tuple[int, int], int] = {}
+        transList: List[Tuple[Node, Symbol]] = []
         for node in self.nodes:
-            if node.canCombine(newNode):
-                # Decrement the ID
-                self.nodeIDs -= 1
-                return node, node.combine(newNode)
+            for symbol in node.trans:
+                if not symbol.isTerminal:
+                    transIDs[(node.id, symbol.id)] = len(transList)
+                    transList.append((node, symbol))
+
+        # The start rules are reduced on END, act as if there is a transition
+        # on the start symbol from the start node, like an augmented S' = S END rule
+        startKey = (self.start.id, g.startSymbol.id)
+        if startKey not in transIDs:
+            transIDs[startKey] = len(transList)
+            transList.append((self.start, g.startSymbol))
+
+        numTrans = len(transList)
+
+        # Direct reads: the terminals that can be shifted right after the transition
+        directReads = [0] * numTrans
+        # (p, A) reads (r, C) if p --A--> r --C--> and C is nullable
+        reads: List[List[int]] = [[] for _ in range(numTrans)]
+        for idx, (node, symbol) in enumerate(transList):
+            try:
+                dst = node.trans[symbol]
+            except KeyError:
+                dst = None
+
+            if dst is not None:
+                for nextSym in dst.trans:
+                    if nextSym.isTerminal:
+                        directReads[idx] |= nextSym.bit
+                    elif nextSym.nullable:
+                        reads[idx].append(transIDs[(dst.id, nextSym.id)])
+
+        directReads[transIDs[startKey]] |= g.symbols.END.bit
+
+        readSets = digraph(reads, directReads)
+
+        # (p, A) includes (p', B) if B = β A γ, γ is nullable, and p' reaches p on β
+        includes: List[List[int]] = [[] for _ in range(numTrans)]
+        # Every item [B = α • β] reached from each transition (p', B)
+        itemSources: List[List[AnnotRule]] = [[] for _ in range(numTrans)]
+        for idx, (node, symbol) in enumerate(transList):
+            for rule in self.ruleLookup[symbol]:
+                cur = node
+                symbols = rule.symbols
+                for i, ruleSym in enumerate(symbols):
+                    itemSources[idx].append(cur.ruleIndex[(rule.id, i)])
+                    if not ruleSym.isTerminal and rule.suffixNullable[i + 1]:
+                        includes[transIDs[(cur.id, ruleSym.id)]].append(idx)
+                    cur = cur.trans[ruleSym]
+                itemSources[idx].append(cur.ruleIndex[(rule.id, len(symbols))])
+
+        follows = digraph(includes, readSets)
 
-        # If we got here it is a new node
-        self.nodes.append(newNode)
-        return newNode, True
+        for node in self.nodes:
+            for annotRule in node.rules:
+                annotRule.lookAhead = 0
+
+        for idx, items in enumerate(itemSources):
+            la = follows[idx]
+            for annotRule in items:
+                annotRule.lookAhead |= la
 
 
 def writeDescription(filename: str, lalr: LALR1Automata):
-    with open(filename, mode='w') as f:
-        for node in lalr.nodes:
-            f.write(str(node))
-            f.write("\n  Rules:\n")
+    f = io.StringIO()
+    for node in lalr.nodes:
+        f.write(str(node))
+        f.write("\n  Rules:\n")
+
+        for rule in node.rules:
+            f.write(f"    {rule.strRule()} {rule.strLookAhead(lalr.grammar.symbols)}\n")
 
-            for rule in node.rules:
-                f.write(f"    {rule.strRule()} {rule.lookAhead}\n")
+        if len(node.trans) > 0:
+            f.write('\n  Transitions:\n')
 
-            if len(node.trans) > 0:
-                f.write('\n  Transitions:\n')
+            for key, val in node.trans.items():
+                f.write(f"    on {key} -> {val}\n")
 
-                for key, val in node.trans.items():
-                    f.write(f"    on {key} -> {val}\n")
+        f.write("\n")
 
-            f.write("\n")
+    writeIfChanged(filename, f.getvalue())
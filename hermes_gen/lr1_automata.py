@@ -0,0 +1,106 @@
+from typing import Dict, List, Tuple, FrozenSet, Optional, Set
+from collections import deque
+
+from hermes_gen.grammar import Grammar, Symbol
+from hermes_gen.lalr1_automata import LALR1Automata, LAEngine, Node
+
+
+class LR1Automata(LALR1Automata):
+    """
+    Minimal LR(1) automata, as described in
+    'A Practical General Method for Constructing LR(k) Parsers' [Pager] (1977)
+
+    Builds the canonical LR(1) nodes, but merges each new node into an existing
+    node with the same core if they are weakly compatible (see Node.weaklyCompatible()).
+    This gives close to the number of LALR(1) nodes without the conflicts caused by merging.
+    """
+
+    def __init__(self, g: Grammar) -> None:
+        # Every node with a given kernel signature
+        # Set before building, since the base class calls resolveDupes()
+        self.coreIndex: Dict[FrozenSet[Tuple[int, int]], List[Node]] = {}
+
+        super().__init__(g, LAEngine.propagate)
+
+        self._removeUnreachable()
+        self._recomputeLookAheads()
+
+    def resolveDupes(self, newNode: Node, prev: Optional[Node] = None) -> Tuple[Node, bool]:
+        signature = newNode.kernelSignature()
+
+        # Prefer the node we already transition to, so the automata is stable
+        candidates = self.coreIndex.get(signature, [])
+        if prev is not None:
+            candidates = [prev] + [x for x in candidates if x is not prev]
+
+        for node in candidates:
+            if node.canCombine(newNode) and node.weaklyCompatible(newNode):
+                # Decrement the ID
+                self.nodeIDs -= 1
+                changed = node.combine(newNode)
+                if changed:
+                    self.makeClosure(node)
+                return node, changed
+
+        # If we got here it is a new node
+        self.makeClosure(newNode)
+        self.nodes.append(newNode)
+        try:
+            self.coreIndex[signature].append(newNode)
+        except KeyError:
+            self.coreIndex[signature] = [newNode]
+        return newNode, True
+
+    def setTransition(self, node: Node, symbol: Symbol, nextNode: Node):
+        # A node visited again may merge into a different node with the same core,
+        # so the transition moves to it, see _removeUnreachable()
+        node.trans[symbol] = nextNode
+
+    def _removeUnreachable(self) -> None:
+        """
+        Remove nodes that are no longer reachable after a transition was moved
+        """
+        reachable: Set[int] = {self.start.id}
+        queue = deque([self.start])
+        while len(queue) > 0:
+            cur = queue.popleft()
+            for nextNode in cur.trans.values():
+                if nextNode.id not in reachable:
+                    reachable.add(nextNode.id)
+                    queue.append(nextNode)
+
+        self.nodes = [x for x in self.nodes if x.id in reachable]
+        for idx, n in enumerate(self.nodes):
+            n.id = idx
+
+    def _recomputeLookAheads(self) -> None:
+        """
+        Recompute the look aheads from the start node, so look aheads from
+        removed nodes or moved transitions do not linger
+        """
+        for node in self.nodes:
+            for annotRule in node.rules:
+                annotRule.lookAhead = 0
+
+        for rule in self.ruleLookup[self.grammar.startSymbol]:
+            self.start.addRule(rule, 0, self.grammar.symbols.END.bit)
+        self.makeClosure(self.start)
+
+        todo = deque([self.start])
+        inTodo: Set[int] = {self.start.id}
+
+        while len(todo) > 0:
+            cur = todo.popleft()
+            inTodo.discard(cur.id)
+            for symbol, nextNode in cur.trans.items():
+                changed = False
+                for annotRule in cur.rules:
+                    if not annotRule.indexAtEnd() and annotRule.nextSymbol().id == symbol.id:
+                        if nextNode.addRule(annotRule.rule, annotRule.parseIndex + 1, annotRule.lookAhead):
+                            changed = True
+
+                if changed:
+                    self.makeClosure(nextNode)
+                    if nextNode.id not in inTodo:
+                        todo.append(nextNode)
+                        inTodo.add(nextNode.id)
@@ -0,0 +1,46 @@
+from typing import Optional
+
+from hermes_gen.grammar import Grammar
+from hermes_gen.lalr1_automata import LALR1Automata, LAEngine
+from hermes_gen.ielr_generator import IELRAutomata
+from hermes_gen.lr1_automata import LR1Automata
+from hermes_gen.errors import HermesError
+
+
+class Mode:
+    """
+    The type of automata to build the parse table from
+    """
+    # Merge every node with the same LR(0) core
+    lalr = "lalr"
+    # Start from LALR(1), but split the nodes that cause mysterious conflicts
+    ielr = "ielr"
+    # Build LR(1) nodes, only merging the nodes that are weakly compatible
+    lr1 = "lr1"
+
+
+ALL_MODES = [Mode.lalr, Mode.ielr, Mode.lr1]
+
+
+def buildAutomata(
+    g: Grammar,
+    mode: str,
+    engine: str = LAEngine.deremer_pennello,
+    previous: Optional[LALR1Automata] = None,
+) -> LALR1Automata:
+    """
+    Build the automata for a grammar
+    :param g: The grammar
+    :param mode: The type of automata, see Mode
+    :param engine: The look ahead engine used for LALR(1) and IELR(1), see LAEngine
+    :param previous: The automata of an earlier version of the grammar to reuse nodes from,
+        used for LALR(1) and IELR(1), see LALR1Automata
+    """
+    if mode == Mode.lalr:
+        return LALR1Automata(g, engine, previous)
+    if mode == Mode.ielr:
+        return IELRAutomata(LALR1Automata(g, engine, previous))  # type: ignore
+    if mode == Mode.lr1:
+        return LR1Automata(g)
+
+    raise HermesError(f"Invalid mode: {mode}")
@@ -1,4 +1,5 @@
-from typing import Optional, Dict, List
+from typing import Optional, Dict, List, Tuple
+from collections import Counter
 
 from .lalr1_automata import AnnotRule, Node, LALR1Automata
 from .grammar import Symbol
@@ -41,6 +42,7 @@ class ParseTable:
 
     def __init__(self, automata: LALR1Automata) -> None:
         self.automata = automata
+        symbols = automata.grammar.symbols
 
         self.conflicts: List[Conflict] = []
 
@@ -50,8 +52,8 @@ class ParseTable:
         self.terminals: List[Symbol] = []
         self.nonterminals: List[Symbol] = []
 
-        for x in Symbol.all():
-            if x not in {automata.grammar.startSymbol, Symbol.EMPTY, Symbol.END, Symbol.ERROR}:
+        for x in symbols.all():
+            if x not in {automata.grammar.startSymbol, symbols.EMPTY, symbols.END, symbols.ERROR}:
                 if x.isTerminal:
                     self.terminals.append(x)
                 else:
@@ -65,14 +67,19 @@ class ParseTable:
 
         self.symbolList.extend(self.nonterminals)
         self.symbolList.extend(self.terminals)
-        self.symbolList.append(Symbol.ERROR)
-        self.symbolList.append(Symbol.END)
+        self.symbolList.append(symbols.ERROR)
+        self.symbolList.append(symbols.END)
 
         self.symbolIDs: Dict[Symbol, int] = {
             x: idx - 1
             for idx, x in enumerate(self.symbolList)
         }
 
+        # Table column for each symbol, indexed by symbol ID
+        self.symbolColumns: List[int] = [-1] * symbols.count()
+        for x, col in self.symbolIDs.items():
+            self.symbolColumns[x.id] = col
+
         self.table: TableType = []
         for node in automata.nodes:
             # -1 to remove start symbol
@@ -81,10 +88,8 @@ class ParseTable:
 
             for rule in node.rules:
                 if rule.indexAtEnd():
-                    for terminal in rule.lookAhead:
-                        if terminal == Symbol.EMPTY:
-                            continue
-                        termID = self.symbolIDs[terminal]
+                    for terminal in symbols.fromMask(rule.lookAhead & ~symbols.EMPTY.bit):
+                        termID = self.symbolColumns[terminal.id]
                         curActionTuple = curRow[termID]
                         newActionTuple = ParseAction(Action.R, rule.rule.id, rule)
                         if curActionTuple != ParseAction() and curActionTuple != newActionTuple:
@@ -94,7 +99,7 @@ class ParseTable:
                     continue
 
                 nextSymbol = rule.nextSymbol()
-                nextSymbolID = self.symbolIDs[nextSymbol]
+                nextSymbolID = self.symbolColumns[nextSymbol.id]
                 nextNode = node.trans[nextSymbol].id
 
                 if nextSymbol.isTerminal:
@@ -115,6 +120,74 @@ class ParseTable:
             # End for rule in node
         # End for node in automata
 
+        self.computeDefaultReductions()
+        self.computeTerminalClasses()
+
+    def computeDefaultReductions(self):
+        """
+        Find the default reduction of every state, which is used when the look ahead has no action.
+        This is the most common reduction of the state, so the look aheads that reduce by it, and the
+        errors, can be left out of the compressed table. Errors are still found before the next shift,
+        the states reached by reducing do not have an action for the look ahead either.
+        A state is consistent if its default reduction is its only action, so the parser can
+        reduce without reading the look ahead.
+        Reducing to the start symbol accepts the input, so it is never a default
+        """
+        startSymbol = self.automata.grammar.startSymbol
+        acceptRules = {x.id for x in self.automata.grammar.rules if x.nonterm == startSymbol}
+
+        # Rule ID of the default reduction of each state, -1 if there is none
+        self.defaultReductions: List[int] = []
+        self.consistent: List[bool] = []
+        for row in self.table:
+            actions = [x for x in row[len(self.nonterminals):] if x.action != Action.E]
+            counts = Counter(x.state for x in actions if x.action == Action.R and x.state not in acceptRules)
+            if len(counts) == 0:
+                self.defaultReductions.append(-1)
+                self.consistent.append(False)
+                continue
+
+            # Break ties by the lowest rule, so the output does not depend on the order
+            default = min(counts, key=lambda x: (-counts[x], x))
+            self.defaultReductions.append(default)
+            self.consistent.append(counts[default] == len(actions))
+
+    def computeTerminalClasses(self):
+        """
+        Group the terminals that have the same action in every state, so the compressed table
+        only needs one column per class. An error and the default reduction of a state are the
+        same action here, since the compressed table replaces errors with the default reduction,
+        see computeDefaultReductions(). Each terminal is shifted to its own states, so only
+        terminals that are never shifted, or are only look aheads, share a class
+        """
+        numNonterms = len(self.nonterminals)
+        defaults = [self.getDefaultAction(x) for x in range(len(self.table))]
+        classes: Dict[Tuple[Tuple[str, int], ...], int] = {}
+
+        # Class of each terminal column, the column minus the number of nonterminals
+        self.terminalClasses: List[int] = []
+        # The first terminal column of each class
+        self.classColumns: List[int] = []
+        for col in range(numNonterms, len(self.symbolList) - 1):
+            key = tuple(
+                (Action.E, 0) if row[col] == default else (row[col].action, row[col].state)
+                for row, default in zip(self.table, defaults)
+            )
+            try:
+                self.terminalClasses.append(classes[key])
+            except KeyError:
+                classes[key] = len(self.classColumns)
+                self.terminalClasses.append(len(self.classColumns))
+                self.classColumns.append(col)
+
+    def getDefaultAction(self, state: int) -> ParseAction:
+        """
+        :return: The action of a state when the look ahead has no action, see computeDefaultReductions()
+        """
+        if self.defaultReductions[state] < 0:
+            return ParseAction()
+        return ParseAction(Action.R, self.defaultReductions[state])
+
     def printTable(self):
         print("   ", end="")
         for x in self.symbolList:
@@ -0,0 +1,239 @@
+"""
+Long running generator, see client.py for sending it requests
+
+Every request is a set of command line arguments. The server remembers the
+result of each one, and the grammar files and outputs it used. A request is
+only generated again if one of those files changed, and the files of every
+request seen so far are watched so changed grammars are regenerated before
+they are asked for. The automata of each request is kept, so regenerating
+only rebuilds the states affected by the change, like --incremental.
+Clients are authenticated with a key the server creates, see client.py.
+"""
+from typing import Callable, Dict, List, Optional, Tuple
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Connection, Listener
+import json
+import os
+import secrets
+import threading
+
+from hermes_gen.__main__ import BuildState, makeParser, generateEntry
+from hermes_gen.cache import grammarFiles
+from hermes_gen.client import keyFilename
+from hermes_gen import hermes_logs
+
+# Seconds between checks for changed grammar files
+WATCH_INTERVAL_SEC = 0.5
+
+# Modification time and size of a file, None if it does not exist
+Stamp = Optional[Tuple[int, int]]
+
+
+def _stamp(filename: str) -> Stamp:
+    try:
+        st = os.stat(filename)
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+def _writeKey(filename: str) -> bytes:
+    """
+    Create a new authentication key, only readable by the current user
+    :return: The key
+    """
+    authkey = secrets.token_bytes(32)
+    try:
+        os.remove(filename)
+    except FileNotFoundError:
+        pass
+    # Exclusive, so a file put in its place by someone else is not written to
+    fd = os.open(filename, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    with os.fdopen(fd, mode='wb') as f:
+        f.write(authkey)
+    return authkey
+
+
+def _sourceStamps() -> Dict[str, Stamp]:
+    """
+    Stamp the source files of the generator, the server is outdated once they change
+    """
+    out: Dict[str, Stamp] = {}
+    root = os.path.dirname(__file__)
+    for folder, _, files in os.walk(root):
+        for filename in files:
+            if filename.endswith(".py"):
+                path = os.path.join(folder, filename)
+                out[path] = _stamp(path)
+    return out
+
+
+class _Job:
+    """
+    The command line arguments of one request, and the result of the last time they were run
+    """
+
+    def __init__(self, argv: List[str], cwd: str) -> None:
+        self.argv = argv
+        self.cwd = cwd
+        # The grammar files and outputs, as they were when last generated
+        self.inputs: Dict[str, Stamp] = {}
+        self.outputs: Dict[str, Stamp] = {}
+        # Exit code, stdout and stderr of the last run
+        self.result: Optional[Tuple[int, str, str]] = None
+        # The automata of the last run, reused by the next
+        self.state = BuildState()
+
+    def stale(self) -> bool:
+        """
+        Check if the job has not been run, or if one of its files changed since
+        """
+        if self.result is None:
+            return True
+        for files in [self.inputs, self.outputs]:
+            for filename, stamp in files.items():
+                if _stamp(filename) != stamp:
+                    return True
+        return False
+
+    def run(self) -> None:
+        prevDir = os.getcwd()
+        os.chdir(self.cwd)
+        try:
+            # Invalid arguments are reported by generateEntry()
+            try:
+                args = makeParser().parse_args(self.argv)
+            except SystemExit:
+                args = None
+
+            if args is not None and len(args.grammar_file) > 0:
+                # Stamp the inputs before generating, so changes made while generating are not missed
+                self.inputs = {os.path.abspath(x): _stamp(x) for x in grammarFiles(args.grammar_file)}
+            self.result = generateEntry(self.argv, self.state)
+
+            self.outputs = {}
+            if args is not None:
+                for filename in [
+                    args.table,
+                    args.automata,
+                    args.loader,
+                    args.impl,
+                    args.pybind,
+                    args.python_stubs,
+                    args.snapshot,
+                ]:
+                    if len(filename) > 0:
+                        self.outputs[os.path.abspath(filename)] = _stamp(filename)
+        finally:
+            os.chdir(prevDir)
+
+
+class GenerationServer:
+
+    def __init__(self, address: str, interval: float = WATCH_INTERVAL_SEC) -> None:
+        """
+        :param address: A socket filename, or a named pipe on Windows
+        :param interval: Seconds between checks for changed grammar files
+        """
+        self.address = address
+        self.interval = interval
+
+        self._jobs: Dict[Tuple[str, Tuple[str, ...]], _Job] = {}
+        # Generating changes the working directory and redirects output,
+        # so only one job can run at a time
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._sources = _sourceStamps()
+
+    def outdated(self) -> bool:
+        """
+        Check if the source of the generator changed since the server started
+        """
+        return _sourceStamps() != self._sources
+
+    def _log(self, log: Callable[..., None], *msg: str) -> None:
+        """
+        Print a message of the server itself
+        :param log: The hermes_logs function to print it with
+        """
+        # A running job has stderr redirected to its own output, wait for it to finish
+        with self._lock:
+            log(*msg)
+
+    def generate(self, argv: List[str], cwd: str) -> Tuple[int, str, str]:
+        """
+        Get the result of the arguments, generating them only if they are new or their files changed
+        :return: The exit code, and the stdout and stderr output
+        """
+        with self._lock:
+            key = (cwd, tuple(argv))
+            try:
+                job = self._jobs[key]
+            except KeyError:
+                job = _Job(argv, cwd)
+                self._jobs[key] = job
+
+            if job.stale():
+                job.run()
+            assert job.result is not None
+            return job.result
+
+    def _watch(self) -> None:
+        while not self._stopped.wait(self.interval):
+            if self.outdated():
+                # Stopped by the next request
+                continue
+            # Messages are printed while holding the lock, so they are not captured by a job
+            with self._lock:
+                for job in self._jobs.values():
+                    if job.stale():
+                        hermes_logs.info("Regenerating:", " ".join(job.argv))
+                        try:
+                            job.run()
+                        except Exception as err:
+                            hermes_logs.err("Unable to regenerate:", " ".join(job.argv), repr(err))
+
+    def _handle(self, conn: Connection) -> None:
+        request = json.loads(conn.recv_bytes())
+        if self.outdated():
+            # Close without a response, so the client generates with the new source
+            self._log(hermes_logs.warn, "The generator changed, stopping")
+            self._stopped.set()
+            return
+        if request.get("stop", False):
+            self._stopped.set()
+            conn.send_bytes(json.dumps({"code": 0, "stdout": "", "stderr": ""}).encode())
+            return
+
+        code, stdout, stderr = self.generate(request["argv"], request["cwd"])
+        conn.send_bytes(json.dumps({"code": code, "stdout": stdout, "stderr": stderr}).encode())
+
+    def serve(self) -> None:
+        """
+        Handle requests until a stop request is received
+        """
+        keyFile = keyFilename(self.address)
+        authkey = _writeKey(keyFile)
+        watcher = threading.Thread(target=self._watch, daemon=True)
+        watcher.start()
+        try:
+            with Listener(self.address, authkey=authkey) as listener:
+                self._log(hermes_logs.info, "Listening on", self.address)
+                while not self._stopped.is_set():
+                    try:
+                        conn = listener.accept()
+                    except (AuthenticationError, EOFError, ConnectionError) as err:
+                        self._log(hermes_logs.warn, "Rejected connection:", str(err))
+                        continue
+                    with conn:
+                        try:
+                            self._handle(conn)
+                        except (EOFError, OSError, ValueError, KeyError) as err:
+                            self._log(hermes_logs.warn, "Invalid request:", str(err))
+                        except Exception as err:
+                            # Keep serving the other requests
+                            self._log(hermes_logs.err, "Request failed:", repr(err))
+        finally:
+            self._stopped.set()
+            watcher.join()
+            os.remove(keyFile)
@@ -0,0 +1,470 @@
+"""
+Binary snapshot of a built Grammar, automata, and ParseTable
+
+Layout, all integers are little endian:
+    magic        4 bytes, b'HMSN'
+    version      u32
+    numSections  u32
+    section table, numSections entries of
+        name     16 bytes, ascii, zero padded
+        offset   u64, from the start of the file
+        length   u64
+    section payloads
+
+Sections are only decoded when they are first needed, see Snapshot
+"""
+from typing import Callable, Dict, List, Optional, Tuple, TypeVar, Union
+from array import array
+import struct
+import sys
+
+from hermes_gen.grammar import Grammar, Rule, Symbol, SymbolTable
+from hermes_gen.lalr1_automata import LALR1Automata, Node
+from hermes_gen.parseTable import ParseTable, ParseAction, Action
+from hermes_gen.counterexample.conflict import Conflict
+from hermes_gen.errors import HermesError
+
+MAGIC = b'HMSN'
+# Bump if the layout of any section changes
+SNAPSHOT_VERSION = 1
+
+_HEADER = struct.Struct('<4sII')
+_SECTION = struct.Struct('<16sQQ')
+_U32 = struct.Struct('<I')
+
+# Action of a parse table cell, stored in the low bits of the cell
+_ACTIONS = [Action.E, Action.S, Action.R, Action.G, Action.A]
+_ACTION_CODES = {x: idx for idx, x in enumerate(_ACTIONS)}
+_ACTION_BITS = 3
+
+# Marks a rule without a code block
+_NO_CODE = -1
+
+T = TypeVar("T")
+
+
+class _Encoder:
+    """
+    Builds the payload of a section
+    """
+
+    def __init__(self) -> None:
+        self.out = bytearray()
+
+    def ints(self, values: List[int]):
+        """
+        Packed array of signed 32 bit integers, prefixed with the count
+        """
+        packed = array('i', values)
+        if sys.byteorder != 'little':
+            packed.byteswap()
+        self.out += _U32.pack(len(packed))
+        self.out += packed.tobytes()
+
+    def strings(self, values: List[str]):
+        self.out += _U32.pack(len(values))
+        for value in values:
+            encoded = value.encode()
+            self.out += _U32.pack(len(encoded))
+            self.out += encoded
+
+    def masks(self, values: List[int]):
+        """
+        Packed array of bitmasks, all stored with the width of the largest
+        """
+        width = max([(x.bit_length() + 7) // 8 for x in values] + [1])
+        self.out += _U32.pack(len(values))
+        self.out += _U32.pack(width)
+        for value in values:
+            self.out += value.to_bytes(width, 'little')
+
+
+class _Decoder:
+    """
+    Reads back the values written by _Encoder, in the same order
+    """
+
+    def __init__(self, data: Union[bytes, memoryview]) -> None:
+        self.data = data
+        self.pos = 0
+
+    def _take(self, size: int) -> Union[bytes, memoryview]:
+        """
+        Get the next size bytes
+        :raises ValueError: If the section ends first
+        """
+        if self.pos + size > len(self.data):
+            raise ValueError(f"Read of {size} bytes at {self.pos} is past the end of the section")
+        out = self.data[self.pos:self.pos + size]
+        self.pos += size
+        return out
+
+    def _u32(self) -> int:
+        return _U32.unpack(self._take(_U32.size))[0]
+
+    def ints(self) -> List[int]:
+        count = self._u32()
+        packed = array('i')
+        packed.frombytes(self._take(count * packed.itemsize))
+        if sys.byteorder != 'little':
+            packed.byteswap()
+        return packed.tolist()
+
+    def strings(self) -> List[str]:
+        out = []
+        for _ in range(self._u32()):
+            length = self._u32()
+            out.append(bytes(self._take(length)).decode())
+        return out
+
+    def masks(self) -> List[int]:
+        count = self._u32()
+        width = self._u32()
+        return [int.from_bytes(self._take(width), 'little') for _ in range(count)]
+
+
+class _StringTable:
+
+    def __init__(self) -> None:
+        self.strings: List[str] = []
+        self.lookup: Dict[str, int] = {}
+
+    def __call__(self, value: str) -> int:
+        try:
+            return self.lookup[value]
+        except KeyError:
+            self.lookup[value] = len(self.strings)
+            self.strings.append(value)
+            return self.lookup[value]
+
+
+def writeSnapshot(filename: str, grammar: Grammar, automata: LALR1Automata, parseTable: ParseTable):
+    """
+    Write a snapshot of everything needed to generate the outputs of a grammar
+    :param filename: The output file
+    :param grammar: The grammar
+    :param automata: The automata built from the grammar, of any mode
+    :param parseTable: The parse table built from the automata
+    """
+    strings = _StringTable()
+    sections: List[Tuple[str, bytes]] = []
+
+    # Symbols, in ID order
+    enc = _Encoder()
+    symbols: List[Symbol] = [grammar.symbols.fromID(x) for x in range(grammar.symbols.count())]
+    symbolInts: List[int] = []
+    for symbol in symbols:
+        flags = (1 if symbol.isTerminal else 0) | (2 if symbol.nullable else 0)
+        symbolInts.extend([strings(symbol.name), strings(symbol.regex), flags])
+    enc.ints(symbolInts)
+    enc.masks([x.firstMask for x in symbols] + [Symbol.mask(x.follow) for x in symbols])
+    sections.append(("symbols", bytes(enc.out)))
+
+    # Grammar
+    enc = _Encoder()
+    enc.ints([grammar.startSymbol.id])
+    enc.ints([x.id for x in grammar._terminals])
+    ruleInts: List[int] = []
+    for rule in grammar.rules:
+        ruleInts.extend([rule.id, rule.nonterm.id, len(rule.symbols)])
+        ruleInts.extend(x.id for x in rule.symbols)
+        ruleInts.extend([
+            _NO_CODE if rule.code is None else strings(rule.code),
+            strings(rule.file),
+            rule.lineNum,
+            rule.codeLine,
+        ])
+    enc.ints(ruleInts)
+    directiveInts: List[int] = []
+    for key, values in grammar.directives.items():
+        directiveInts.extend([strings(key), len(values)])
+        directiveInts.extend(strings(x) for x in values)
+    enc.ints(directiveInts)
+    sections.append(("grammar", bytes(enc.out)))
+
+    # Automata
+    enc = _Encoder()
+    nodeInts: List[int] = [automata.start.id]
+    lookAheads: List[int] = []
+    for node in automata.nodes:
+        nodeInts.append(len(node.rules))
+        for annotRule in node.rules:
+            nodeInts.extend([annotRule.rule.id, annotRule.parseIndex])
+            lookAheads.append(annotRule.lookAhead)
+        nodeInts.append(len(node.trans))
+        for symbol, nextNode in node.trans.items():
+            nodeInts.extend([symbol.id, nextNode.id])
+    enc.ints(nodeInts)
+    enc.masks(lookAheads)
+    sections.append(("automata", bytes(enc.out)))
+
+    # Parse table
+    enc = _Encoder()
+    enc.ints([x.id for x in parseTable.symbolList])
+    enc.ints([x.id for x in parseTable.terminals])
+    enc.ints([x.id for x in parseTable.nonterminals])
+    numCols = len(parseTable.table[0]) if len(parseTable.table) > 0 else 0
+    cells: List[int] = [len(parseTable.table), numCols]
+    for row in parseTable.table:
+        cells.extend((x.state << _ACTION_BITS) | _ACTION_CODES[x.action] for x in row)
+    enc.ints(cells)
+    conflictInts: List[int] = []
+    for c in parseTable.conflicts:
+        conflictInts.extend([
+            c.node.id,
+            c.symbol.id,
+            c.rule1.rule.id,
+            c.rule1.parseIndex,
+            c.rule2.rule.id,
+            c.rule2.parseIndex,
+        ])
+    enc.ints(conflictInts)
+    sections.append(("table", bytes(enc.out)))
+
+    enc = _Encoder()
+    enc.strings(strings.strings)
+    sections.insert(0, ("strings", bytes(enc.out)))
+
+    with open(filename, mode='wb') as f:
+        f.write(_HEADER.pack(MAGIC, SNAPSHOT_VERSION, len(sections)))
+        offset = _HEADER.size + _SECTION.size * len(sections)
+        for name, payload in sections:
+            f.write(_SECTION.pack(name.encode(), offset, len(payload)))
+            offset += len(payload)
+        for _, payload in sections:
+            f.write(payload)
+
+
+class SnapshotAutomata:
+    """
+    The automata loaded from a snapshot.
+    Has the same nodes, start, and grammar as the automata that was written
+    """
+
+    def __init__(self, grammar: Grammar, start: Node, nodes: List[Node]) -> None:
+        self.grammar = grammar
+        self.start = start
+        self.nodes = nodes
+
+
+class Snapshot:
+    """
+    A snapshot loaded from a file. The grammar, automata, and parse table
+    are only rebuilt when first accessed.
+    """
+
+    def __init__(self, filename: str) -> None:
+        self.filename = filename
+        with open(filename, mode='rb') as f:
+            self._data = memoryview(f.read())
+
+        if len(self._data) < _HEADER.size:
+            raise HermesError(f"{filename} is not a Hermes snapshot")
+
+        magic, version, numSections = _HEADER.unpack_from(self._data, 0)
+        if magic != MAGIC:
+            raise HermesError(f"{filename} is not a Hermes snapshot")
+        if version != SNAPSHOT_VERSION:
+            raise HermesError(f"{filename} has snapshot version {version}, expected {SNAPSHOT_VERSION}")
+
+        if _HEADER.size + numSections * _SECTION.size > len(self._data):
+            raise HermesError(f"{filename} is truncated or corrupt")
+
+        self._sections: Dict[str, memoryview] = {}
+        for idx in range(numSections):
+            rawName, offset, length = _SECTION.unpack_from(self._data, _HEADER.size + idx * _SECTION.size)
+            if offset + length > len(self._data):
+                raise HermesError(f"{filename} is truncated or corrupt")
+            self._sections[rawName.rstrip(b'\0').decode(errors='replace')] = self._data[offset:offset + length]
+
+        self._strings: Optional[List[str]] = None
+        self._grammar: Optional[Grammar] = None
+        self._automata: Optional[SnapshotAutomata] = None
+        self._parseTable: Optional[ParseTable] = None
+
+    def _decode(self, loader: Callable[[], T]) -> T:
+        """
+        Run a section loader, reporting bad offsets and IDs as a HermesError
+        """
+        try:
+            return loader()
+        except (IndexError, KeyError, ValueError, struct.error) as e:
+            raise HermesError(f"{self.filename} is truncated or corrupt") from e
+
+    def _section(self, name: str) -> _Decoder:
+        try:
+            return _Decoder(self._sections[name])
+        except KeyError:
+            raise HermesError(f"{self.filename} is missing the {name} section") from None
+
+    @property
+    def strings(self) -> List[str]:
+        if self._strings is None:
+            self._strings = self._decode(self._section("strings").strings)
+        return self._strings
+
+    @property
+    def grammar(self) -> Grammar:
+        if self._grammar is None:
+            self._grammar = self._decode(self._loadGrammar)
+        return self._grammar
+
+    @property
+    def automata(self) -> SnapshotAutomata:
+        if self._automata is None:
+            self._automata = self._decode(self._loadAutomata)
+        return self._automata
+
+    @property
+    def parseTable(self) -> ParseTable:
+        if self._parseTable is None:
+            self._parseTable = self._decode(self._loadParseTable)
+        return self._parseTable
+
+    def _loadGrammar(self) -> Grammar:
+        strings = self.strings
+
+        dec = self._section("symbols")
+        symbolInts = dec.ints()
+        masks = dec.masks()
+        numSymbols = len(symbolInts) // 3
+
+        symbols = SymbolTable()
+        # The table starts with the builtin symbols, which are the first in every grammar
+        for idx in range(numSymbols):
+            name = strings[symbolInts[idx * 3]]
+            regex = strings[symbolInts[idx * 3 + 1]]
+            flags = symbolInts[idx * 3 + 2]
+            if idx < symbols.count():
+                symbol = symbols.fromID(idx)
+                if symbol.name != name:
+                    raise HermesError(f"{self.filename} Unexpected builtin symbol {name}, expected {symbol.name}")
+            else:
+                symbol = symbols.add(name, regex, (flags & 2) != 0)
+            symbol.isTerminal = (flags & 1) != 0
+
+        for idx in range(numSymbols):
+            symbol = symbols.fromID(idx)
+            symbol.firstMask = masks[idx]
+            symbol.first = set(symbols.fromMask(masks[idx]))
+            symbol.follow = set(symbols.fromMask(masks[numSymbols + idx]))
+
+        dec = self._section("grammar")
+        startSymbol = symbols.fromID(dec.ints()[0])
+        terminals = [symbols.fromID(x) for x in dec.ints()]
+
+        rules: List[Rule] = []
+        ruleInts = dec.ints()
+        idx = 0
+        while idx < len(ruleInts):
+            ruleID, nonterm, numSymbols = ruleInts[idx:idx + 3]
+            idx += 3
+            ruleSymbols = [symbols.fromID(x) for x in ruleInts[idx:idx + numSymbols]]
+            idx += numSymbols
+            code, file, lineNum, codeLine = ruleInts[idx:idx + 4]
+            idx += 4
+            rules.append(
+                Rule(
+                    ruleID,
+                    symbols.fromID(nonterm),
+                    ruleSymbols,
+                    None if code == _NO_CODE else strings[code],  # type: ignore
+                    strings[file],
+                    lineNum,
+                    codeLine
+                )
+            )
+
+        directives: Dict[str, List[str]] = {}
+        directiveInts = dec.ints()
+        idx = 0
+        while idx < len(directiveInts):
+            key, numValues = directiveInts[idx:idx + 2]
+            idx += 2
+            directives[strings[key]] = [strings[x] for x in directiveInts[idx:idx + numValues]]
+            idx += numValues
+
+        # Skip Grammar.__init__(), the FIRST and FOLLOW sets were loaded above
+        grammar = Grammar.__new__(Grammar)
+        grammar.symbols = symbols
+        grammar._terminals = terminals
+        grammar._terminalNames = {x.name for x in terminals}
+        grammar.rules = rules
+        grammar.startSymbol = startSymbol
+        grammar.directives = directives
+        grammar._gen_suffix_first()
+
+        return grammar
+
+    def _loadAutomata(self) -> SnapshotAutomata:
+        grammar = self.grammar
+        # Rule IDs are not always the index in the rule list
+        rules = {x.id: x for x in grammar.rules}
+
+        dec = self._section("automata")
+        nodeInts = dec.ints()
+        lookAheads = dec.masks()
+
+        # Create every node first so transitions can refer to later nodes
+        nodes: List[Node] = []
+        transitions: List[List[int]] = []
+        idx = 1
+        laIdx = 0
+        while idx < len(nodeInts):
+            node = Node(len(nodes))
+            numItems = nodeInts[idx]
+            idx += 1
+            for _ in range(numItems):
+                node.addRule(rules[nodeInts[idx]], nodeInts[idx + 1], lookAheads[laIdx])
+                idx += 2
+                laIdx += 1
+            numTrans = nodeInts[idx]
+            idx += 1
+            transitions.append(nodeInts[idx:idx + numTrans * 2])
+            idx += numTrans * 2
+            nodes.append(node)
+
+        for node, trans in zip(nodes, transitions):
+            for i in range(0, len(trans), 2):
+                node.trans[grammar.symbols.fromID(trans[i])] = nodes[trans[i + 1]]
+
+        return SnapshotAutomata(grammar, nodes[nodeInts[0]], nodes)
+
+    def _loadParseTable(self) -> ParseTable:
+        automata = self.automata
+        symbols = automata.grammar.symbols
+
+        dec = self._section("table")
+        # Skip ParseTable.__init__(), the table was loaded
+        parseTable = ParseTable.__new__(ParseTable)
+        parseTable.automata = automata  # type: ignore
+        parseTable.symbolList = [symbols.fromID(x) for x in dec.ints()]
+        parseTable.terminals = [symbols.fromID(x) for x in dec.ints()]
+        parseTable.nonterminals = [symbols.fromID(x) for x in dec.ints()]
+        parseTable.symbolIDs = {x: idx - 1 for idx, x in enumerate(parseTable.symbolList)}
+        parseTable.symbolColumns = [-1] * symbols.count()
+        for x, col in parseTable.symbolIDs.items():
+            parseTable.symbolColumns[x.id] = col
+
+        cells = dec.ints()
+        numRows, numCols = cells[0], cells[1]
+        mask = (1 << _ACTION_BITS) - 1
+        parseTable.table = []
+        for rowIdx in range(numRows):
+            start = 2 + rowIdx * numCols
+            parseTable.table.append([
+                ParseAction(_ACTIONS[x & mask], x >> _ACTION_BITS) for x in cells[start:start + numCols]
+            ])
+
+        parseTable.conflicts = []
+        conflictInts = dec.ints()
+        for idx in range(0, len(conflictInts), 6):
+            nodeID, symbolID, rule1, index1, rule2, index2 = conflictInts[idx:idx + 6]
+            node = automata.nodes[nodeID]
+            parseTable.conflicts.append(
+                Conflict(node, symbols.fromID(symbolID), node.ruleIndex[(rule1, index1)], node.ruleIndex[(rule2, index2)])
+            )
+
+        parseTable.computeDefaultReductions()
+        parseTable.computeTerminalClasses()
+        return parseTable
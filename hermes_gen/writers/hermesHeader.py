@@ -1,10 +1,36 @@
-from typing import TextIO
-from datetime import datetime
+from typing import Callable, Iterator, TextIO
+from contextlib import contextmanager
+import hashlib
+import io
 
+from .utils import writeIfChanged
 
-def writeHermesHeader(f: TextIO):
-    header = ("/*******\n"
-              "This file was generated by Hermes, do not edit\n"
-              f"{datetime.now()}\n"
-              "*******/\n")
-    f.write(header)
+
+def hermesHeader(digest: str) -> str:
+    return ("/*******\n"
+            "This file was generated by Hermes, do not edit\n"
+            f"Content hash: {digest}\n"
+            "*******/\n")
+
+
+def pythonHeader(digest: str) -> str:
+    return ("#*******\n"
+            "# This file was generated by Hermes, do not edit\n"
+            f"# Content hash: {digest}\n"
+            "#*******\n")
+
+
+@contextmanager
+def generatedFile(filename: str, header: Callable[[str], str] = hermesHeader) -> Iterator[TextIO]:
+    """
+    Write a generated file, starting with a header holding a hash of the content.
+    The output only depends on the input, and the file is only written if the
+    content changed, so the files that include it are not rebuilt
+    :param filename: The file to write
+    :param header: Makes the header from the hash, see hermesHeader()
+    """
+    f = io.StringIO()
+    yield f
+    body = f.getvalue()
+    digest = hashlib.sha256(body.encode()).hexdigest()[:16]
+    writeIfChanged(filename, header(digest) + body)
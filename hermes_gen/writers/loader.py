@@ -1,4 +1,4 @@
-from .hermesHeader import writeHermesHeader
+from .hermesHeader import generatedFile
 from hermes_gen.grammar import Grammar
 from hermes_gen.directives import Directive
 from .utils import writeUserHeader
@@ -6,9 +6,7 @@ from .utils import writeUserHeader
 
 def writeLoader(headerFilename: str, implFilename: str, name: str, grammar: Grammar):
     returnType = grammar.directives[Directive.return_][0]
-    with open(headerFilename, mode='w') as f:
-        writeHermesHeader(f)
-
+    with generatedFile(headerFilename) as f:
         f.write("#pragma once\n"
                 "#include <memory>\n"
                 "#include <iostream>\n"
@@ -24,8 +22,7 @@ def writeLoader(headerFilename: str, implFilename: str, name: str, grammar: Gram
         ]
         f.write("\n".join(lines))
 
-    with open(implFilename, mode='w') as f:
-        writeHermesHeader(f)
+    with generatedFile(implFilename) as f:
         lines = [
             f"#include <hermes/{name}_loader.h>",
             f"#include <hermes/{name}_grammar.h>",
@@ -35,8 +32,7 @@ def writeLoader(headerFilename: str, implFilename: str, name: str, grammar: Gram
             f"std::shared_ptr<Parser<{returnType}>> load_{name}()",
             "{",
             f"    auto grammar =  Grammar<{returnType}>::New(",
-            "       &PARSE_TABLE[0][0],",
-            "       TABLE_COLS, TABLE_ROWS,",
+            "       &PARSE_TABLE,",
             "       REDUCTIONS.data(),",
             "       REDUCTION_FUNCS.data(),",
             "       SYMBOL_LOOKUP.data(),",
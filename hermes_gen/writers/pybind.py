@@ -1,6 +1,4 @@
-from datetime import datetime
-
-from hermes_gen.writers.hermesHeader import writeHermesHeader
+from hermes_gen.writers.hermesHeader import generatedFile, pythonHeader
 from hermes_gen.grammar import Grammar
 from hermes_gen.directives import Directive
 
@@ -8,9 +6,7 @@ from hermes_gen.directives import Directive
 
 
 def writePybindModule(filename: str, grammar: Grammar, name: str):
-    with open(filename, mode='w') as f:
-        writeHermesHeader(f)
-
+    with generatedFile(filename) as f:
         f.write(
             "#include <hermes/internal/bind-hermes-py.h>\n"
             f"#include <hermes/{name}_loader.h>\n"
@@ -37,12 +33,7 @@ def writePybindModule(filename: str, grammar: Grammar, name: str):
 
 
 def writePythonStubs(filename: str, grammar: Grammar, name: str):
-    with open(filename, mode='w') as f:
-        f.write("#*******\n"
-                "# This file was generated by Hermes, do not edit\n"
-                f"# {datetime.now()}\n"
-                "#*******\n")
-
+    with generatedFile(filename, pythonHeader) as f:
         returnType = grammar.directives[Directive.return_][0]
 
         # yapf: disable
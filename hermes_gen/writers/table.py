@@ -1,19 +1,17 @@
+from typing import List
 import re
 
-from hermes_gen.writers.hermesHeader import writeHermesHeader
+from hermes_gen.writers.hermesHeader import generatedFile
 from hermes_gen.grammar import Grammar
 from hermes_gen.directives import Directive
-from hermes_gen.parseTable import ParseTable, Action
+from hermes_gen.parseTable import ParseTable, ParseAction, Action
+from hermes_gen.compressedTable import CompressedTable
 from hermes_gen.consts import ARG_VECTOR
 from .utils import writeUserHeader
 
-# TODO change parse table to a list of lists, since most columns are empty
-
 
 def writeParseTable(filename: str, grammar: Grammar, table: ParseTable):
-    with open(filename, mode='w') as f:
-        writeHermesHeader(f)
-
+    with generatedFile(filename) as f:
         f.write(
             "#include <hermes/internal/grammar.h>\n"
             "#include <hermes/internal/regex/regex.h>\n"
@@ -78,31 +76,51 @@ def writeParseTable(filename: str, grammar: Grammar, table: ParseTable):
             f.write('\n')
         f.write("}; // End REDUCTIONS\n\n")
 
-        tableRows = len(table.table)
-        tableCols = len(table.table[0])
+        compressed = CompressedTable(table)
+
+        def writeArray(cType: str, name: str, values: List[str]):
+            f.write(f"const {cType} {name}[{max(len(values), 1)}] = {{\n")
+            # 16 values per line
+            for idx in range(0, len(values), 16):
+                f.write(", ".join(values[idx:idx + 16]))
+                if idx + 16 < len(values):
+                    f.write(",")
+                f.write("\n")
+            if len(values) == 0:
+                # Arrays cannot be empty
+                f.write("{}\n")
+            f.write(f"}}; // End {name}\n\n")
+
+        def writeAction(action: ParseAction) -> str:
+            if action.action == Action.E:
+                return "{}"
+            return f"{{{action.action}, {action.state}}}"
+
+        writeArray("unsigned short", "TERMINAL_CLASSES", [str(x) for x in compressed.terminalClasses])
+        writeArray(
+            "DefaultReduction",
+            "DEFAULT_REDUCTIONS",
+            [
+                f"{{{rule}, {'true' if consistent else 'false'}}}"
+                for rule, consistent in zip(compressed.defaultReductions, compressed.consistent)
+            ],
+        )
+        writeArray("unsigned", "ACTION_BASE", [str(x) for x in compressed.actionBase])
+        writeArray("ParseAction", "ACTIONS", [writeAction(x) for x in compressed.actions])
+        writeArray("unsigned short", "ACTION_CHECK", [str(x) for x in compressed.actionCheck])
+        writeArray("unsigned short", "DEFAULT_GOTOS", [str(x) for x in compressed.defaultGotos])
+        writeArray("unsigned", "GOTO_START", [str(x) for x in compressed.gotoStart])
+        writeArray("GotoEntry", "GOTOS", [f"{{{state}, {target}}}" for state, target in compressed.gotos])
 
         f.write(
-            f"constexpr unsigned TABLE_ROWS = {tableRows};\n"
-            f"constexpr unsigned TABLE_COLS = {tableCols};\n"
-            f"const ParseAction PARSE_TABLE[{tableRows}][{tableCols}] = {{\n"
+            "const ParseTableDef PARSE_TABLE = {\n"
+            f"    {compressed.numRows}, {compressed.numCols}, {compressed.numNonterms},\n"
+            "    TERMINAL_CLASSES, DEFAULT_REDUCTIONS,\n"
+            "    ACTION_BASE, ACTIONS, ACTION_CHECK,\n"
+            "    DEFAULT_GOTOS, GOTO_START, GOTOS\n"
+            "}; // End parse table\n\n"
         )
 
-        for rowIdx, row in enumerate(table.table):
-            f.write("{ ")
-            for idx, action in enumerate(row):
-                if action.action != Action.E:
-                    f.write(f"{{{action.action}, {action.state}}}")
-                else:
-                    f.write('{}')
-                if idx < len(row) - 1:
-                    f.write(", ")
-
-            f.write(" }")  # End Parse Row
-            if rowIdx < len(table.table) - 1:
-                f.write(",")
-            f.write("\n")
-        f.write("}; // End parse table\n")
-
         f.write(f"using ReductionFunc = {returnType} (*)(std::vector<StackItemPtr>);\n")
 
         for idx, rule in enumerate(grammar.rules):
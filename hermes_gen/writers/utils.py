@@ -3,6 +3,24 @@ from hermes_gen.grammar import Grammar
 from hermes_gen.directives import Directive
 
 
+def writeIfChanged(filename: str, text: str) -> bool:
+    """
+    Write a file, unless it already holds the same text.
+    Keeps the modification time of unchanged files, so build tools do not rebuild what depends on them
+    :return: True if the file was written
+    """
+    try:
+        with open(filename, mode='r') as f:
+            if f.read() == text:
+                return False
+    except (OSError, UnicodeDecodeError):
+        pass
+
+    with open(filename, mode='w') as f:
+        f.write(text)
+    return True
+
+
 def writeUserHeader(f: TextIO, grammar: Grammar):
     try:
         headers = grammar.directives[Directive.header]
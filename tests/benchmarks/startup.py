@@ -0,0 +1,68 @@
+"""
+Measure the startup time of the generator with python -X importtime
+
+    python tests/benchmarks/startup.py [--runs N] [--top N] [--max-ms MS]
+
+Prints the median time to import the command line entry point, and the
+modules that take the longest to import, counting the modules they import.
+Exits with an error if the median is above --max-ms, so it can be tracked in CI.
+"""
+from typing import Dict, List
+from argparse import ArgumentParser
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+ENTRY_POINT = "hermes_gen.__main__"
+
+
+def importTimes() -> Dict[str, int]:
+    """
+    Import the entry point in a new interpreter
+    :return: The cumulative import time of each module in microseconds
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {ENTRY_POINT}"],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+    out: Dict[str, int] = {}
+    for line in result.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        out[name.strip()] = int(cumulative)
+    return out
+
+
+def main():
+    parser = ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", help="The number of interpreters to start", type=int, default=10)
+    parser.add_argument("--top", help="The number of modules to list", type=int, default=15)
+    parser.add_argument("--max-ms", help="Fail if the median import time is above this", type=float, default=0)
+    args = parser.parse_args()
+
+    # Write the bytecode first, so compiling is not measured
+    subprocess.run([sys.executable, "-m", "compileall", "-q", "hermes_gen"], cwd=ROOT, check=True)
+
+    runs: List[Dict[str, int]] = [importTimes() for _ in range(args.runs)]
+    medians = {name: statistics.median(x.get(name, 0) for x in runs) for name in runs[0]}
+    total = medians[ENTRY_POINT] / 1000
+
+    print(f"{ENTRY_POINT}: {total:.1f} ms (median of {args.runs})")
+    for name in sorted(medians, key=lambda x: medians[x], reverse=True)[1:args.top + 1]:
+        print(f"  {medians[name] / 1000:>7.1f} ms  {name}")
+
+    if args.max_ms > 0 and total > args.max_ms:
+        print(f"Startup is slower than {args.max_ms} ms", file=sys.stderr)
+        exit(1)
+
+
+if __name__ == '__main__':
+    main()
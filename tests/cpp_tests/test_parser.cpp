@@ -0,0 +1,85 @@
+#include <catch2/catch_test_macros.hpp>
+
+#include <hermes/calc_loader.h>
+#include <hermes/errors.h>
+
+#include <exception>
+#include <iostream>
+#include <sstream>
+#include <string>
+
+namespace
+{
+
+// The result of parsing with the calculator grammar, and what its code blocks printed
+struct CalcResult
+{
+    int value = 0;
+    bool errored = false;
+    std::string printed;
+    std::string error;
+};
+
+CalcResult parseCalc(const std::string& text)
+{
+    static std::shared_ptr<hermes::Parser<int>> parser = hermes::load_calc();
+
+    CalcResult out;
+    std::stringstream printed;
+    std::streambuf* prev = std::cout.rdbuf(printed.rdbuf());
+    try
+    {
+        out.value = parser->parse(std::make_shared<std::stringstream>(text), out.errored);
+    }
+    catch(const std::exception& err)
+    {
+        out.error = err.what();
+    }
+    std::cout.rdbuf(prev);
+    out.printed = printed.str();
+    return out;
+}
+
+bool contains(const std::string& text, const std::string& part)
+{
+    return text.find(part) != std::string::npos;
+}
+
+} // namespace
+
+TEST_CASE("Actions and gotos", "[parser]")
+{
+    // Shifts, reductions, and the goto of every nonterminal
+    CalcResult result = parseCalc("1+2*3");
+    REQUIRE(result.error.empty());
+    REQUIRE(result.value == 7);
+    REQUIRE(result.printed == ">> 2 * 3 = 6\n>> 1 + 6 = 7\n");
+
+    REQUIRE(parseCalc("(4-1)*5").value == 15);
+    REQUIRE(parseCalc("((((1))))").value == 1);
+    REQUIRE(parseCalc("10/2-3").value == 2);
+    REQUIRE(parseCalc("7/7/7").value == 0);
+}
+
+TEST_CASE("Default reductions", "[parser]")
+{
+    // Reducing by default does not hide errors, they are found before the next shift
+    REQUIRE(contains(parseCalc("1 2").error, "Invalid token at 1:3"));
+    REQUIRE(contains(parseCalc("3--2").error, "Invalid token at 1:3"));
+
+    // But the code blocks of the rules before the error run first
+    CalcResult result = parseCalc("1 -12((2-");
+    REQUIRE(result.printed == ">> 1 - 12 = -11\n");
+    REQUIRE(contains(result.error, "Invalid token at 1:6"));
+}
+
+TEST_CASE("Tokens are read lazily", "[parser]")
+{
+    // States that can only reduce do not read the next token, so 2*3 is reduced before $ is scanned
+    CalcResult result = parseCalc("2*3 $");
+    REQUIRE(result.printed == ">> 2 * 3 = 6\n");
+    REQUIRE(contains(result.error, "Bad token: 1:5"));
+
+    // expr = ERROR is reduced before the unterminated comment is scanned
+    REQUIRE(contains(parseCalc("-/*").error, "Invalid token at 1:1"));
+}
@@ -0,0 +1,181 @@
+import unittest
+from unittest import mock
+import contextlib
+import io
+import os
+import shutil
+import tempfile
+import threading
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Client
+
+from . import utils
+from hermes_gen.server import GenerationServer
+from hermes_gen.client import request, stopServer, keyFilename
+from hermes_gen.lalr1_automata import LALR1Automata
+from hermes_gen import hermes_logs
+
+
+class TestServer(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.tempDir = tempfile.mkdtemp()
+        shutil.copy(utils.getTestFilename("conflicts/ifelse.hm"), self.tempDir)
+        self.grammarFile = os.path.join(self.tempDir, "ifelse.hm")
+        self.tableFile = os.path.join(self.tempDir, "out", "table.h")
+        self.argv = ["-n", "ifelse", "--no-color", "-t", self.tableFile, self.grammarFile]
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.tempDir)
+
+    def _address(self) -> str:
+        if os.name == 'nt':
+            return r'\\.\pipe\hermes_test_' + os.path.basename(self.tempDir)
+        return os.path.join(self.tempDir, "server.sock")
+
+    def test_1_regenerate_changed(self):
+        # Never watches, only checks when asked
+        server = GenerationServer(self._address(), interval=3600)
+
+        code, _, stderr = server.generate(self.argv, self.tempDir)
+        self.assertEqual(0, code)
+        self.assertIn("Conflict detected", stderr)
+        stamp = os.stat(self.tableFile).st_mtime_ns
+
+        # Nothing changed, the table is not written again
+        self.assertEqual((code, "", stderr), server.generate(self.argv, self.tempDir))
+        self.assertEqual(stamp, os.stat(self.tableFile).st_mtime_ns)
+
+        # A missing output is generated again
+        os.remove(self.tableFile)
+        self.assertEqual(0, server.generate(self.argv, self.tempDir)[0])
+        self.assertTrue(os.path.exists(self.tableFile))
+
+        # Removing the conflict changes the result
+        with open(self.grammarFile, mode='r') as f:
+            text = f.read()
+        with open(self.grammarFile, mode='w') as f:
+            f.write(text.replace("| if expr then stmt else stmt", ""))
+        code, _, stderr = server.generate(self.argv, self.tempDir)
+        self.assertEqual(0, code)
+        self.assertNotIn("Conflict detected", stderr)
+
+    def _serve(self, requests):
+        """
+        Send requests to a server running in another thread
+        :param requests: Called with the address once the server is listening
+        """
+        address = self._address()
+        server = GenerationServer(address)
+        thread = threading.Thread(target=server.serve)
+        with contextlib.redirect_stderr(io.StringIO()):
+            thread.start()
+            try:
+                # Wait for the server to listen
+                for _ in range(100):
+                    try:
+                        request(address, ["--help"], self.tempDir)
+                        break
+                    except OSError:
+                        thread.join(0.05)
+                else:
+                    self.fail("Server did not start")
+                requests(address)
+            finally:
+                stopServer(address)
+                thread.join()
+
+    def test_2_client(self):
+        results = []
+        self._serve(lambda address: results.append(request(address, self.argv, self.tempDir)))
+
+        self.assertEqual(0, results[0][0])
+        self.assertIn("Conflict detected", results[0][2])
+        self.assertTrue(os.path.exists(self.tableFile))
+
+    def test_3_failed_request(self):
+        results = []
+
+        def requests(address: str):
+            with mock.patch("hermes_gen.__main__.generate", side_effect=RuntimeError("Broken")):
+                results.append(request(address, self.argv, self.tempDir))
+            # The server is still running
+            otherTable = os.path.join(self.tempDir, "out", "other.h")
+            results.append(request(address, ["-n", "ifelse", "-t", otherTable, self.grammarFile], self.tempDir))
+
+        self._serve(requests)
+
+        code, _, stderr = results[0]
+        self.assertEqual(1, code)
+        self.assertIn("Traceback", stderr)
+        self.assertIn("RuntimeError: Broken", stderr)
+        self.assertEqual(0, results[1][0])
+        self.assertTrue(os.path.exists(os.path.join(self.tempDir, "out", "other.h")))
+
+    def test_4_reuse_automata(self):
+        server = GenerationServer(self._address(), interval=3600)
+        self.assertEqual(0, server.generate(self.argv, self.tempDir)[0])
+        job = server._jobs[(self.tempDir, tuple(self.argv))]
+        self.assertIsNotNone(job.state.automata)
+
+        with open(self.grammarFile, mode='r') as f:
+            text = f.read()
+        with open(self.grammarFile, mode='w') as f:
+            f.write(text.replace("| if expr then stmt else stmt", ""))
+
+        with mock.patch.object(
+            LALR1Automata, "_buildIncremental", autospec=True, side_effect=LALR1Automata._buildIncremental
+        ) as build:
+            code, _, stderr = server.generate(self.argv, self.tempDir)
+        self.assertEqual(0, code)
+        self.assertNotIn("Conflict detected", stderr)
+        build.assert_called_once()
+
+    def test_5_authkey(self):
+        keyFile = keyFilename(self._address())
+
+        def requests(address: str):
+            if os.name != 'nt':
+                self.assertEqual(0o600, os.stat(keyFile).st_mode & 0o777)
+
+            # Without the key, nothing is generated
+            with self.assertRaises(AuthenticationError):
+                with Client(address, authkey=b"wrong") as conn:
+                    conn.send_bytes(b'{"argv": [], "cwd": ""}')
+            self.assertFalse(os.path.exists(self.tableFile))
+
+            # The server is still running
+            self.assertEqual(0, request(address, self.argv, self.tempDir)[0])
+
+        self._serve(requests)
+        self.assertTrue(os.path.exists(self.tableFile))
+        self.assertFalse(os.path.exists(keyFile))
+
+    def test_6_server_messages(self):
+        server = GenerationServer(self._address(), interval=3600)
+        started = threading.Event()
+        release = threading.Event()
+        results = []
+
+        def generate(*_):
+            started.set()
+            release.wait()
+            return 0
+
+        stderr = io.StringIO()
+        with contextlib.redirect_stderr(stderr), mock.patch("hermes_gen.__main__.generate", side_effect=generate):
+            job = threading.Thread(target=lambda: results.append(server.generate(self.argv, self.tempDir)))
+            job.start()
+            started.wait()
+
+            # Printed from another thread while the job has stderr redirected
+            message = threading.Thread(target=server._log, args=(hermes_logs.warn, "Server message"))
+            message.start()
+            message.join(0.1)
+            release.set()
+            job.join()
+            message.join()
+
+        self.assertEqual(0, results[0][0])
+        self.assertNotIn("Server message", results[0][2])
+        self.assertIn("Server message", stderr.getvalue())
@@ -0,0 +1,141 @@
+import unittest
+import os
+import shutil
+import tempfile
+
+from . import utils
+from hermes_gen.grammar import parse_grammar
+from hermes_gen.lalr1_automata import LALR1Automata
+from hermes_gen.parseTable import ParseTable
+from hermes_gen.incremental import reusableNodes
+from hermes_gen.snapshot import Snapshot, writeSnapshot
+from hermes_gen.__main__ import generateEntry
+
+
+def kernel(node):
+    return frozenset((x.rule.nonterm.name, str(x.rule), x.parseIndex) for x in node.rules if x.parseIndex > 0)
+
+
+def describe(automata: LALR1Automata):
+    """
+    Describe every node by its kernel instead of its ID
+    """
+    out = {}
+    for node in automata.nodes:
+        items = sorted((str(x.rule), x.parseIndex, x.strLookAhead(automata.grammar.symbols)) for x in node.rules)
+        trans = sorted((symbol.name, kernel(x)) for symbol, x in node.trans.items())
+        out[kernel(node)] = (items, trans)
+    return out
+
+
+class TestIncremental(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.tempDir = tempfile.mkdtemp()
+        self.grammarFile = os.path.join(self.tempDir, "calculator.hm")
+        self.snapshotFile = os.path.join(self.tempDir, "calculator.snap")
+        shutil.copy(utils.getTestFilename("calculator.hm"), self.grammarFile)
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.tempDir)
+
+    def _edit(self, old: str, new: str):
+        with open(self.grammarFile, mode='r') as f:
+            text = f.read()
+        self.assertIn(old, text)
+        with open(self.grammarFile, mode='w') as f:
+            f.write(text.replace(old, new))
+
+    def _previous(self) -> LALR1Automata:
+        grammar = parse_grammar(self.grammarFile)
+        lalr = LALR1Automata(grammar)
+        writeSnapshot(self.snapshotFile, grammar, lalr, ParseTable(lalr))
+        return Snapshot(self.snapshotFile).automata  # type: ignore
+
+    def test_1_same_automata(self):
+        edits = [
+            # Add a rule
+            ("= INT { return std::stoi($0); }", "= INT { return std::stoi($0); }\n    | MINUS factor { return -$1; }"),
+            # Change a rule
+            ("| term SLASH factor", "| term SLASH SLASH factor"),
+            # Change the start rule
+            ("output = expr", "output = expr SLASH"),
+        ]
+        for old, new in edits:
+            with self.subTest(new):
+                previous = self._previous()
+                oldIDs = {kernel(x): x.id for x in previous.nodes}
+                self._edit(old, new)
+
+                full = LALR1Automata(parse_grammar(self.grammarFile))
+                grammar = parse_grammar(self.grammarFile)
+                incremental = LALR1Automata(grammar, previous=previous)
+
+                self.assertEqual(describe(full), describe(incremental))
+                self.assertEqual(list(range(len(incremental.nodes))), [x.id for x in incremental.nodes])
+                self.assertEqual(0, incremental.start.id)
+
+                # Unchanged states keep their ID, unless it is out of range
+                for node in incremental.nodes:
+                    oldID = oldIDs.get(kernel(node), -1)
+                    if 0 <= oldID < len(incremental.nodes):
+                        self.assertEqual(oldID, node.id)
+
+                self.assertEqual(len(ParseTable(full).conflicts), len(ParseTable(incremental).conflicts))
+
+    def test_2_reuse(self):
+        previous = self._previous()
+        # Only factor changes, the states that do not expand it can be reused
+        self._edit("= INT { return std::stoi($0); }", "= INT { return std::stoi($0); }\n    | MINUS factor { return -$1; }")
+        reusable, oldIDs = reusableNodes(previous, parse_grammar(self.grammarFile))
+        self.assertGreater(len(reusable), 0)
+        self.assertLess(len(reusable), len(previous.nodes))
+        self.assertEqual(len(previous.nodes), len(oldIDs))
+        for node in reusable.values():
+            self.assertNotIn("factor", [rule.nonterm.name for rule, idx in node.items if idx == 0])
+
+    def test_3_command_line(self):
+        argv = ["--no-color", "-t", os.path.join(self.tempDir, "table.h"), "--snapshot", self.snapshotFile]
+        self.assertEqual(0, generateEntry(argv + [self.grammarFile])[0])
+        self._edit("| term SLASH factor", "| term SLASH SLASH factor")
+
+        self.assertEqual(0, generateEntry(argv + ["--incremental", self.grammarFile])[0])
+        with open(os.path.join(self.tempDir, "table.h"), mode='r') as f:
+            incremental = f.read().splitlines()
+
+        self.assertEqual(0, generateEntry(argv + [self.grammarFile])[0])
+        with open(os.path.join(self.tempDir, "table.h"), mode='r') as f:
+            full = f.read().splitlines()
+
+        self.assertEqual(len(full), len(incremental))
+
+        # A corrupt snapshot falls back to a full build
+        with open(self.snapshotFile, mode='wb') as f:
+            f.write(b"not a snapshot")
+        code, _, stderr = generateEntry(argv + ["--incremental", self.grammarFile])
+        self.assertEqual(0, code)
+        self.assertIn("Cannot load previous snapshot", stderr)
+
+    def test_4_truncated_snapshot(self):
+        argv = ["--no-color", "-t", os.path.join(self.tempDir, "table.h"), "--snapshot", self.snapshotFile]
+        self.assertEqual(0, generateEntry(argv + [self.grammarFile])[0])
+        with open(self.snapshotFile, mode='rb') as f:
+            data = f.read()
+        with open(self.snapshotFile, mode='wb') as f:
+            f.write(data[:len(data) // 2])
+
+        # Falls back to a full build, and writes a new snapshot
+        code, _, stderr = generateEntry(argv + ["--incremental", self.grammarFile])
+        self.assertEqual(0, code)
+        self.assertIn("Cannot load previous snapshot", stderr)
+        self.assertIn("truncated or corrupt", stderr)
+        self.assertEqual(len(data), os.path.getsize(self.snapshotFile))
+
+    def test_5_no_snapshot(self):
+        code, _, stderr = generateEntry(["--no-color", "--incremental", self.grammarFile])
+        self.assertEqual(1, code)
+        self.assertIn("--incremental needs a --snapshot", stderr)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,74 @@
+import unittest
+import os
+import shutil
+import tempfile
+
+from . import utils
+from hermes_gen.__main__ import generateEntry
+
+
+class TestOutputs(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.tempDir = tempfile.mkdtemp()
+        shutil.copy(utils.getTestFilename("calculator.hm"), self.tempDir)
+        self.grammarFile = os.path.join(self.tempDir, "calculator.hm")
+        self.outputs = {
+            "-t": "calc_grammar.h",
+            "-l": "calc_loader.h",
+            "-i": "calc_loader.cpp",
+            "-p": "calc_py.cpp",
+            "-ps": "calc.pyi",
+            "-a": "calc.txt",
+        }
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.tempDir)
+
+    def _generate(self, folder: str):
+        os.makedirs(os.path.join(self.tempDir, folder), exist_ok=True)
+        argv = ["-n", "calc", "--no-color"]
+        for flag, filename in self.outputs.items():
+            argv.extend([flag, os.path.join(self.tempDir, folder, filename)])
+        self.assertEqual(0, generateEntry(argv + [self.grammarFile])[0])
+
+    def _read(self, folder: str):
+        out = {}
+        for filename in self.outputs.values():
+            with open(os.path.join(self.tempDir, folder, filename), mode='r') as f:
+                out[filename] = f.read()
+        return out
+
+    def _stamps(self, folder: str):
+        return {x: os.stat(os.path.join(self.tempDir, folder, x)).st_mtime_ns for x in self.outputs.values()}
+
+    def test_1_reproducible(self):
+        self._generate("a")
+        self._generate("b")
+        self.assertEqual(self._read("a"), self._read("b"))
+        self.assertIn("Content hash: ", self._read("a")["calc_grammar.h"])
+
+    def test_2_unchanged_not_written(self):
+        self._generate("out")
+        # Make sure a rewrite would change the stamp
+        for filename in self.outputs.values():
+            os.utime(os.path.join(self.tempDir, "out", filename), ns=(0, 0))
+        self._generate("out")
+        self.assertTrue(all(x == 0 for x in self._stamps("out").values()))
+
+        # Changing a reduction only changes the table
+        with open(self.grammarFile, mode='r') as f:
+            text = f.read()
+        with open(self.grammarFile, mode='w') as f:
+            f.write(text.replace("return std::stoi($0);", "return std::stoi($0) + 0;"))
+        before = self._read("out")
+        self._generate("out")
+        after = self._read("out")
+
+        changed = {x for x in self.outputs.values() if self._stamps("out")[x] != 0}
+        self.assertEqual({"calc_grammar.h"}, changed)
+        self.assertNotEqual(before["calc_grammar.h"].splitlines()[2], after["calc_grammar.h"].splitlines()[2])
+
+
+if __name__ == '__main__':
+    unittest.main()
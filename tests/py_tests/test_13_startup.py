@@ -0,0 +1,61 @@
+import unittest
+import os
+import subprocess
+import sys
+
+from . import utils
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+
+# Only needed for conflicts, caches, snapshots, batches, and outputs
+LAZY_MODULES = [
+    "concurrent.futures",
+    "hermes_gen.cache",
+    "hermes_gen.counterexample.counterexampleGen",
+    "hermes_gen.counterexample.parallel",
+    "hermes_gen.snapshot",
+    "hermes_gen.writers.table",
+    "inspect",
+]
+
+
+def importedModules(code: str):
+    """
+    Run code in a new interpreter, and get the modules it imported
+    """
+    result = subprocess.run(
+        [sys.executable, "-c", code + "\nimport sys\nprint('\\n'.join(sys.modules))"],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return set(result.stdout.splitlines())
+
+
+class TestStartup(unittest.TestCase):
+
+    def test_1_entry_point(self):
+        modules = importedModules("import hermes_gen.__main__")
+        self.assertIn("hermes_gen.lalr1_automata", modules)
+        for name in LAZY_MODULES:
+            self.assertNotIn(name, modules)
+
+    def _generate(self, grammar: str):
+        return importedModules(
+            "from hermes_gen.__main__ import generateEntry\n"
+            f"assert generateEntry(['--no-color', {utils.getTestFilename(grammar)!r}])[0] == 0"
+        )
+
+    def test_2_conflicts(self):
+        modules = self._generate("calculator.hm")
+        self.assertNotIn("hermes_gen.counterexample.counterexampleGen", modules)
+        self.assertNotIn("concurrent.futures", modules)
+
+        # Counterexamples are still generated when needed
+        modules = self._generate("conflicts/ifelse.hm")
+        self.assertIn("hermes_gen.counterexample.counterexampleGen", modules)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,112 @@
+import unittest
+
+from . import utils
+from hermes_gen.grammar import parse_grammar
+from hermes_gen.modes import Mode, buildAutomata
+from hermes_gen.parseTable import ParseTable, Action
+from hermes_gen.compressedTable import CompressedTable, NO_COLUMN
+
+GRAMMARS = [
+    "FandFtest1.hm",
+    "FandFtest2.hm",
+    "G10.hm",
+    "LALR1Test.hm",
+    "calculator.hm",
+    "epsilon.hm",
+    "epsilon2.hm",
+    "epsilon3.hm",
+    "test.hm",
+    "conflicts/ambiguous-shift-reduce.hm",
+    "conflicts/ifelse.hm",
+    "conflicts/lr1-not-lalr.hm",
+]
+
+
+class TestCompressedTable(unittest.TestCase):
+
+    def _table(self, filename: str, mode: str = Mode.lalr) -> ParseTable:
+        grammar = parse_grammar(utils.getTestFilename(filename))
+        return ParseTable(buildAutomata(grammar, mode))
+
+    def _checkSame(self, table: ParseTable, compressed: CompressedTable):
+        for state, row in enumerate(table.table):
+            for col, action in enumerate(row):
+                actual = compressed.getAction(state, col)
+                if col < compressed.numNonterms and action.action == Action.E:
+                    # Never looked up, a goto only happens after reducing to the nonterminal
+                    self.assertEqual(Action.G, actual.action)
+                    continue
+                if action.action == Action.E:
+                    # Errors are replaced by the default reduction
+                    action = table.getDefaultAction(state)
+                self.assertEqual(action, actual, f"Error at [{state}][{col}] expected {action} got {actual}")
+
+    def test_1_same_actions(self):
+        for filename in GRAMMARS:
+            for mode in [Mode.lalr, Mode.lr1]:
+                with self.subTest(filename=filename, mode=mode):
+                    table = self._table(filename, mode)
+                    self._checkSame(table, CompressedTable(table))
+
+    def test_2_layout(self):
+        table = self._table("calculator.hm")
+        compressed = CompressedTable(table)
+
+        self.assertEqual(len(table.table), len(compressed.actionBase))
+        self.assertEqual(len(compressed.actions), len(compressed.actionCheck))
+        self.assertEqual(len(table.nonterminals) + 1, len(compressed.gotoStart))
+        # Every lookup is in range
+        self.assertLessEqual(max(compressed.actionBase) + compressed.numClasses, len(compressed.actions))
+
+        # Rows with different entries never share a base, the default reduction is stored per state
+        rows = {}
+        for state, base in enumerate(compressed.actionBase):
+            default = table.getDefaultAction(state)
+            terminals = table.table[state][compressed.numNonterms:]
+            row = [
+                (compressed.terminalClasses[col], x.action, x.state)
+                for col, x in enumerate(terminals)
+                if x.action != Action.E and x != default
+            ]
+            # Terminals in the same class have one entry
+            row = sorted(set(row))
+            self.assertEqual(row, rows.setdefault(base, row))
+
+        # Exceptions are sorted by state for the binary search
+        for col in range(compressed.numNonterms):
+            states = [x for x, _ in compressed.gotos[compressed.gotoStart[col]:compressed.gotoStart[col + 1]]]
+            self.assertEqual(sorted(states), states)
+
+        # Only the actions that are not the default are stored
+        used = [x for x in compressed.actionCheck if x != NO_COLUMN]
+        self.assertEqual(sum(len(row) for row in rows.values()), len(used))
+        self.assertLess(compressed.byteSize(), len(table.table) * len(table.table[0]) * 4)
+
+    def test_3_terminal_classes(self):
+        # Unused terminals, and terminals that are only look aheads, have the same actions
+        table = self._table("test.hm")
+        compressed = CompressedTable(table)
+        self.assertLess(compressed.numClasses, compressed.numTerminals)
+        self.assertEqual(compressed.numTerminals, len(compressed.terminalClasses))
+        self.assertEqual(list(range(compressed.numClasses)), sorted(set(compressed.terminalClasses)))
+
+        numNonterms = compressed.numNonterms
+        for terminal, terminalClass in enumerate(compressed.terminalClasses):
+            first = table.classColumns[terminalClass]
+            for state in range(len(table.table)):
+                self.assertEqual(
+                    compressed.getAction(state, first), compressed.getAction(state, numNonterms + terminal)
+                )
+
+        # Terminals that are shifted are never merged
+        shifted = {
+            col - numNonterms
+            for row in table.table
+            for col, x in enumerate(row) if col >= numNonterms and x.action == Action.S
+        }
+        classes = [compressed.terminalClasses[x] for x in shifted]
+        self.assertEqual(len(classes), len(set(classes)))
+
+
+if __name__ == '__main__':
+    unittest.main()
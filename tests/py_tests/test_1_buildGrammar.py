@@ -1,10 +1,11 @@
 import unittest
 
 from hermes_gen.__main__ import parse_grammar
-from hermes_gen.grammar import Rule, Symbol
+from hermes_gen.grammar import Rule
 from .utils import getTestFilename
 from hermes_gen.directives import Directive
 from hermes_gen.consts import ERROR, END
+from hermes_gen.errors import HermesError
 
 
 class TestBuildgrammar(unittest.TestCase):
@@ -30,7 +31,8 @@ class TestBuildgrammar(unittest.TestCase):
         }
 
         numTerminals = 0
-        for key, val in Symbol._SYMBOL_MAP.items():
+        for val in g.symbols.all():
+            key = val.name
             if val.isTerminal:
                 numTerminals += 1
                 self.assertTrue(key in EXP_TERMS, f'Terminal "{key}" is not expected')
@@ -40,15 +42,15 @@ class TestBuildgrammar(unittest.TestCase):
 
         self.assertEqual(len(EXP_TERMS), numTerminals, 'Len of terminal definitions not equal')
 
-        program = Symbol.get("PROGRAM")
-        stmt = Symbol.get('stmt')
-        name = Symbol.get('name')
-        equ = Symbol.get('equals_sign')
-        integer = Symbol.get('integer')
-        semicolon = Symbol.get('semicolon')
-        open_curly = Symbol.get('open_curly')
-        close_curly = Symbol.get('close_curly')
-        x = Symbol.get("x")
+        program = g.symbols.get("PROGRAM")
+        stmt = g.symbols.get('stmt')
+        name = g.symbols.get('name')
+        equ = g.symbols.get('equals_sign')
+        integer = g.symbols.get('integer')
+        semicolon = g.symbols.get('semicolon')
+        open_curly = g.symbols.get('open_curly')
+        close_curly = g.symbols.get('close_curly')
+        x = g.symbols.get("x")
 
         EXP_RULES = [
             Rule(0, program, [stmt], "return values[0]->nt();", "", 0, 0),
@@ -85,4 +87,11 @@ class TestBuildgrammar(unittest.TestCase):
         self.assertFalse(program.nullable)
         self.assertEqual(g.directives[Directive.return_][0], "int")
 
+    def test_unexpected_eof(self):
+        # Missing the closing ';' of the last rule
+        testFile = getTestFilename('invalid_files/eof.hm')
+
+        with self.assertRaises(HermesError):
+            parse_grammar(testFile)
+
     # TODO invalid test files?
@@ -2,17 +2,17 @@ import unittest
 from typing import Dict, Set
 
 from . import utils
-from hermes_gen.grammar import parse_grammar, Symbol
+from hermes_gen.grammar import parse_grammar, Symbol, SymbolTable
 from hermes_gen.consts import EMPTY, END, START, ERROR
 
 
-def _convert(d: Dict[str, Set[str]]) -> Dict[Symbol, Set[Symbol]]:
+def _convert(symbols: SymbolTable, d: Dict[str, Set[str]]) -> Dict[Symbol, Set[Symbol]]:
     out = {}
     for k, v in d.items():
-        kSym = Symbol.get(k)
+        kSym = symbols.get(k)
         vSet = set()
         for s in v:
-            vSet.add(Symbol.get(s))
+            vSet.add(symbols.get(s))
 
         out[kSym] = vSet
 
@@ -21,16 +21,18 @@ def _convert(d: Dict[str, Set[str]]) -> Dict[Symbol, Set[Symbol]]:
 
 class TestFirstAndFollow(unittest.TestCase):
 
-    def _check(self, expectedFirstStr: Dict[str, Set[str]], expectedFollowStr: Dict[str, Set[str]]):
+    def _check(
+        self, symbols: SymbolTable, expectedFirstStr: Dict[str, Set[str]], expectedFollowStr: Dict[str, Set[str]]
+    ):
 
-        expectedFirst = _convert(expectedFirstStr)
-        expectedFollow = _convert(expectedFollowStr)
+        expectedFirst = _convert(symbols, expectedFirstStr)
+        expectedFollow = _convert(symbols, expectedFollowStr)
 
         seenFirst = 0
         seenFollow = 0
 
-        for val in Symbol._SYMBOL_MAP.values():
-            if val in {Symbol.EMPTY, Symbol.END}:
+        for val in symbols.all():
+            if val in {symbols.EMPTY, symbols.END}:
                 continue
 
             self.assertTrue(val in expectedFirst, f'{val} not in expected FIRST dict')
@@ -84,7 +86,7 @@ class TestFirstAndFollow(unittest.TestCase):
             'F': {'plus', 'star', 'close_p', END}
         }
 
-        self._check(EXP_FIRST, EXP_FOLLOW)
+        self._check(grammar.symbols, EXP_FIRST, EXP_FOLLOW)
 
     def test_2(self):
         """
@@ -113,7 +115,7 @@ class TestFirstAndFollow(unittest.TestCase):
             'E': {'close_p', END}
         }
 
-        self._check(EXP_FIRST, EXP_FOLLOW)
+        self._check(g.symbols, EXP_FIRST, EXP_FOLLOW)
 
     def test_3_G10(self):
         """
@@ -139,7 +141,7 @@ class TestFirstAndFollow(unittest.TestCase):
             "T": {"close_p", "plus", END}
         }
 
-        self._check(EXP_FIRST, EXP_FOLLOW)
+        self._check(g.symbols, EXP_FIRST, EXP_FOLLOW)
 
     def test_4_epsilon(self):
         testFile = utils.getTestFilename('epsilon.hm')
@@ -162,7 +164,7 @@ class TestFirstAndFollow(unittest.TestCase):
         }
         # yapf: enable
 
-        self._check(EXP_FIRST, EXP_FOLLOW)
+        self._check(g.symbols, EXP_FIRST, EXP_FOLLOW)
 
     def test_5_unambiguous_SR(self):
         testFile = utils.getTestFilename("conflicts/unambiguous-shift-reduce.hm")
@@ -189,7 +191,7 @@ class TestFirstAndFollow(unittest.TestCase):
         }
         # yapf: enable
 
-        self._check(EXP_FIRST, EXP_FOLLOW)
+        self._check(g.symbols, EXP_FIRST, EXP_FOLLOW)
 
     def test_6_epsilon2(self):
         testFile = utils.getTestFilename("epsilon2.hm")
@@ -217,4 +219,22 @@ class TestFirstAndFollow(unittest.TestCase):
         }
         # yapf: enable
 
-        self._check(EXP_FIRST, EXP_FOLLOW)
+        self._check(g.symbols, EXP_FIRST, EXP_FOLLOW)
+
+    def test_7_suffix_first(self):
+        testFile = utils.getTestFilename("epsilon2.hm")
+        g = parse_grammar(testFile)
+
+        rule = next(x for x in g.rules if x.nonterm == g.symbols.get("if_"))
+
+        # if_ = IF A else_
+        expFirst = [
+            Symbol.mask([g.symbols.get("IF")]),
+            Symbol.mask([g.symbols.get("A")]),
+            Symbol.mask([g.symbols.get("ELSE"), g.symbols.EMPTY]),
+            0,
+        ]
+        expNullable = [False, False, True, True]
+
+        self.assertEqual(expFirst, rule.suffixFirst)
+        self.assertEqual(expNullable, rule.suffixNullable)
@@ -1,10 +1,12 @@
 import unittest
 from typing import List
+import glob
+import os
 
 from . import utils
 
-from hermes_gen.lalr1_automata import Node, AnnotRule, LALR1Automata
-from hermes_gen.grammar import Grammar, Rule, parse_grammar, Symbol
+from hermes_gen.lalr1_automata import Node, AnnotRule, LALR1Automata, LAEngine
+from hermes_gen.grammar import Grammar, Rule, parse_grammar, Symbol, SymbolTable
 from hermes_gen.consts import END
 
 
@@ -26,33 +28,33 @@ class TestLALRClosure(unittest.TestCase):
             self.assertDictEqual(exp.trans, act.trans, f"Transitions not equal on {exp}")
 
     def test_0_node_combine(self):
-        Symbol.reset()
-        SP = Symbol('S_PRIME', "", False)
-        S = Symbol('S', "", False)
-        X = Symbol('X', "", False)
-        a = Symbol('a', "a", False)
-        b = Symbol('b', "b", False)
+        symbols = SymbolTable()
+        SP = symbols.add('S_PRIME', "", False)
+        S = symbols.add('S', "", False)
+        X = symbols.add('X', "", False)
+        a = symbols.add('a', "a", False)
+        b = symbols.add('b', "b", False)
 
         r0 = rule(1, SP, [S])
         r1 = rule(2, S, [X, X])
         r2 = rule(3, X, [a, X])
 
         n0 = Node(0)
-        n0.addRule(r0, 0, {Symbol.END})
-        n0.addRule(r1, 1, {Symbol.END})
-        n0.addRule(r2, 0, {a, Symbol.END})
+        n0.addRule(r0, 0, Symbol.mask({symbols.END}))
+        n0.addRule(r1, 1, Symbol.mask({symbols.END}))
+        n0.addRule(r2, 0, Symbol.mask({a, symbols.END}))
 
         n1 = Node(1)
-        n1.addRule(r0, 0, {a, Symbol.END})
-        n1.addRule(r1, 1, {b})
-        n1.addRule(r2, 0, {a, b})
+        n1.addRule(r0, 0, Symbol.mask({a, symbols.END}))
+        n1.addRule(r1, 1, Symbol.mask({b}))
+        n1.addRule(r2, 0, Symbol.mask({a, b}))
 
         n0.combine(n1)
 
         expNode = Node(2)
-        expNode.addRule(r0, 0, {a, Symbol.END})
-        expNode.addRule(r1, 1, {b, Symbol.END})
-        expNode.addRule(r2, 0, {a, b, Symbol.END})
+        expNode.addRule(r0, 0, Symbol.mask({a, symbols.END}))
+        expNode.addRule(r1, 1, Symbol.mask({b, symbols.END}))
+        expNode.addRule(r2, 0, Symbol.mask({a, b, symbols.END}))
 
         self.assertEqual(expNode, n0)
 
@@ -62,11 +64,11 @@ class TestLALRClosure(unittest.TestCase):
 
         lalr = LALR1Automata(grammar)
 
-        SP = Symbol.get('S_PRIME')
-        S = Symbol.get('S')
-        X = Symbol.get('X')
-        a = Symbol.get('a')
-        b = Symbol.get('b')
+        SP = grammar.symbols.get('S_PRIME')
+        S = grammar.symbols.get('S')
+        X = grammar.symbols.get('X')
+        a = grammar.symbols.get('a')
+        b = grammar.symbols.get('b')
 
         r0 = rule(1, SP, [S])
         r1 = rule(2, S, [X, X])
@@ -74,32 +76,32 @@ class TestLALRClosure(unittest.TestCase):
         r3 = rule(4, X, [b])
 
         n0 = Node(0)
-        n0.addRule(r0, 0, {Symbol.END})
-        n0.addRule(r1, 0, {Symbol.END})
-        n0.addRule(r2, 0, {a, b})
-        n0.addRule(r3, 0, {a, b})
+        n0.addRule(r0, 0, Symbol.mask({grammar.symbols.END}))
+        n0.addRule(r1, 0, Symbol.mask({grammar.symbols.END}))
+        n0.addRule(r2, 0, Symbol.mask({a, b}))
+        n0.addRule(r3, 0, Symbol.mask({a, b}))
 
         n1 = Node(1)
-        n1.addRule(r0, 1, {Symbol.END})
+        n1.addRule(r0, 1, Symbol.mask({grammar.symbols.END}))
 
         n2 = Node(2)
-        n2.addRule(r1, 1, {Symbol.END})
-        n2.addRule(r2, 0, {Symbol.END})
-        n2.addRule(r3, 0, {Symbol.END})
+        n2.addRule(r1, 1, Symbol.mask({grammar.symbols.END}))
+        n2.addRule(r2, 0, Symbol.mask({grammar.symbols.END}))
+        n2.addRule(r3, 0, Symbol.mask({grammar.symbols.END}))
 
         n36 = Node(3)
-        n36.addRule(r2, 1, {a, b, Symbol.END})
-        n36.addRule(r2, 0, {a, b, Symbol.END})
-        n36.addRule(r3, 0, {a, b, Symbol.END})
+        n36.addRule(r2, 1, Symbol.mask({a, b, grammar.symbols.END}))
+        n36.addRule(r2, 0, Symbol.mask({a, b, grammar.symbols.END}))
+        n36.addRule(r3, 0, Symbol.mask({a, b, grammar.symbols.END}))
 
         n5 = Node(4)
-        n5.addRule(r1, 2, {Symbol.END})
+        n5.addRule(r1, 2, Symbol.mask({grammar.symbols.END}))
 
         n47 = Node(5)
-        n47.addRule(r3, 1, {a, b, Symbol.END})
+        n47.addRule(r3, 1, Symbol.mask({a, b, grammar.symbols.END}))
 
         n89 = Node(6)
-        n89.addRule(r2, 2, {a, b, Symbol.END})
+        n89.addRule(r2, 2, Symbol.mask({a, b, grammar.symbols.END}))
 
         EXP_NODES = [n0, n1, n2, n36, n47, n5, n89]
 
@@ -111,13 +113,13 @@ class TestLALRClosure(unittest.TestCase):
 
         lalr = LALR1Automata(grammar)
 
-        P = Symbol.get("P")
-        E = Symbol.get("E")
-        T = Symbol.get("T")
-        _id = Symbol.get('id')
-        plus = Symbol.get("plus")
-        open_p = Symbol.get("open_p")
-        close_p = Symbol.get("close_p")
+        P = grammar.symbols.get("P")
+        E = grammar.symbols.get("E")
+        T = grammar.symbols.get("T")
+        _id = grammar.symbols.get('id')
+        plus = grammar.symbols.get("plus")
+        open_p = grammar.symbols.get("open_p")
+        close_p = grammar.symbols.get("close_p")
 
         r1 = Rule(1, P, [E], "", "", 0, 0)
         r2 = Rule(2, E, [E, plus, T], "", "", 0, 0)
@@ -126,44 +128,44 @@ class TestLALRClosure(unittest.TestCase):
         r5 = Rule(5, T, [_id], "", "", 0, 0)
 
         n0 = Node(0)
-        n0.addRule(r1, 0, {Symbol.END})
-        n0.addRule(r2, 0, {plus, Symbol.END})
-        n0.addRule(r3, 0, {plus, Symbol.END})
-        n0.addRule(r4, 0, {plus, Symbol.END})
-        n0.addRule(r5, 0, {plus, Symbol.END})
+        n0.addRule(r1, 0, Symbol.mask({grammar.symbols.END}))
+        n0.addRule(r2, 0, Symbol.mask({plus, grammar.symbols.END}))
+        n0.addRule(r3, 0, Symbol.mask({plus, grammar.symbols.END}))
+        n0.addRule(r4, 0, Symbol.mask({plus, grammar.symbols.END}))
+        n0.addRule(r5, 0, Symbol.mask({plus, grammar.symbols.END}))
 
         n1 = Node(1)
-        n1.addRule(r1, 1, {Symbol.END})
-        n1.addRule(r2, 1, {plus, Symbol.END})
+        n1.addRule(r1, 1, Symbol.mask({grammar.symbols.END}))
+        n1.addRule(r2, 1, Symbol.mask({plus, grammar.symbols.END}))
 
         n2 = Node(2)
-        n2.addRule(r3, 1, {plus, close_p, Symbol.END})
+        n2.addRule(r3, 1, Symbol.mask({plus, close_p, grammar.symbols.END}))
 
         n3 = Node(3)
-        n3.addRule(r4, 1, {plus, close_p, Symbol.END})
-        n3.addRule(r5, 1, {plus, close_p, Symbol.END})
+        n3.addRule(r4, 1, Symbol.mask({plus, close_p, grammar.symbols.END}))
+        n3.addRule(r5, 1, Symbol.mask({plus, close_p, grammar.symbols.END}))
 
         n4 = Node(4)
-        n4.addRule(r2, 2, {plus, close_p, Symbol.END})
-        n4.addRule(r4, 0, {plus, close_p, Symbol.END})
-        n4.addRule(r5, 0, {plus, close_p, Symbol.END})
+        n4.addRule(r2, 2, Symbol.mask({plus, close_p, grammar.symbols.END}))
+        n4.addRule(r4, 0, Symbol.mask({plus, close_p, grammar.symbols.END}))
+        n4.addRule(r5, 0, Symbol.mask({plus, close_p, grammar.symbols.END}))
 
         n5 = Node(5)
-        n5.addRule(r4, 2, {plus, close_p, Symbol.END})
-        n5.addRule(r2, 0, {plus, close_p})
-        n5.addRule(r3, 0, {plus, close_p})
-        n5.addRule(r4, 0, {plus, close_p})
-        n5.addRule(r5, 0, {plus, close_p})
+        n5.addRule(r4, 2, Symbol.mask({plus, close_p, grammar.symbols.END}))
+        n5.addRule(r2, 0, Symbol.mask({plus, close_p}))
+        n5.addRule(r3, 0, Symbol.mask({plus, close_p}))
+        n5.addRule(r4, 0, Symbol.mask({plus, close_p}))
+        n5.addRule(r5, 0, Symbol.mask({plus, close_p}))
 
         n6 = Node(6)
-        n6.addRule(r2, 3, {plus, close_p, Symbol.END})
+        n6.addRule(r2, 3, Symbol.mask({plus, close_p, grammar.symbols.END}))
 
         n7 = Node(7)
-        n7.addRule(r4, 3, {plus, close_p, Symbol.END})
-        n7.addRule(r2, 1, {plus, close_p})
+        n7.addRule(r4, 3, Symbol.mask({plus, close_p, grammar.symbols.END}))
+        n7.addRule(r2, 1, Symbol.mask({plus, close_p}))
 
         n8 = Node(8)
-        n8.addRule(r4, 4, {plus, close_p, Symbol.END})
+        n8.addRule(r4, 4, Symbol.mask({plus, close_p, grammar.symbols.END}))
 
         EXP_NODES = [n0, n1, n2, n3, n4, n5, n6, n7, n8]
 
@@ -194,11 +196,11 @@ class TestLALRClosure(unittest.TestCase):
         grammar = parse_grammar(testfile)
         lalr = LALR1Automata(grammar)
 
-        S = Symbol.get("S")
-        A = Symbol.get("A")
-        B = Symbol.get("B")
-        a = Symbol.get("a")
-        b = Symbol.get("b")
+        S = grammar.symbols.get("S")
+        A = grammar.symbols.get("A")
+        B = grammar.symbols.get("B")
+        a = grammar.symbols.get("a")
+        b = grammar.symbols.get("b")
 
         r0 = rule(0, S, [A])
         r1 = rule(1, A, [B, b])
@@ -206,23 +208,23 @@ class TestLALRClosure(unittest.TestCase):
         r3 = rule(3, B, [])
 
         n0 = Node(0)
-        n0.addRule(r0, 0, {Symbol.END})
-        n0.addRule(r1, 0, {Symbol.END})
-        n0.addRule(r2, 0, {a, b})
-        n0.addRule(r3, 0, {a, b})
+        n0.addRule(r0, 0, Symbol.mask({grammar.symbols.END}))
+        n0.addRule(r1, 0, Symbol.mask({grammar.symbols.END}))
+        n0.addRule(r2, 0, Symbol.mask({a, b}))
+        n0.addRule(r3, 0, Symbol.mask({a, b}))
 
         n1 = Node(1)
-        n1.addRule(r0, 1, {Symbol.END})
+        n1.addRule(r0, 1, Symbol.mask({grammar.symbols.END}))
 
         n2 = Node(2)
-        n2.addRule(r1, 1, {Symbol.END})
-        n2.addRule(r2, 1, {a, b})
+        n2.addRule(r1, 1, Symbol.mask({grammar.symbols.END}))
+        n2.addRule(r2, 1, Symbol.mask({a, b}))
 
         n3 = Node(3)
-        n3.addRule(r1, 2, {Symbol.END})
+        n3.addRule(r1, 2, Symbol.mask({grammar.symbols.END}))
 
         n4 = Node(4)
-        n4.addRule(r2, 2, {a, b})
+        n4.addRule(r2, 2, Symbol.mask({a, b}))
 
         EXP_NODES = [n0, n1, n2, n3, n4]
 
@@ -241,13 +243,13 @@ class TestLALRClosure(unittest.TestCase):
         g = parse_grammar(testFile)
         lalr = LALR1Automata(g)
 
-        START = Symbol.get("__START__")
-        S = Symbol.get("S")
-        T = Symbol.get("T")
-        X = Symbol.get("X")
-        Y = Symbol.get("Y")
-        a = Symbol.get("a")
-        b = Symbol.get("b")
+        START = g.symbols.get("__START__")
+        S = g.symbols.get("S")
+        T = g.symbols.get("T")
+        X = g.symbols.get("X")
+        Y = g.symbols.get("Y")
+        a = g.symbols.get("a")
+        b = g.symbols.get("b")
 
         r0 = rule(0, START, [S])
         r1 = rule(1, S, [T])
@@ -257,10 +259,10 @@ class TestLALRClosure(unittest.TestCase):
         r5 = rule(5, X, [a])
         r6 = rule(6, Y, [a, a, b])
 
-        la = {Symbol.END, a}
+        la = Symbol.mask({g.symbols.END, a})
 
         n0 = Node(0)
-        n0.addRule(r0, 0, {Symbol.END})
+        n0.addRule(r0, 0, Symbol.mask({g.symbols.END}))
         n0.addRule(r1, 0, la)
         n0.addRule(r2, 0, la)
         n0.addRule(r3, 0, la)
@@ -269,7 +271,7 @@ class TestLALRClosure(unittest.TestCase):
         n0.addRule(r6, 0, la)
 
         n1 = Node(1)
-        n1.addRule(r0, 1, {Symbol.END})
+        n1.addRule(r0, 1, Symbol.mask({g.symbols.END}))
         n1.addRule(r2, 1, la)
         n1.addRule(r3, 0, la)
         n1.addRule(r4, 0, la)
@@ -324,14 +326,14 @@ class TestLALRClosure(unittest.TestCase):
         g = parse_grammar(testFile)
         lalr = LALR1Automata(g)
 
-        A = Symbol.get("A")
-        IF = Symbol.get("IF")
-        ELSE = Symbol.get("ELSE")
+        A = g.symbols.get("A")
+        IF = g.symbols.get("IF")
+        ELSE = g.symbols.get("ELSE")
 
-        s = Symbol.get("s")
-        ifs = Symbol.get("ifs")
-        if_ = Symbol.get("if_")
-        else_ = Symbol.get("else_")
+        s = g.symbols.get("s")
+        ifs = g.symbols.get("ifs")
+        if_ = g.symbols.get("if_")
+        else_ = g.symbols.get("else_")
 
         r0 = rule(0, s, [ifs])
         r1 = rule(1, ifs, [if_, ifs])
@@ -340,8 +342,8 @@ class TestLALRClosure(unittest.TestCase):
         r4 = rule(4, else_, [ELSE, A])
         r5 = rule(5, else_, [])
 
-        laEnd = {Symbol.END}
-        laIF = {Symbol.END, IF}
+        laEnd = Symbol.mask({g.symbols.END})
+        laIF = Symbol.mask({g.symbols.END, IF})
 
         n0 = Node(0)
         n0.addRule(r0, 0, laEnd)
@@ -399,3 +401,19 @@ class TestLALRClosure(unittest.TestCase):
         n7.addTrans(A, n8)
 
         self._checkTransitions(EXP_NODES, lalr.nodes)
+
+    def test_6_engines_match(self):
+        testDir = os.path.dirname(utils.getTestFilename("G10.hm"))
+        for testFile in sorted(glob.glob(os.path.join(testDir, "**", "*.hm"), recursive=True)):
+            if "invalid_files" in testFile:
+                continue
+
+            g = parse_grammar(testFile)
+            propagated = LALR1Automata(g, LAEngine.propagate)
+            lalr = LALR1Automata(g, LAEngine.deremer_pennello)
+
+            self._checkNodes(propagated.nodes, lalr.nodes)
+            for exp, act in zip(propagated.nodes, lalr.nodes):
+                expTrans = [(k, v.id) for k, v in exp.trans.items()]
+                actTrans = [(k, v.id) for k, v in act.trans.items()]
+                self.assertEqual(expTrans, actTrans, f"{testFile}: Transitions not equal on {exp}")
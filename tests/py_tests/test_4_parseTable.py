@@ -1,8 +1,10 @@
 import unittest
 
 from . import utils
-from hermes_gen.grammar import Grammar, parse_grammar, Symbol
+from hermes_gen.grammar import Grammar, parse_grammar
 from hermes_gen.lalr1_automata import LALR1Automata
+from hermes_gen.ielr_generator import IELRAutomata
+from hermes_gen.lr1_automata import LR1Automata
 from hermes_gen.parseTable import ParseTable, Action, TableType, ParseAction
 
 
@@ -38,15 +40,15 @@ class TestParseTable(unittest.TestCase):
         table = ParseTable(lalr)
 
         symbols = [
-            Symbol.get("P"),
-            Symbol.get("E"),
-            Symbol.get("T"),
-            Symbol.get("id"),
-            Symbol.get("plus"),
-            Symbol.get("open_p"),
-            Symbol.get("close_p"),
-            Symbol.ERROR,
-            Symbol.END
+            grammar.symbols.get("P"),
+            grammar.symbols.get("E"),
+            grammar.symbols.get("T"),
+            grammar.symbols.get("id"),
+            grammar.symbols.get("plus"),
+            grammar.symbols.get("open_p"),
+            grammar.symbols.get("close_p"),
+            grammar.symbols.ERROR,
+            grammar.symbols.END
         ]
 
         for x, y in zip(symbols, table.symbolList):
@@ -118,3 +120,97 @@ class TestParseTable(unittest.TestCase):
         # yapf: enable
 
         self._checkTable(EXP_TABLE, table.table)
+
+    def test_4_ielr(self):
+        testFile = utils.getTestFilename("conflicts/lr1-not-lalr.hm")
+        g = parse_grammar(testFile)
+        lalr = LALR1Automata(g)
+        table = ParseTable(lalr)
+
+        # Merging the two [A = c •, B = c •] nodes causes a reduce/reduce conflict
+        self.assertEqual(len(table.conflicts), 1)
+        numLALRNodes = len(lalr.nodes)
+
+        ielr = IELRAutomata(LALR1Automata(g))
+        table = ParseTable(ielr)
+
+        self.assertEqual(len(table.conflicts), 0)
+        self.assertEqual(len(ielr.nodes), numLALRNodes + 1)
+        for idx, node in enumerate(ielr.nodes):
+            self.assertEqual(idx, node.id)
+
+    def test_5_ielr_no_split(self):
+        # The dangling else conflict is not caused by merging nodes
+        testFile = utils.getTestFilename("conflicts/ifelse.hm")
+        g = parse_grammar(testFile)
+        lalrTable = ParseTable(LALR1Automata(g))
+        ielrTable = ParseTable(IELRAutomata(LALR1Automata(g)))
+
+        self.assertEqual(len(lalrTable.conflicts), len(ielrTable.conflicts))
+        self._checkTable(lalrTable.table, ielrTable.table)
+
+    def test_6_lr1(self):
+        testFile = utils.getTestFilename("conflicts/lr1-not-lalr.hm")
+        g = parse_grammar(testFile)
+        numLALRNodes = len(LALR1Automata(g).nodes)
+
+        # The two [A = c •, B = c •] nodes are not weakly compatible
+        lr1 = LR1Automata(g)
+        table = ParseTable(lr1)
+
+        self.assertEqual(len(table.conflicts), 0)
+        self.assertEqual(len(lr1.nodes), numLALRNodes + 1)
+
+        # Every node is weakly compatible, so this is the same as LALR(1)
+        testFile = utils.getTestFilename("G10.hm")
+        g = parse_grammar(testFile)
+        lalrTable = ParseTable(LALR1Automata(g))
+        lr1Table = ParseTable(LR1Automata(g))
+
+        self._checkTable(lalrTable.table, lr1Table.table)
+
+    def test_7_default_reductions(self):
+        for filename in ["G10.hm", "calculator.hm", "epsilon.hm", "conflicts/ifelse.hm"]:
+            with self.subTest(filename=filename):
+                grammar = parse_grammar(utils.getTestFilename(filename))
+                table = ParseTable(LALR1Automata(grammar))
+                acceptRules = {x.id for x in grammar.rules if x.nonterm == grammar.startSymbol}
+                numNonterms = len(table.nonterminals)
+
+                for state, row in enumerate(table.table):
+                    default = table.defaultReductions[state]
+                    actions = [x for x in row[numNonterms:] if x.action != Action.E]
+                    reductions = [x.state for x in actions if x.action == Action.R and x.state not in acceptRules]
+                    if len(reductions) == 0:
+                        self.assertEqual(-1, default)
+                        self.assertFalse(table.consistent[state])
+                        self.assertEqual(E, table.getDefaultAction(state))
+                        continue
+
+                    self.assertNotIn(default, acceptRules)
+                    self.assertEqual(max(reductions.count(x) for x in reductions), reductions.count(default))
+                    self.assertEqual(R(default), table.getDefaultAction(state))
+                    self.assertEqual(all(x == R(default) for x in actions), table.consistent[state])
+
+                # Every grammar here has a state that only reduces
+                self.assertTrue(any(table.consistent))
+
+    def test_8_ielr_minimal(self):
+        # Conflicts inherent to the grammar do not split nodes
+        for filename in [
+            "conflicts/ambiguous-shift-reduce.hm",
+            "conflicts/duplicate-rules.hm",
+            "conflicts/ifelse.hm",
+            "conflicts/lr1-not-lalr.hm",
+            "conflicts/unambiguous-shift-reduce.hm",
+        ]:
+            with self.subTest(filename=filename):
+                g = parse_grammar(utils.getTestFilename(filename))
+                lalrTable = ParseTable(LALR1Automata(g))
+                ielr = IELRAutomata(LALR1Automata(g))
+                ielrTable = ParseTable(ielr)
+                lr1 = LR1Automata(g)
+
+                self.assertLessEqual(len(ielr.nodes), len(lr1.nodes))
+                self.assertLessEqual(len(ielrTable.conflicts), len(lalrTable.conflicts))
+                self.assertEqual(len(ParseTable(lr1).conflicts), len(ielrTable.conflicts))
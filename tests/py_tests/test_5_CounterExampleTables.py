@@ -5,11 +5,11 @@ from . import utils
 
 from hermes_gen.grammar import parse_grammar, Symbol
 from hermes_gen.lalr1_automata import LALR1Automata, Node
-from hermes_gen.counterexample.stateItem import StateItem
+from hermes_gen.counterexample.stateItem import StateItem, StateItemGraph
 
 
-def _getSI(node: Node, ruleIdx: int) -> StateItem:
-    return StateItem.getStateItem(node, node.rules[ruleIdx])
+def _getSI(graph: StateItemGraph, node: Node, ruleIdx: int) -> StateItem:
+    return graph.getStateItem(node, node.rules[ruleIdx])
 
 
 class TestCETables(unittest.TestCase):
@@ -33,15 +33,15 @@ class TestCETables(unittest.TestCase):
         grammar = parse_grammar(testFile)
         lalr = LALR1Automata(grammar)
 
-        StateItem.initLookups(lalr)
+        graph = StateItemGraph(lalr)
 
-        P = Symbol.get("P")
-        E = Symbol.get("E")
-        T = Symbol.get("T")
-        ID = Symbol.get("id")
-        openP = Symbol.get("open_p")
-        closeP = Symbol.get("close_p")
-        plus = Symbol.get("plus")
+        P = grammar.symbols.get("P")
+        E = grammar.symbols.get("E")
+        T = grammar.symbols.get("T")
+        ID = grammar.symbols.get("id")
+        openP = grammar.symbols.get("open_p")
+        closeP = grammar.symbols.get("close_p")
+        plus = grammar.symbols.get("plus")
 
         n0 = lalr.nodes[0]
         n1 = lalr.nodes[1]
@@ -53,36 +53,36 @@ class TestCETables(unittest.TestCase):
         n7 = lalr.nodes[7]
         n8 = lalr.nodes[8]
 
-        n0r0 = _getSI(n0, 0)
-        n0r1 = _getSI(n0, 1)
-        n0r2 = _getSI(n0, 2)
-        n0r3 = _getSI(n0, 3)
-        n0r4 = _getSI(n0, 4)
+        n0r0 = _getSI(graph, n0, 0)
+        n0r1 = _getSI(graph, n0, 1)
+        n0r2 = _getSI(graph, n0, 2)
+        n0r3 = _getSI(graph, n0, 3)
+        n0r4 = _getSI(graph, n0, 4)
 
-        n1r0 = _getSI(n1, 0)
-        n1r1 = _getSI(n1, 1)
+        n1r0 = _getSI(graph, n1, 0)
+        n1r1 = _getSI(graph, n1, 1)
 
-        n2r0 = _getSI(n2, 0)
+        n2r0 = _getSI(graph, n2, 0)
 
-        n3r0 = _getSI(n3, 0)
-        n3r1 = _getSI(n3, 1)
+        n3r0 = _getSI(graph, n3, 0)
+        n3r1 = _getSI(graph, n3, 1)
 
-        n4r0 = _getSI(n4, 0)
-        n4r1 = _getSI(n4, 1)
-        n4r2 = _getSI(n4, 2)
+        n4r0 = _getSI(graph, n4, 0)
+        n4r1 = _getSI(graph, n4, 1)
+        n4r2 = _getSI(graph, n4, 2)
 
-        n5r0 = _getSI(n5, 0)
-        n5r1 = _getSI(n5, 1)
-        n5r2 = _getSI(n5, 2)
-        n5r3 = _getSI(n5, 3)
-        n5r4 = _getSI(n5, 4)
+        n5r0 = _getSI(graph, n5, 0)
+        n5r1 = _getSI(graph, n5, 1)
+        n5r2 = _getSI(graph, n5, 2)
+        n5r3 = _getSI(graph, n5, 3)
+        n5r4 = _getSI(graph, n5, 4)
 
-        n6r0 = _getSI(n6, 0)
+        n6r0 = _getSI(graph, n6, 0)
 
-        n7r0 = _getSI(n7, 0)
-        n7r1 = _getSI(n7, 1)
+        n7r0 = _getSI(graph, n7, 0)
+        n7r1 = _getSI(graph, n7, 1)
 
-        n8r0 = _getSI(n8, 0)
+        n8r0 = _getSI(graph, n8, 0)
 
         # yapf: disable
 
@@ -214,13 +214,13 @@ class TestCETables(unittest.TestCase):
         grammar = parse_grammar(testFile)
         lalr = LALR1Automata(grammar)
 
-        StateItem.initLookups(lalr)
+        graph = StateItemGraph(lalr)
 
-        S = Symbol.get('S')
-        A = Symbol.get('A')
-        B = Symbol.get('B')
-        a = Symbol.get('a')
-        b = Symbol.get('b')
+        S = grammar.symbols.get('S')
+        A = grammar.symbols.get('A')
+        B = grammar.symbols.get('B')
+        a = grammar.symbols.get('a')
+        b = grammar.symbols.get('b')
 
         n0 = lalr.nodes[0]
         n1 = lalr.nodes[1]
@@ -228,19 +228,19 @@ class TestCETables(unittest.TestCase):
         n3 = lalr.nodes[3]
         n4 = lalr.nodes[4]
 
-        n0r0 = _getSI(n0, 0)
-        n0r1 = _getSI(n0, 1)
-        n0r2 = _getSI(n0, 2)
-        n0r3 = _getSI(n0, 3)
+        n0r0 = _getSI(graph, n0, 0)
+        n0r1 = _getSI(graph, n0, 1)
+        n0r2 = _getSI(graph, n0, 2)
+        n0r3 = _getSI(graph, n0, 3)
 
-        n1r0 = _getSI(n1, 0)
+        n1r0 = _getSI(graph, n1, 0)
 
-        n2r0 = _getSI(n2, 0)
-        n2r1 = _getSI(n2, 1)
+        n2r0 = _getSI(graph, n2, 0)
+        n2r1 = _getSI(graph, n2, 1)
 
-        n3r0 = _getSI(n3, 0)
+        n3r0 = _getSI(graph, n3, 0)
 
-        n4r0 = _getSI(n4, 0)
+        n4r0 = _getSI(graph, n4, 0)
 
         # yapf: disable
         TRANS = [
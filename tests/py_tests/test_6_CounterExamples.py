@@ -1,12 +1,20 @@
 import unittest
+from unittest import mock
+import contextlib
+import io
+import os
+import shutil
+import tempfile
 
 from . import utils
 
-from hermes_gen.grammar import parse_grammar, Symbol
+from hermes_gen.grammar import parse_grammar, SymbolTable
 from hermes_gen.lalr1_automata import LALR1Automata
 from hermes_gen.parseTable import ParseTable
-from hermes_gen.counterexample.counterexampleGen import CounterExampleGen
+from hermes_gen.counterexample.counterexampleGen import CounterExampleGen, TIME_LIMIT_SEC, CONFIG_LIMIT
+from hermes_gen.counterexample.parallel import generateCounterExamples
 from hermes_gen.counterexample.derivation import Derivation, DOT
+from hermes_gen.counterexample.persistentDeque import PersistentDeque
 
 D = Derivation
 
@@ -29,13 +37,13 @@ class TestCounterExample(unittest.TestCase):
 
         self.assertEqual(1, len(table.conflicts), "Number of conflicts")
 
-        START = Symbol.get("__START__")
-        S = Symbol.get("S")
-        T = Symbol.get("T")
-        X = Symbol.get("X")
-        Y = Symbol.get("Y")
-        a = Symbol.get("a")
-        b = Symbol.get("b")
+        START = grammar.symbols.get("__START__")
+        S = grammar.symbols.get("S")
+        T = grammar.symbols.get("T")
+        X = grammar.symbols.get("X")
+        Y = grammar.symbols.get("Y")
+        a = grammar.symbols.get("a")
+        b = grammar.symbols.get("b")
 
         conflict = table.conflicts[0]
 
@@ -105,20 +113,20 @@ class TestCounterExample(unittest.TestCase):
 
         self.assertEqual(3, len(table.conflicts), "Number of conflicts")
 
-        IF = Symbol.get("IF")
-        THEN = Symbol.get("THEN")
-        ELSE = Symbol.get("ELSE")
-        COLON = Symbol.get("COLON")
-        LBRACKET = Symbol.get("LBRACKET")
-        RBRACKET = Symbol.get("RBRACKET")
-        ASSIGN = Symbol.get("ASSIGN")
-        PLUS = Symbol.get("PLUS")
-        DIGIT = Symbol.get("DIGIT")
-        ARR = Symbol.get("ARR")
-
-        stmt = Symbol.get("stmt")
-        expr = Symbol.get("expr")
-        num = Symbol.get("num")
+        IF = grammar.symbols.get("IF")
+        THEN = grammar.symbols.get("THEN")
+        ELSE = grammar.symbols.get("ELSE")
+        COLON = grammar.symbols.get("COLON")
+        LBRACKET = grammar.symbols.get("LBRACKET")
+        RBRACKET = grammar.symbols.get("RBRACKET")
+        ASSIGN = grammar.symbols.get("ASSIGN")
+        PLUS = grammar.symbols.get("PLUS")
+        DIGIT = grammar.symbols.get("DIGIT")
+        ARR = grammar.symbols.get("ARR")
+
+        stmt = grammar.symbols.get("stmt")
+        expr = grammar.symbols.get("expr")
+        num = grammar.symbols.get("num")
 
         gen = CounterExampleGen(lalr)
         ce0 = gen.generate_counterexample(table.conflicts[0])
@@ -188,3 +196,129 @@ class TestCounterExample(unittest.TestCase):
         self.assertEqual(
             "expr COLON ARR LBRACKET expr RBRACKET ASSIGN num • DIGIT DIGIT COLON stmt stmt", ce0.prettyExample1()
         )
+
+    def test_2_parallel(self):
+        testFile = utils.getTestFilename("conflicts/ambiguous-shift-reduce.hm")
+        grammar = parse_grammar(testFile)
+        lalr = LALR1Automata(grammar)
+        table = ParseTable(lalr)
+
+        ceGen = CounterExampleGen(lalr)
+        expected = [("", ceGen.generate_counterexample(x).prettyPrint(False)) for x in table.conflicts]
+
+        actual = list(generateCounterExamples(grammar, lalr, table, False, 2, TIME_LIMIT_SEC, CONFIG_LIMIT))
+        self.assertEqual(expected, actual)
+
+    def test_3_persistent_deque(self):
+        a = PersistentDeque([1, 2, 3])
+        # Same items, but split between the front and back lists differently
+        b = PersistentDeque([3]).appendleft(2).appendleft(1)
+        c = PersistentDeque([1]).extend([2, 3, 4]).dropLast(1)
+
+        for x in [b, c]:
+            self.assertEqual(a, x)
+            self.assertEqual(hash(a), hash(x))
+            self.assertEqual([1, 2, 3], list(x))
+            self.assertEqual([3, 2, 1], list(reversed(x)))
+            self.assertEqual(1, x.first)
+            self.assertEqual(3, x.last)
+
+        # Modifying never changes the original
+        d = a.append(4).appendleft(0)
+        self.assertEqual([1, 2, 3], list(a))
+        self.assertEqual([0, 1, 2, 3, 4], list(d))
+        self.assertNotEqual(a, d)
+
+        self.assertEqual([2, 3, 4], d.lastItems(3))
+        self.assertEqual([0, 1, 2, 3, 4], d.lastItems(5))
+        self.assertEqual([0, 1], list(d.dropLast(3)))
+        self.assertEqual([], list(d.dropLast(5)))
+        self.assertEqual(PersistentDeque(), d.dropLast(5))
+
+        with self.assertRaises(IndexError):
+            d.dropLast(6)
+
+    def test_4_shared_derivations(self):
+        symbols = SymbolTable()
+        a = symbols.add("a", "a", False)
+        b = symbols.add("b", "", False)
+
+        leaf = Derivation.make(a)
+        self.assertIs(leaf, Derivation.make(a))
+        self.assertIs(Derivation.make(b, [leaf]), Derivation.make(b, [Derivation.make(a)]))
+        self.assertIsNot(Derivation.make(b, [leaf]), Derivation.make(b, [leaf, leaf]))
+        self.assertIsNot(Derivation.make(b), Derivation.make(b, []))
+
+    def test_5_duplicate_rules(self):
+        testFile = utils.getTestFilename("conflicts/duplicate-rules.hm")
+        grammar = parse_grammar(testFile)
+        lalr = LALR1Automata(grammar)
+        table = ParseTable(lalr)
+
+        self.assertEqual(1, len(table.conflicts), "Number of conflicts")
+        conflict = table.conflicts[0]
+        self.assertNotEqual(conflict.rule1.rule.id, conflict.rule2.rule.id)
+
+        ceGen = CounterExampleGen(lalr)
+        ce = ceGen.generate_counterexample(conflict)
+        self.assertTrue(ce.unifying)
+        self.assertEqual("LPAREN T RPAREN •", ce.prettyExample1())
+
+    def test_6_config_limit(self):
+        testFile = utils.getTestFilename("conflicts/ifelse.hm")
+        grammar = parse_grammar(testFile)
+        lalr = LALR1Automata(grammar)
+        table = ParseTable(lalr)
+
+        ceGen = CounterExampleGen(lalr)
+        self.assertTrue(ceGen.generate_counterexample(table.conflicts[0]).unifying)
+
+        # Out of budget, falls back to a nonunifying example
+        ceGen.configLimit = 1
+        stderr = io.StringIO()
+        with contextlib.redirect_stderr(stderr):
+            ce = ceGen.generate_counterexample(table.conflicts[0])
+        self.assertFalse(ce.unifying)
+        self.assertTrue(ce.timeout)
+        conflict = table.conflicts[0]
+        self.assertIn(f"Search limit exceeded for the conflict in {conflict.node} on {conflict.symbol}",
+                      stderr.getvalue())
+
+    def test_7_two_grammars(self):
+        ifelse = parse_grammar(utils.getTestFilename("conflicts/ifelse.hm"))
+        ifelseLALR = LALR1Automata(ifelse)
+        ifelseTable = ParseTable(ifelseLALR)
+        ifelseGen = CounterExampleGen(ifelseLALR)
+        expected = ifelseGen.generate_counterexample(ifelseTable.conflicts[0]).prettyPrint(False)
+
+        # Building a second grammar leaves the first one untouched
+        dup = parse_grammar(utils.getTestFilename("conflicts/duplicate-rules.hm"))
+        dupLALR = LALR1Automata(dup)
+        dupTable = ParseTable(dupLALR)
+        dupGen = CounterExampleGen(dupLALR)
+
+        self.assertIsNot(ifelse.symbols, dup.symbols)
+        self.assertTrue(ifelse.symbols.exists("if"))
+        self.assertFalse(dup.symbols.exists("if"))
+
+        self.assertTrue(dupGen.generate_counterexample(dupTable.conflicts[0]).unifying)
+        self.assertEqual(expected, ifelseGen.generate_counterexample(ifelseTable.conflicts[0]).prettyPrint(False))
+
+    def test_8_parallel_closed(self):
+        testFile = utils.getTestFilename("conflicts/ambiguous-shift-reduce.hm")
+        grammar = parse_grammar(testFile)
+        lalr = LALR1Automata(grammar)
+        table = ParseTable(lalr)
+
+        tempDir = tempfile.mkdtemp()
+        try:
+            with mock.patch.object(tempfile, "tempdir", tempDir):
+                examples = generateCounterExamples(grammar, lalr, table, False, 2, TIME_LIMIT_SEC, CONFIG_LIMIT)
+                with contextlib.closing(examples):
+                    # Consumed the same way as the command line, zip() does not resume it after the last example
+                    self.assertEqual(len(table.conflicts), len(list(zip(table.conflicts, examples))))
+                    self.assertEqual(1, len(os.listdir(tempDir)))
+                # Closing shuts down the pool and removes the snapshot
+                self.assertEqual([], os.listdir(tempDir))
+        finally:
+            shutil.rmtree(tempDir)
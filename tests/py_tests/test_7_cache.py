@@ -0,0 +1,57 @@
+import unittest
+import os
+import shutil
+import tempfile
+
+from . import utils
+from hermes_gen.cache import GenerationCache, grammarFiles
+
+
+class TestGenerationCache(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.tempDir = tempfile.mkdtemp()
+        # Copy the grammar and its import so we can modify them
+        for filename in ["test.hm", "imported.hm"]:
+            shutil.copy(utils.getTestFilename(filename), self.tempDir)
+        self.grammarFile = os.path.join(self.tempDir, "test.hm")
+        self.cacheDir = os.path.join(self.tempDir, "cache")
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.tempDir)
+
+    def test_1_imports(self):
+        files = grammarFiles(self.grammarFile)
+        self.assertEqual([self.grammarFile, os.path.join(self.tempDir, "imported.hm")], files)
+
+    def test_2_key(self):
+        options = {"name": "test"}
+        key = GenerationCache(self.cacheDir, self.grammarFile, options).key
+
+        self.assertEqual(key, GenerationCache(self.cacheDir, self.grammarFile, options).key)
+        self.assertNotEqual(key, GenerationCache(self.cacheDir, self.grammarFile, {"name": "other"}).key)
+
+        # Changing an imported file changes the key
+        with open(os.path.join(self.tempDir, "imported.hm"), mode='a') as f:
+            f.write("\n# comment\n")
+        self.assertNotEqual(key, GenerationCache(self.cacheDir, self.grammarFile, options).key)
+
+    def test_3_restore(self):
+        outFile = os.path.join(self.tempDir, "out", "table.h")
+        outputs = {"table": outFile}
+
+        cache = GenerationCache(self.cacheDir, self.grammarFile, {})
+        self.assertFalse(cache.restore(outputs))
+
+        os.makedirs(os.path.dirname(outFile))
+        with open(outFile, mode='w') as f:
+            f.write("table")
+        cache.store(outputs, [])
+        os.remove(outFile)
+
+        self.assertTrue(cache.restore(outputs))
+        with open(outFile, mode='r') as f:
+            self.assertEqual("table", f.read())
+
+        # Outputs that were not stored are a miss
+        self.assertFalse(cache.restore({"table": outFile, "pybind": outFile}))
@@ -0,0 +1,145 @@
+import unittest
+import os
+import shutil
+import tempfile
+
+from . import utils
+from hermes_gen.grammar import parse_grammar
+from hermes_gen.lalr1_automata import LALR1Automata, writeDescription
+from hermes_gen.parseTable import ParseTable
+from hermes_gen.counterexample.counterexampleGen import CounterExampleGen
+from hermes_gen.snapshot import Snapshot, writeSnapshot, _HEADER, _SECTION
+from hermes_gen.errors import HermesError
+from hermes_gen.writers import table
+from hermes_gen.__main__ import generateEntry
+
+
+class TestSnapshot(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.tempDir = tempfile.mkdtemp()
+        self.snapshotFile = os.path.join(self.tempDir, "grammar.snap")
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.tempDir)
+
+    def _read(self, filename: str) -> str:
+        with open(os.path.join(self.tempDir, filename), mode='r') as f:
+            return f.read()
+
+    def _build(self, filename: str):
+        grammar = parse_grammar(utils.getTestFilename(filename))
+        lalr = LALR1Automata(grammar)
+        parseTable = ParseTable(lalr)
+        return grammar, lalr, parseTable
+
+    def test_1_roundtrip(self):
+        grammar, lalr, parseTable = self._build("calculator.hm")
+        writeDescription(os.path.join(self.tempDir, "direct.txt"), lalr)
+        writeSnapshot(self.snapshotFile, grammar, lalr, parseTable)
+
+        snapshot = Snapshot(self.snapshotFile)
+        self.assertEqual(grammar.startSymbol.name, snapshot.grammar.startSymbol.name)
+        self.assertEqual([str(x) for x in grammar.rules], [str(x) for x in snapshot.grammar.rules])
+        self.assertEqual(grammar.directives, snapshot.grammar.directives)
+
+        writeDescription(os.path.join(self.tempDir, "loaded.txt"), snapshot.automata)  # type: ignore
+        self.assertEqual(self._read("direct.txt"), self._read("loaded.txt"))
+
+        self.assertEqual(parseTable.table, snapshot.parseTable.table)
+        self.assertEqual(
+            [x.name for x in parseTable.symbolList],
+            [x.name for x in snapshot.parseTable.symbolList],
+        )
+
+    def test_2_lazy(self):
+        grammar, lalr, parseTable = self._build("G10.hm")
+        writeSnapshot(self.snapshotFile, grammar, lalr, parseTable)
+
+        snapshot = Snapshot(self.snapshotFile)
+        self.assertIsNone(snapshot._automata)
+        self.assertIsNone(snapshot._parseTable)
+
+        snapshot.automata
+        self.assertIsNotNone(snapshot._grammar)
+        self.assertIsNone(snapshot._parseTable)
+
+    def test_3_counterexamples(self):
+        grammar, lalr, parseTable = self._build("conflicts/ifelse.hm")
+        ceGen = CounterExampleGen(lalr)
+        expected = [ceGen.generate_counterexample(x).prettyPrint(False) for x in parseTable.conflicts]
+        writeSnapshot(self.snapshotFile, grammar, lalr, parseTable)
+
+        snapshot = Snapshot(self.snapshotFile)
+        conflicts = snapshot.parseTable.conflicts
+        self.assertEqual(len(parseTable.conflicts), len(conflicts))
+
+        ceGen = CounterExampleGen(snapshot.automata)  # type: ignore
+        self.assertEqual(expected, [ceGen.generate_counterexample(x).prettyPrint(False) for x in conflicts])
+
+    def test_4_writers(self):
+        grammar, lalr, parseTable = self._build("test.hm")
+        table.writeParseTable(os.path.join(self.tempDir, "direct.h"), grammar, parseTable)
+        writeSnapshot(self.snapshotFile, grammar, lalr, parseTable)
+
+        snapshot = Snapshot(self.snapshotFile)
+        table.writeParseTable(os.path.join(self.tempDir, "loaded.h"), snapshot.grammar, snapshot.parseTable)
+
+        self.assertEqual(self._read("direct.h"), self._read("loaded.h"))
+
+    def test_5_invalid(self):
+        with open(self.snapshotFile, mode='w') as f:
+            f.write("stmt = a;")
+
+        with self.assertRaises(HermesError):
+            Snapshot(self.snapshotFile)
+
+    def _rewrite(self, edit):
+        with open(self.snapshotFile, mode='rb') as f:
+            data = bytearray(f.read())
+        with open(self.snapshotFile, mode='wb') as f:
+            f.write(edit(data))
+
+    def test_6_truncated(self):
+        grammar, lalr, parseTable = self._build("calculator.hm")
+        writeSnapshot(self.snapshotFile, grammar, lalr, parseTable)
+        size = os.path.getsize(self.snapshotFile)
+
+        # Cut inside the section table, and inside the last section
+        for length in [20, size - 10]:
+            with self.subTest(length=length):
+                writeSnapshot(self.snapshotFile, grammar, lalr, parseTable)
+                self._rewrite(lambda x: x[:length])
+                with self.assertRaisesRegex(HermesError, "truncated or corrupt"):
+                    Snapshot(self.snapshotFile).parseTable
+
+    def test_7_corrupt(self):
+        grammar, lalr, parseTable = self._build("calculator.hm")
+        writeSnapshot(self.snapshotFile, grammar, lalr, parseTable)
+
+        def edit(data: bytearray) -> bytearray:
+            _, _, numSections = _HEADER.unpack_from(data, 0)
+            for idx in range(numSections):
+                name, offset, _ = _SECTION.unpack_from(data, _HEADER.size + idx * _SECTION.size)
+                if name.rstrip(b'\0') == b'automata':
+                    # A count that is past the end of the section
+                    data[offset:offset + 4] = b'\xff\xff\xff\x00'
+            return data
+
+        self._rewrite(edit)
+        snapshot = Snapshot(self.snapshotFile)
+        # The grammar is still fine, only the automata is corrupt
+        self.assertEqual(grammar.startSymbol.name, snapshot.grammar.startSymbol.name)
+        with self.assertRaisesRegex(HermesError, "truncated or corrupt"):
+            snapshot.automata
+
+    def test_8_build_flags(self):
+        grammar, lalr, parseTable = self._build("calculator.hm")
+        writeSnapshot(self.snapshotFile, grammar, lalr, parseTable)
+
+        # The tables come from the snapshot, so these cannot change anything
+        for flags in [["--mode", "ielr"], ["--lalr-engine", "propagate"], ["--mode-stats"]]:
+            with self.subTest(flags=flags):
+                code, _, stderr = generateEntry(["--no-color", "--from-snapshot"] + flags + [self.snapshotFile])
+                self.assertEqual(1, code)
+                self.assertIn(f"{flags[0]} cannot be used with --from-snapshot", stderr)
@@ -0,0 +1,72 @@
+import unittest
+import contextlib
+import io
+import os
+import shlex
+import shutil
+import tempfile
+
+from . import utils
+from hermes_gen.__main__ import readManifest, generateBatch, generateEntry
+from hermes_gen.errors import HermesError
+
+
+class TestBatch(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.tempDir = tempfile.mkdtemp()
+        self.manifest = os.path.join(self.tempDir, "manifest.txt")
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.tempDir)
+
+    def _read(self, filename: str) -> str:
+        with open(os.path.join(self.tempDir, filename), mode='r') as f:
+            return f.read()
+
+    def _entry(self, grammar: str, name: str, folder: str = "batch") -> str:
+        table = os.path.join(self.tempDir, folder, f"{name}.h")
+        return shlex.join(["-n", name, "-t", table, "--no-color", utils.getTestFilename(grammar)])
+
+    def _writeManifest(self, lines):
+        with open(self.manifest, mode='w') as f:
+            f.write("\n".join(lines))
+
+    def test_1_manifest(self):
+        self._writeManifest(["# comment", "", "-n calc 'my grammar.hm'", "  other.hm  "])
+        self.assertEqual([["-n", "calc", "my grammar.hm"], ["other.hm"]], readManifest(self.manifest))
+
+        self._writeManifest(["-n 'calc"])
+        with self.assertRaises(HermesError):
+            readManifest(self.manifest)
+
+    def test_2_same_outputs(self):
+        grammars = {"calc": "calculator.hm", "G10": "G10.hm", "ifelse": "conflicts/ifelse.hm"}
+        for name, grammar in grammars.items():
+            code, _, _ = generateEntry(shlex.split(self._entry(grammar, name, "single")))
+            self.assertEqual(0, code)
+
+        self._writeManifest([self._entry(grammar, name) for name, grammar in grammars.items()])
+        with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()) as stderr:
+            self.assertEqual(0, generateBatch(readManifest(self.manifest), 2))
+
+        for name in grammars:
+            self.assertEqual(self._read(f"single/{name}.h"), self._read(f"batch/{name}.h"))
+
+        # Only the grammar with a conflict prints anything
+        self.assertIn("ifelse.hm", stderr.getvalue())
+        self.assertNotIn("calculator.hm", stderr.getvalue())
+
+    def test_3_errors(self):
+        entries = [
+            ["--no-color", utils.getTestFilename("missing.hm")],
+            ["--bad-flag", utils.getTestFilename("G10.hm")],
+            shlex.split(self._entry("calculator.hm", "calc")),
+        ]
+        with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()) as stderr:
+            self.assertEqual(2, generateBatch(entries, 1))
+
+        # A failed grammar does not stop the others
+        self.assertIn("Cannot open grammar file", stderr.getvalue())
+        self.assertIn("--bad-flag", stderr.getvalue())
+        self.assertTrue(os.path.exists(os.path.join(self.tempDir, "batch", "calc.h")))